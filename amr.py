@@ -0,0 +1,470 @@
+"""Block-structured adaptive mesh refinement for the heat model.
+
+The coarse grid (initial and boundary condition as for LaplaceModel) is
+split into tiles of block_size cells per axis. Tiles where the solution has
+large gradients (or residuals) get a patch: a grid refined by ratio in every
+axis. Each step of the composite solve
+
+1. sweeps the coarse grid once (Jacobi),
+2. fills the edge of every patch (its ghost layer towards the coarse grid)
+   by interpolating the coarse grid and sweeps the patch fine_sweeps times,
+3. injects the patch values back into the coarse points inside the patch.
+
+Patches are placed when stepping starts and, optionally, again every
+regrid_every steps. For localised features only a small part of the domain
+is refined, so the number of grid points is a fraction of a uniform grid of
+the fine resolution.
+"""
+
+import numpy as np
+import decorator
+import kernels
+import library
+import model
+
+
+def interpolate(coarse, ratio):
+    """Multilinear interpolation of a grid onto a grid refined by ratio,
+    sharing the corner points.
+
+    Args:
+        coarse (numpy array): Values at the coarse points, at least two per
+            axis.
+        ratio (positive integer): Refinement ratio.
+
+    Returns:
+        numpy array: Values at the fine points, of shape
+        (n - 1) * ratio + 1 for each coarse length n.
+    """
+
+    fine = np.asarray(coarse, dtype=np.float64)
+
+    for axis in range(fine.ndim):
+
+        length = fine.shape[axis]
+        position = np.arange((length - 1) * ratio + 1) / ratio
+        lower = np.minimum(position.astype(int), length - 2)
+        weight = (position - lower).reshape((-1, ) + (1, ) *
+                                            (fine.ndim - axis - 1))
+        fine = (np.take(fine, lower, axis=axis) * (1 - weight) +
+                np.take(fine, lower + 1, axis=axis) * weight)
+
+    return fine
+
+
+class Patch():
+    """Refined block of the coarse grid.
+
+    Args:
+        lower (tuple): First coarse point (index) covered by the patch.
+        upper (tuple): Last coarse point covered by the patch.
+        ratio (positive integer): Refinement ratio.
+        coarse_data (numpy array): Coarse grid to take the initial values
+            from.
+        coarse_boundary (numpy array, bool_): Boundary of the coarse grid.
+            Fine points between boundary points are boundary as well.
+    """
+
+    def __init__(self, lower, upper, ratio, coarse_data, coarse_boundary):
+
+        self.lower = tuple(lower)
+        self.upper = tuple(upper)
+        self.ratio = ratio
+
+        region = self.region()
+        self.data = interpolate(coarse_data[region],
+                                ratio).astype(coarse_data.dtype)
+        self.boundary = interpolate(coarse_boundary[region], ratio) > 1 - 1e-9
+
+    def region(self):
+        """Returns the index of the coarse points covered by the patch."""
+
+        return tuple(
+            slice(low, high + 1) for low, high in zip(self.lower, self.upper))
+
+    def inner(self):
+        """Returns the index of the coarse points inside the patch (without
+        its edge)."""
+
+        return tuple(
+            slice(low + 1, high) for low, high in zip(self.lower, self.upper))
+
+    def copy(self):
+
+        patch = object.__new__(Patch)
+        patch.__dict__.update(self.__dict__)
+        patch.data = self.data.copy()
+
+        return patch
+
+    def fill_edge(self, coarse_data):
+        """Sets the edge of the patch (the interface to the coarse grid) by
+        interpolation of the coarse grid."""
+
+        fine = interpolate(coarse_data[self.region()], self.ratio)
+
+        for axis in range(self.data.ndim):
+
+            for position in (0, -1):
+
+                index = (slice(None), ) * axis + (position, )
+                self.data[index] = fine[index]
+
+    def sweep(self):
+        """Does one Jacobi step of the inner points of the patch."""
+
+        new_data = self.data.copy()
+        kernels.jacobi_slab(self.data, new_data, self.boundary, 1,
+                            self.data.shape[0] - 1)
+        self.data = new_data
+
+    def restrict(self, coarse_data):
+        """Injects the patch values into the coarse points inside it."""
+
+        coincident = (slice(self.ratio, -self.ratio, self.ratio), ) * \
+            self.data.ndim
+        coarse_data[self.inner()] = self.data[coincident]
+
+
+class AMRHeatModel(model.LaplaceModel):
+    """Heat model with block-structured adaptive mesh refinement.
+
+    Initial and boundary condition are given on the coarse grid, see module
+    documentation for the composite solve. current() and forward() return
+    the coarse grid (with the patch values injected) unless view_ratio is
+    larger than 1, then a uniform grid of that resolution is returned
+    (see uniform).
+
+    Args:
+        control (AbstractController): Controller (MVC pattern).
+        max_history (positive integer, optional): The maximal size of the data
+            history, the patches are kept in the history as well.
+        ratio (positive integer, optional): Refinement ratio of the patches.
+        block_size (positive integer, optional): Cells of a tile per axis.
+        refine_threshold (float, optional): Tiles where the indicator
+            exceeds this fraction of its maximum are refined.
+        indicator (string, optional): 'gradient' (default) or 'residual'.
+        fine_sweeps (positive integer, optional): Sweeps of the patches per
+            step. Defaults to ratio, as the fine grids converge slower.
+        regrid_every (integer, optional): Steps between placing the patches
+            again, 0 only places them when stepping starts.
+        view_ratio (positive integer, optional): Resolution of the returned
+            data relative to the coarse grid, needs to divide ratio.
+    """
+
+    indicators = ('gradient', 'residual')
+
+    def __init__(self,
+                 controller,
+                 max_history=100,
+                 ratio=4,
+                 block_size=8,
+                 refine_threshold=0.25,
+                 indicator='gradient',
+                 fine_sweeps=None,
+                 regrid_every=0,
+                 view_ratio=1,
+                 dtype=np.float_):
+
+        if indicator not in type(self).indicators:
+
+            raise ValueError('Unknown indicator: {}'.format(indicator))
+
+        if ratio % view_ratio != 0:
+
+            raise ValueError('view_ratio needs to divide ratio.')
+
+        self.ratio = ratio
+        self.block_size = block_size
+        self.refine_threshold = refine_threshold
+        self.indicator = indicator
+        self.fine_sweeps = ratio if fine_sweeps is None else fine_sweeps
+        self.regrid_every = regrid_every
+        self.view_ratio = view_ratio
+        # Patches by tile, None until placed
+        self._patches = None
+        self._patch_history = library.BufferQueue(maxsize=max_history)
+
+        super().__init__(controller, max_history, solver='stencil',
+                         dtype=dtype)
+
+    def _update_matrix(self):
+
+        super()._update_matrix()
+
+        # Placed again for the new geometry on the next step
+        self._patches = None
+
+    def reset(self):
+
+        super().reset()
+        self._patches = None
+        self._patch_history.empty()
+
+    def regrid(self):
+        """Places the patches on the tiles where the indicator is large.
+        Patches on tiles staying refined keep their values."""
+
+        data = self._data
+        shape = self.grid_shape
+
+        if self.indicator == 'gradient':
+
+            gradients = np.gradient(data)
+
+            if data.ndim == 1:
+
+                gradients = [gradients]
+
+            indicator = np.sqrt(sum(gradient**2 for gradient in gradients))
+
+        else:
+
+            indicator = np.abs(self._stencil_step(data) - data)
+
+        maximum = np.nanmax(indicator, initial=0)
+        flagged = np.argwhere(indicator > self.refine_threshold * maximum
+                              if maximum > 0 else np.zeros(shape, bool))
+
+        tiles = [-(-(length - 1) // self.block_size) for length in shape]
+        tile_index = np.minimum(flagged // self.block_size,
+                                np.array(tiles) - 1)
+        old = self._patches or {}
+        self._patches = {}
+
+        for tile in map(tuple, np.unique(tile_index, axis=0)):
+
+            if tile in old:
+
+                self._patches[tile] = old[tile]
+                continue
+
+            lower = [index * self.block_size for index in tile]
+            upper = [
+                min(low + self.block_size, length - 1)
+                for low, length in zip(lower, shape)
+            ]
+            self._patches[tile] = Patch(lower, upper, self.ratio, data,
+                                        self.boundary)
+
+    def patches(self):
+        """Returns the current patches."""
+
+        return list((self._patches or {}).values())
+
+    @decorator.logThis(filename=None)
+    def _step_forward(self):
+        """Does one step of the composite solve.
+
+        Note:
+            This method is for internal use only. Please use forward()
+            instead.
+        """
+
+        if self._data.size == 0:
+
+            return
+
+        if self._patches is None or (
+                self.regrid_every
+                and self.count_iteration % self.regrid_every == 0):
+
+            self.regrid()
+
+        self._patch_history.put(
+            {tile: patch.copy()
+             for tile, patch in self._patches.items()})
+
+        data = self._stencil_step(self._data)
+
+        for patch in self._patches.values():
+
+            patch.fill_edge(data)
+
+            for _ in range(self.fine_sweeps):
+
+                patch.sweep()
+
+            patch.restrict(data)
+
+        self._data = data
+
+    def forward(self):
+
+        for data, parameters in super().forward():
+
+            yield self._view(data), parameters
+
+    def backward(self):
+
+        iterator = super().backward()
+
+        while True:
+
+            count = self.count_iteration
+            data, parameters = next(iterator)
+
+            if self.count_iteration < count:
+
+                # Without patch history (e.g. resumed from an old
+                # checkpoint) they are placed again on the next step
+                self._patches = (None if self._patch_history.isempty() else
+                                 self._patch_history.pop())
+
+            yield self._view(data), parameters
+
+    def current(self):
+
+        data, parameters = super().current()
+
+        return self._view(data), parameters
+
+    def _view(self, data):
+
+        if self.view_ratio == 1 or data.size == 0:
+
+            return data
+
+        return self.uniform(self.view_ratio)
+
+    def uniform(self, ratio=None):
+        """Returns the solution resampled on a uniform grid.
+
+        Args:
+            ratio (positive integer, optional): Resolution relative to the
+                coarse grid, needs to divide the refinement ratio. Defaults
+                to the refinement ratio.
+
+        Returns:
+            numpy array: Interpolated coarse grid with the patch values.
+        """
+
+        ratio = self.ratio if ratio is None else ratio
+
+        if self.ratio % ratio != 0:
+
+            raise ValueError('ratio needs to divide the refinement ratio.')
+
+        if ratio == 1:
+
+            return self._data.copy()
+
+        data = interpolate(self._data, ratio).astype(self.dtype)
+        step = self.ratio // ratio
+
+        for patch in self.patches():
+
+            index = tuple(
+                slice(low * ratio, high * ratio + 1)
+                for low, high in zip(patch.lower, patch.upper))
+            data[index] = patch.data[(slice(None, None, step), ) *
+                                     data.ndim]
+
+        return data
+
+    def point_count(self):
+        """Returns the number of grid points of coarse grid and patches."""
+
+        return self._data.size + sum(patch.data.size
+                                     for patch in self.patches())
+
+    def uniform_point_count(self):
+        """Returns the number of grid points of a uniform grid with the
+        resolution of the patches."""
+
+        return int(
+            np.prod([(length - 1) * self.ratio + 1
+                     for length in self.grid_shape]))
+
+    def _parameters(self):
+
+        parameters = super()._parameters()
+        parameters.update({
+            'Patches': len(self.patches()),
+            'Grid Points': self.point_count()
+        })
+
+        return parameters
+
+    def _settings(self):
+
+        settings = super()._settings()
+        settings.update({
+            'ratio': self.ratio,
+            'block_size': self.block_size,
+            'refine_threshold': self.refine_threshold,
+            'indicator': self.indicator,
+            'fine_sweeps': self.fine_sweeps,
+            'regrid_every': self.regrid_every,
+            'view_ratio': self.view_ratio
+        })
+
+        return settings
+
+    def _system_state(self):
+
+        arrays, scalars = super()._system_state()
+        patches = self.patches()
+
+        for number, patch in enumerate(patches):
+
+            arrays['patch_{}'.format(number)] = patch.data
+
+        scalars['patches'] = [[list(patch.lower), list(patch.upper)]
+                              for patch in patches]
+
+        return arrays, scalars
+
+    def _restore_system(self, arrays, scalars):
+
+        super()._restore_system(arrays, scalars)
+        self._patches = self._restore_patches(arrays, scalars['patches'],
+                                              'patch_')
+
+    def _state(self, include_history=False):
+
+        arrays, scalars = super()._state(include_history)
+
+        if 'history' in arrays:
+
+            # The patches of every state in the history, for backward()
+            history = list(self._patch_history)[-len(arrays['history']):]
+            scalars['patch_history'] = []
+
+            for number, patches in enumerate(history):
+
+                prefix = 'patch_history_{}_'.format(number)
+                scalars['patch_history'].append([
+                    [list(patch.lower), list(patch.upper)]
+                    for patch in patches.values()
+                ])
+
+                for index, patch in enumerate(patches.values()):
+
+                    arrays[prefix + str(index)] = patch.data
+
+        return arrays, scalars
+
+    def _restore_state(self, arrays, scalars):
+
+        super()._restore_state(arrays, scalars)
+
+        for number, bounds in enumerate(scalars.get('patch_history', [])):
+
+            self._patch_history.put(
+                self._restore_patches(arrays, bounds,
+                                      'patch_history_{}_'.format(number)))
+
+    def _restore_patches(self, arrays, bounds, prefix):
+
+        patches = {}
+
+        for number, (lower, upper) in enumerate(bounds):
+
+            patch = Patch(lower, upper, self.ratio, arrays['data'],
+                          self.boundary)
+            patch.data = np.array(arrays[prefix + str(number)])
+            tile = tuple(low // self.block_size for low in lower)
+            patches[tile] = patch
+
+        return patches
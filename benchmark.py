@@ -0,0 +1,339 @@
+"""Benchmarks of the hot paths of models, library and views.
+
+Times the assembly (_update_matrix) and the steps (_step_forward) of the
+heat model for growing 2D and 3D grids, steps of the Lorenz and three body
+model (one by one and in the kernel loops), BufferQueue put / pop for
+several maxsize values and the data side of the view updates (residue curve
+and decimated trajectories, without drawing). Every benchmark reports the
+best time per call out of several repeats.
+
+Benchmarks with a size form scaling curves, for which the exponent of a
+power law fit (time ~ size**exponent) is reported as well.
+
+Results can be stored as JSON baseline. Compared to a baseline the run
+fails (exit code 1) if any benchmark is slower by more than the threshold
+factor::
+
+    python benchmark.py --save benchmark_baseline.json
+    python benchmark.py --baseline benchmark_baseline.json --threshold 1.5
+
+A comparing run without baseline file fails (exit code 2), store one with
+--save first. Baselines only make sense on the machine they were taken on,
+so they are not part of the repository. The decorated functions are timed
+with instrumentation turned off (see decorator.disabled).
+"""
+
+import sys
+import json
+import timeit
+import argparse
+import platform
+import numpy as np
+import controller
+import decorator
+import fixtures
+import library
+import model
+
+SIZES_2D = (8, 16, 24, 32)
+SIZES_3D = (4, 6, 8, 10)
+QUEUE_SIZES = (10, 100, 1000, 10000)
+TRAJECTORY_SIZES = (1000, 10000, 100000)
+
+
+def measure(function, repeat=5, min_time=0.05):
+    """Returns the best time per call of function in seconds.
+
+    The number of calls per repeat is chosen (like timeit does) so that one
+    repeat takes at least min_time.
+    """
+
+    timer = timeit.Timer(function)
+    number = 1
+
+    while True:
+
+        elapsed = timer.timeit(number)
+
+        if elapsed >= min_time or number >= 10**6:
+
+            break
+
+        number *= max(min(int(min_time / max(elapsed, 1e-9)) + 1, 10), 2)
+
+    return min([elapsed] + timer.repeat(repeat - 1, number)) / number
+
+
+def bench_laplace(results, sizes_2d, sizes_3d):
+
+    for ndim, sizes in ((2, sizes_2d), (3, sizes_3d)):
+
+        for size in sizes:
+
+            initial, boundary = fixtures.grid(size, ndim)
+
+            for solver in ('matrix', 'stencil'):
+
+                laplace = model.LaplaceModel(controller.Controller(),
+                                             solver=solver)
+                laplace.initial = initial
+                laplace.boundary = boundary
+                name = 'laplace_{}_{}d'.format(solver, ndim)
+
+                if solver == 'matrix':
+
+                    def assemble():
+
+                        # Without the cache only the first call assembles
+                        laplace.operator_cache.clear()
+                        laplace._update_matrix()
+
+                    results.add('laplace_update_matrix_{}d'.format(ndim),
+                                initial.size, measure(assemble))
+
+                results.add(name + '_step', initial.size,
+                            measure(laplace._step_forward))
+
+    model.LaplaceModel.operator_cache.clear()
+
+
+def bench_lorenz(results):
+
+    lorenz = fixtures.lorenz()
+    steps = lorenz.forward()
+
+    results.add('lorenz_forward', None, measure(lambda: next(steps)))
+
+    three = fixtures.three_body()
+    steps = three.forward()
+
+    results.add('three_body_forward', None, measure(lambda: next(steps)))
+
+    # Time per step of 1000 steps at once in the (compiled) kernel loops
+    for name, instance in (('lorenz', lorenz), ('three_body', three)):
+
+        instance.solver = 'kernel'
+        instance.advance(1)
+        results.add('{}_kernel_advance'.format(name), None,
+                    measure(lambda: instance.advance(1000)) / 1000)
+
+
+def bench_queue(results, sizes):
+
+    item = np.zeros(3)
+
+    for size in sizes:
+
+        queue = library.BufferQueue(maxsize=size)
+
+        for _ in range(size):
+
+            queue.put(item)
+
+        # A full queue drops its oldest element on every put
+        results.add('bufferqueue_put_full', size,
+                    measure(lambda: queue.put(item)))
+
+        def put_pop():
+
+            queue.pop()
+            queue.put(item)
+
+        results.add('bufferqueue_pop_put', size, measure(put_pop))
+
+
+def bench_views(results, sizes):
+
+    # Residue curve of the heat view: one point per step
+    residue = library.GrowableArray(width=2)
+
+    def update_residue():
+
+        residue.append((1, 0.5))
+        residue.view()
+
+    results.add('view_heat_residue', None, measure(update_residue))
+
+    # Trajectories of the Lorenz view with a growing number of points, a
+    # batch of 10 new points per update
+    batch = np.random.default_rng(0).random((10, 3))
+
+    for size in sizes:
+
+        trajectory = library.Trajectory(width=3)
+        trajectory.extend(np.random.default_rng(1).random((size, 3)))
+
+        def update_trajectory():
+
+            trajectory.extend(batch)
+            trajectory.discard(len(batch))
+            trajectory.decimated()
+
+        results.add('view_lorenz_trajectory', size,
+                    measure(update_trajectory))
+
+
+class Results():
+    """Collects the timings and the scaling curves of a run."""
+
+    def __init__(self):
+
+        self.timings = {}
+        self.curves = {}
+
+    def add(self, series, size, seconds):
+
+        if size is None:
+
+            self.timings[series] = seconds
+
+        else:
+
+            self.timings['{}_{}'.format(series, size)] = seconds
+            self.curves.setdefault(series, []).append((size, seconds))
+
+    def exponents(self):
+        """Exponents of power law fits of the scaling curves."""
+
+        exponents = {}
+
+        for series, points in self.curves.items():
+
+            if len(points) > 1:
+
+                sizes, seconds = np.log(np.array(points)).T
+                exponents[series] = float(np.polyfit(sizes, seconds, 1)[0])
+
+        return exponents
+
+    def to_dict(self):
+
+        return {
+            'machine': {
+                'python': platform.python_version(),
+                'numpy': np.__version__,
+                'processor': platform.processor(),
+                'system': platform.platform()
+            },
+            'timings': self.timings,
+            'curves': self.curves,
+            'exponents': self.exponents()
+        }
+
+    def report(self):
+
+        lines = []
+
+        for name, seconds in self.timings.items():
+
+            lines.append('{:<45} {:>12.3e} s {:>14.1f} /s'.format(
+                name, seconds, 1 / seconds))
+
+        lines.append('')
+
+        for series, exponent in self.exponents().items():
+
+            lines.append('{:<45} time ~ size**{:.2f}'.format(
+                series, exponent))
+
+        return '\n'.join(lines)
+
+
+def compare(timings, baseline, threshold):
+    """Returns the benchmarks slower than threshold times their baseline as
+    dict of name to ratio."""
+
+    regressions = {}
+
+    for name, seconds in timings.items():
+
+        if name in baseline and seconds > threshold * baseline[name]:
+
+            regressions[name] = seconds / baseline[name]
+
+    return regressions
+
+
+def run(quick=False):
+
+    results = Results()
+
+    # Logging every call of the steps would be timed as well
+    with decorator.disabled():
+
+        if quick:
+
+            bench_laplace(results, SIZES_2D[:2], SIZES_3D[:2])
+            bench_queue(results, QUEUE_SIZES[:2])
+            bench_views(results, TRAJECTORY_SIZES[:2])
+
+        else:
+
+            bench_laplace(results, SIZES_2D, SIZES_3D)
+            bench_queue(results, QUEUE_SIZES)
+            bench_views(results, TRAJECTORY_SIZES)
+
+        bench_lorenz(results)
+
+    return results
+
+
+def main(argv):
+
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('--save', help='write the results to this file')
+    parser.add_argument('--baseline', help='compare with this baseline')
+    parser.add_argument('--threshold', type=float, default=1.5,
+                        help='maximal slowdown factor (default 1.5)')
+    parser.add_argument('--quick', action='store_true',
+                        help='only the smaller sizes')
+    args = parser.parse_args(argv)
+
+    results = run(quick=args.quick)
+    print(results.report())
+
+    if args.save:
+
+        with open(args.save, 'wt') as file:
+
+            json.dump(results.to_dict(), file, indent=1)
+
+    if args.baseline:
+
+        try:
+
+            with open(args.baseline, 'rt') as file:
+
+                baseline = json.load(file)['timings']
+
+        except FileNotFoundError:
+
+            # Passing without anything to compare with would hide
+            # regressions
+            print('\nERROR: no baseline {0}, nothing was compared. Store '
+                  'one on this machine first with --save {0}'.format(
+                      args.baseline),
+                  file=sys.stderr)
+            return 2
+
+        regressions = compare(results.timings, baseline, args.threshold)
+
+        if regressions:
+
+            print('\nSlower than {} times the baseline:'.format(
+                args.threshold))
+
+            for name, ratio in regressions.items():
+
+                print('{:<45} {:>6.2f} x'.format(name, ratio))
+
+            return 1
+
+        print('\nNo regressions against {}'.format(args.baseline))
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,143 @@
+"""Checkpoints of the complete state of a model.
+
+A checkpoint is a single binary file: an 8 byte magic string, the length of
+a JSON header as unsigned 64 bit integer, the JSON header and the raw data of
+all arrays, each aligned to 64 bytes. The header holds the model type, the
+scalar part of the state and shape, dtype and offset of every array. No
+pickle is involved and arrays are memory mapped when loading, so restarting
+costs little more than reading the file once.
+"""
+
+import os
+import json
+import struct
+import numpy as np
+
+MAGIC = b'NLACKPT\x01'
+ALIGNMENT = 64
+
+
+def _aligned(offset):
+
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def _plain(value):
+
+    # numpy values in JSON (checkpoints, remote messages and the result
+    # cache) are stored as their python counterparts
+    if isinstance(value, np.generic):
+
+        return value.item()
+
+    if isinstance(value, np.ndarray):
+
+        return value.tolist()
+
+    raise TypeError('{} can not be stored as JSON.'.format(type(value)))
+
+
+def save(model, path, include_history=False):
+    """Writes the complete state of model to path.
+
+    Args:
+        model (AbstractModel): Model to save.
+        path (string): Name of the checkpoint file.
+        include_history (bool, optional): Whether to store the history (for
+            stepping backwards after resuming) as well.
+    """
+
+    arrays, scalars = model._state(include_history=include_history)
+    arrays = {name: np.ascontiguousarray(array)
+              for name, array in arrays.items()}
+
+    offset = 0
+    layout = {}
+
+    for name, array in arrays.items():
+
+        layout[name] = {
+            'offset': offset,
+            'shape': list(array.shape),
+            'dtype': array.dtype.str
+        }
+        offset = _aligned(offset + array.nbytes)
+
+    header = json.dumps({
+        'model': type(model).__name__,
+        'scalars': scalars,
+        'arrays': layout
+    }, default=_plain).encode('utf-8')
+    data_start = _aligned(len(MAGIC) + 8 + len(header))
+
+    # Written next to the target and moved in place afterwards, so a model
+    # resumed from path (and still mapping it) is not affected
+    with open(path + '.tmp', 'wb') as file:
+
+        file.write(MAGIC)
+        file.write(struct.pack('<Q', len(header)))
+        file.write(header)
+
+        for name, array in arrays.items():
+
+            file.seek(data_start + layout[name]['offset'])
+            # Written from the array's memory, without a copy
+            file.write(array.reshape(-1).view(np.uint8))
+
+        file.truncate(data_start + offset)
+
+    os.replace(path + '.tmp', path)
+
+
+def read(path):
+    """Reads a checkpoint without restoring it.
+
+    Returns:
+        tuple: Name of the model type, dict of (copy on write) memory mapped
+        arrays and dict of scalars.
+    """
+
+    with open(path, 'rb') as file:
+
+        if file.read(len(MAGIC)) != MAGIC:
+
+            raise TypeError('{} is not a checkpoint.'.format(path))
+
+        header_length, = struct.unpack('<Q', file.read(8))
+        header = json.loads(file.read(header_length).decode('utf-8'))
+
+    data_start = _aligned(len(MAGIC) + 8 + header_length)
+    arrays = {}
+
+    for name, layout in header['arrays'].items():
+
+        shape = tuple(layout['shape'])
+
+        if np.prod(shape) == 0:
+
+            # Empty arrays can not be memory mapped
+            arrays[name] = np.empty(shape, dtype=layout['dtype'])
+
+        else:
+
+            arrays[name] = np.memmap(path,
+                                     dtype=layout['dtype'],
+                                     mode='c',
+                                     offset=data_start + layout['offset'],
+                                     shape=shape)
+
+    return header['model'], arrays, header['scalars']
+
+
+def load(model, path):
+    """Restores the state saved in path into model. The model needs to be of
+    the same type as the saved one."""
+
+    name, arrays, scalars = read(path)
+
+    if name != type(model).__name__:
+
+        raise TypeError('Checkpoint of a {} can not be loaded into a {}.'
+                        .format(name, type(model).__name__))
+
+    model._restore_state(arrays, scalars)
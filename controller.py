@@ -11,6 +11,10 @@ import model
 import view
 import numpy as np
 import library
+import metrics
+import recorder
+import checkpoint
+import inputs
 from threading import Thread
 
 
@@ -61,13 +65,33 @@ class AbstractController():
 
 
 class Controller(AbstractController):
+
+    # Upper limit for redraws while playing, independent of steps per second
+    max_fps = 30
+
     def __init__(self):
 
         self.thread = Thread()
         self.task = None
+        self.metrics = metrics.registry
+        self._recorder = None
+        # Model replaced while replaying a recording
+        self._live_model = None
+        self._throttle = library.RenderThrottle(max_fps=type(self).max_fps)
+        self._steps_per_tick = 1
 
         super().__init__()
 
+    @AbstractController.view.setter
+    def view(self, value):
+
+        AbstractController.view.fset(self, value)
+
+        # Trajectory views draw every state, others only the latest one
+        self._throttle = library.RenderThrottle(
+            max_fps=type(self).max_fps,
+            batch=getattr(value, 'batch_updates', False))
+
     def stepping(self):
 
         stepsize = self.view.speed()
@@ -86,16 +110,37 @@ class Controller(AbstractController):
 
             self._step_backward(stepsize=stepsize)
 
-    def _step_forward(self, stepsize=1):
+    def _step_forward(self, stepsize=1, force_render=True):
 
         for _ in range(stepsize):
 
             data, parameters = next(self._forward_gen)
+            self._throttle.push(data, parameters)
 
-        self.view.update(data, parameters)
+        if force_render or self._throttle.due():
+
+            self._render()
+
+    def _play_tick(self):
+
+        self._step_forward(stepsize=self._steps_per_tick, force_render=False)
+
+    def _render(self):
+
+        if len(self._throttle):
+
+            data, parameters = self._throttle.flush()
+
+            with self.metrics.time('view_render_seconds',
+                                   view=type(self.view).__name__):
+
+                self.view.update(data, parameters)
 
     def _step_backward(self, stepsize=1):
 
+        # States not drawn yet need to be shown before going back
+        self._render()
+
         for _ in range(stepsize):
 
             data, parameters = next(self._backward_gen)
@@ -106,11 +151,29 @@ class Controller(AbstractController):
              initial_data_path='testdata_initial',
              boundary_condition_path='testdata_boundary'):
 
-        initial_condition = np.load(initial_data_path)
-        boundary_condition = np.load(boundary_condition_path)
+        if recorder.is_recording(initial_data_path):
+
+            self.replay(initial_data_path)
+            return
+
+        self.stop_replay()
+
+        if inputs.is_case(initial_data_path):
+
+            # The boundary is part of the case
+            arrays, _, _ = inputs.load_case(initial_data_path)
+            initial_condition = arrays['initial']
+            boundary_condition = arrays['boundary']
+
+        else:
+
+            initial_condition = np.load(initial_data_path)
+            boundary_condition = np.load(boundary_condition_path)
+
         self.model.initial = initial_condition
         self.model.boundary = boundary_condition
 
+        self._throttle.clear()
         self._forward_gen = self.model.forward()
         self._backward_gen = self.model.backward()
 
@@ -124,6 +187,7 @@ class Controller(AbstractController):
 
             self.task.terminate()
             self.thread.join()
+            self._render()
 
             self.view.gui_list['Play Button'].setText('Start')
 
@@ -131,12 +195,29 @@ class Controller(AbstractController):
 
             self.task = library.TimedTask()
 
-            # Speed returns steps per second
-            desired_run_time = 1 / self.view.speed()
+            # Speed returns steps per second. Above the frame rate several
+            # steps are done per tick and only drawn once per frame.
+            steps_per_second = self.view.speed()
+
+            if steps_per_second == np.inf:
+
+                self._steps_per_tick = 1
+                desired_run_time = 0
+
+            elif steps_per_second > self._throttle.max_fps:
+
+                self._steps_per_tick = int(
+                    round(steps_per_second / self._throttle.max_fps))
+                desired_run_time = self._steps_per_tick / steps_per_second
+
+            else:
+
+                self._steps_per_tick = 1
+                desired_run_time = 1 / steps_per_second
 
             self.thread = Thread(target=self.task.run,
                                  args=(
-                                     self._step_forward,
+                                     self._play_tick,
                                      desired_run_time,
                                  ))
             self.thread.start()
@@ -150,8 +231,89 @@ class Controller(AbstractController):
             self.task.terminate()
             self.thread.join()
 
+        self.stop_recording()
+
+    def start_recording(self, directory, **kwargs):
+        """Records the current and all following states of the model into
+        directory (see recorder.Recorder for keyword arguments)."""
+
+        self.stop_recording()
+
+        self._recorder = recorder.Recorder(directory, **kwargs)
+        self._recorder.record(*self.model.current())
+        self.model.subscribe(self._recorder)
+
+    def stop_recording(self):
+
+        if self._recorder is not None:
+
+            self.model.unsubscribe(self._recorder)
+            self._recorder.close()
+            self._recorder = None
+
+    def save_checkpoint(self, path, include_history=False):
+        """Saves the complete model state to path (see checkpoint.save)."""
+
+        if self.thread.is_alive():
+
+            self.play()
+
+        checkpoint.save(self.model, path, include_history=include_history)
+
+    def resume(self, path):
+        """Restores the model state saved in path and continues from it."""
+
+        if self.thread.is_alive():
+
+            self.play()
+
+        self.stop_replay()
+        checkpoint.load(self.model, path)
+
+        self._throttle.clear()
+        self._forward_gen = self.model.forward()
+        self._backward_gen = self.model.backward()
+
+        self.view.reset()
+        data, parameters = self.model.current()
+
+        self.view.update(data, parameters)
+
+    def replay(self, path):
+        """Replaces the model by one replaying the recording at path."""
+
+        if self.thread.is_alive():
+
+            self.play()
+
+        self.stop_recording()
+
+        if self._live_model is None:
+
+            self._live_model = self.model
+
+        self.model = model.ReplayModel(self, recorder.Recording(path))
+
+        self._throttle.clear()
+        self._forward_gen = self.model.forward()
+        self._backward_gen = self.model.backward()
+
+        self.view.reset()
+        data, parameters = self.model.current()
+
+        self.view.update(data, parameters)
+
+    def stop_replay(self):
+        """Returns to the model replaced by replay()."""
+
+        if self._live_model is not None:
+
+            self.model = self._live_model
+            self._live_model = None
+
     def reset(self):
 
+        self._throttle.clear()
         self.model.reset()
         self.view.reset()
 
@@ -170,13 +332,29 @@ class Controller(AbstractController):
 class LorenzController(Controller):
     def load(self, initial_data_path='testdata_initial'):
 
-        data = np.load(initial_data_path, allow_pickle=True)
+        if recorder.is_recording(initial_data_path):
+
+            self.replay(initial_data_path)
+            return
 
-        self.model.initial = data.item().get('initialPosition')
-        del data.item()['initialPosition']
+        self.stop_replay()
 
-        self.model._update_matrix(**data.item())
+        if inputs.is_case(initial_data_path):
+
+            arrays, parameters, _ = inputs.load_case(initial_data_path)
+            self.model.initial = arrays['initialPosition']
+            self.model._update_matrix(**parameters)
+
+        else:
 
+            data = np.load(initial_data_path, allow_pickle=True)
+
+            self.model.initial = data.item().get('initialPosition')
+            del data.item()['initialPosition']
+
+            self.model._update_matrix(**data.item())
+
+        self._throttle.clear()
         self._forward_gen = self.model.forward()
         self._backward_gen = self.model.backward()
 
@@ -188,14 +366,30 @@ class LorenzController(Controller):
 class ThreeBodyController(Controller):
     def load(self, initial_data_path='testdata_initial'):
 
-        data = np.load(initial_data_path, allow_pickle=True)
-        
-        self.model.initial = data.item().get('initialPosition')
+        if recorder.is_recording(initial_data_path):
+
+            self.replay(initial_data_path)
+            return
+
+        self.stop_replay()
+
+        if inputs.is_case(initial_data_path):
+
+            arrays, parameters, _ = inputs.load_case(initial_data_path)
+            self.model.initial = arrays['initialPosition']
+            self.model._update_matrix(**parameters)
+
+        else:
+
+            data = np.load(initial_data_path, allow_pickle=True)
+
+            self.model.initial = data.item().get('initialPosition')
 
-        del data.item()['initialPosition']
+            del data.item()['initialPosition']
 
-        self.model._update_matrix(**data.item())
+            self.model._update_matrix(**data.item())
 
+        self._throttle.clear()
         self._forward_gen = self.model.forward()
         self._backward_gen = self.model.backward()
 
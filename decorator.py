@@ -1,12 +1,158 @@
 import time
+import queue
+import atexit
 import logging
+import logging.handlers
+from contextlib import contextmanager
 from functools import wraps
+import library
+
+# Instrumentation modes of logThis, see configure()
+LOG = 'log'
+PROFILE = 'profile'
+OFF = 'off'
+
+# Timing aggregates of all functions decorated with logThis in profile mode
+profiles = {}
+
+_settings = {
+    'mode': LOG,
+    'sample_every': 1,
+    'flush_interval': 10.,
+    'filename': 'profile.log',
+    'last_flush': 0.
+}
+_profile_log = logging.getLogger('decorator.profile')
+_profile_log.propagate = False
+_listener = None
+
+
+def configure(mode=LOG, sample_every=1, flush_interval=10.,
+              filename='profile.log'):
+    """Sets how functions decorated with logThis are instrumented. Can be
+    changed at any time, also after decoration.
+
+    Args:
+        mode (string, optional): 'log' writes every call into the log file
+            (default), 'profile' aggregates the durations in memory (see
+            profiles) and 'off' disables instrumentation entirely.
+        sample_every (positive integer, optional): In profile mode only
+            every n-th call of each function is timed.
+        flush_interval (float, optional): In profile mode summaries of all
+            aggregates are written to filename every flush_interval seconds
+            by a background thread. None disables periodic flushing.
+        filename (string, optional): Name of the profile summary file.
+
+    """
+
+    global _listener
+
+    if mode not in (LOG, PROFILE, OFF):
+
+        raise ValueError('Unknown instrumentation mode: {}'.format(mode))
+
+    if sample_every < 1:
+
+        raise ValueError('Needs to sample at least every call.')
+
+    _stop_listener()
+
+    if mode == PROFILE:
+
+        # The simulation only puts records into the queue, writing the file
+        # is done by the listener thread.
+        records = queue.Queue()
+        _profile_log.handlers = [logging.handlers.QueueHandler(records)]
+        _profile_log.setLevel(logging.INFO)
+        _listener = logging.handlers.QueueListener(
+            records, logging.FileHandler(filename))
+        _listener.start()
+
+    _settings.update({
+        'mode': mode,
+        'sample_every': int(sample_every),
+        'flush_interval': flush_interval,
+        'filename': filename,
+        'last_flush': time.perf_counter()
+    })
+
+
+def mode():
+    """Returns the current instrumentation mode (LOG, PROFILE or OFF)."""
+
+    return _settings['mode']
+
+
+@contextmanager
+def disabled():
+    """Turns instrumentation off inside a with block (e.g. for
+    measurements of the decorated functions themselves) and restores the
+    previous settings afterwards."""
+
+    previous = dict(_settings)
+    configure(mode=OFF)
+
+    try:
+
+        yield
+
+    finally:
+
+        configure(mode=previous['mode'],
+                  sample_every=previous['sample_every'],
+                  flush_interval=previous['flush_interval'],
+                  filename=previous['filename'])
+
+
+def flush():
+    """Hands summaries of all timing aggregates to the background writer."""
+
+    if _listener is None:
+
+        return
+
+    for name, histogram in profiles.items():
+
+        _profile_log.info('{0}: {1}'.format(name, histogram.summary()))
+
+    _settings['last_flush'] = time.perf_counter()
+
+
+def _stop_listener():
+
+    global _listener
+
+    if _listener is not None:
+
+        flush()
+        _listener.stop()
+        _listener = None
+        _profile_log.handlers = []
+
+
+atexit.register(_stop_listener)
+
+
+def _file_logger(logname):
+
+    log = logging.getLogger(logname)
+
+    if not log.handlers:
+
+        log.addHandler(logging.FileHandler(logname))
+        log.setLevel(logging.INFO)
+
+    return log
 
 
 def logThis(filename=None, timed=True):
     """Decorator logging the method called, the arguments it was called with
     as well as the time it took it to execute in log file.
 
+    Note:
+        What is recorded depends on the instrumentation mode, see configure().
+        The log file is only opened on the first call in log mode.
+
     Args:
         filename (string): Name of the log file.
         timed (bool, optional): If True measures execution time and logs it.
@@ -19,21 +165,63 @@ def logThis(filename=None, timed=True):
     def decorate(function):
 
         logname = filename if filename else 'logfile.log'
-        log = logging.getLogger(logname)
-        logging.basicConfig(filename=logname, level=logging.INFO)
+        name = function.__qualname__
+        calls = [0]
+
+        def profile(args, kwargs):
+
+            calls[0] += 1
+
+            if calls[0] % _settings['sample_every']:
+
+                return function(*args, **kwargs)
+
+            start = time.perf_counter()
+            result = function(*args, **kwargs)
+            end = time.perf_counter()
+
+            try:
+
+                profiles[name].record(end - start)
+
+            except KeyError:
+
+                profiles[name] = library.TimingHistogram()
+                profiles[name].record(end - start)
+
+            interval = _settings['flush_interval']
+
+            if (interval is not None and
+                    end - _settings['last_flush'] > interval):
+
+                flush()
+
+            return result
 
         if timed is True:
 
             @wraps(function)
             def wrapper(*args, **kwargs):
 
+                mode = _settings['mode']
+
+                if mode == OFF:
+
+                    return function(*args, **kwargs)
+
+                elif mode == PROFILE:
+
+                    return profile(args, kwargs)
+
                 start = time.time()
                 result = function(*args, **kwargs)
                 end = time.time()
                 duration = end - start
 
-                log.log(logging.INFO, '{0} ran in {1:.4f} seconds with args: {2}, and kwargs: {3}'.format(
-                    function.__name__, duration, args, kwargs))
+                _file_logger(logname).log(
+                    logging.INFO, '{0} ran in {1:.4f} seconds with args: {2}, '
+                    'and kwargs: {3}'.format(function.__name__, duration, args,
+                                             kwargs))
 
                 return result
         else:
@@ -41,11 +229,21 @@ def logThis(filename=None, timed=True):
             @wraps(function)
             def wrapper(*args, **kwargs):
 
+                mode = _settings['mode']
+
+                if mode == OFF:
+
+                    return function(*args, **kwargs)
+
+                elif mode == PROFILE:
+
+                    return profile(args, kwargs)
+
                 result = function(*args, **kwargs)
 
-                log.log(logging.INFO,
-                        '{0} ran with args: {1}, and kwargs: {2}'
-                        .format(function.__name__, args, kwargs))
+                _file_logger(logname).log(
+                    logging.INFO, '{0} ran with args: {1}, and kwargs: {2}'
+                    .format(function.__name__, args, kwargs))
 
                 return result
 
@@ -0,0 +1,53 @@
+"""Small models shared by the tests, the benchmarks and the memory
+profiles."""
+
+import numpy as np
+import controller
+import model
+
+
+def grid(size, ndim):
+    """Returns a random initial condition on a grid of size points in each
+    of ndim dimensions and a boundary of its outer edge."""
+
+    shape = (size, ) * ndim
+    initial = np.random.default_rng(0).random(shape)
+    boundary = np.ones(shape, dtype=np.bool_)
+    boundary[(slice(1, -1), ) * ndim] = False
+
+    return initial, boundary
+
+
+def heat(hot=1., **options):
+    """Returns a LaplaceModel on an 8 x 8 grid with a hot first row and a
+    fixed outer wall. options are passed on to LaplaceModel."""
+
+    laplace = model.LaplaceModel(controller.Controller(), **options)
+    initial = np.zeros((8, 8))
+    initial[0] = hot
+    boundary = np.ones((8, 8))
+    boundary[1:-1, 1:-1] = 0
+    laplace.initial = initial
+    laplace.boundary = boundary
+
+    return laplace
+
+
+def lorenz(rho=28, **options):
+    """Returns a LorenzModel starting at (1, 1, 1)."""
+
+    instance = model.LorenzModel(controller.Controller(), **options)
+    instance.initial = [1., 1., 1.]
+    instance._update_matrix(timeStep=0.001, sigma=10, rho=rho, beta=8 / 3)
+
+    return instance
+
+
+def three_body(**options):
+    """Returns a ThreeBodyModel of three equal masses."""
+
+    three = model.ThreeBodyModel(controller.Controller(), **options)
+    three.initial = [0, 0, 0, 1, 0, 0, 0, 1, 0, 0, 0, 0, 0, 1, 0, 1, 0, 0]
+    three._update_matrix(timeStep=0.001, G=1, m_1=1, m_2=1, m_3=1)
+
+    return three
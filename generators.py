@@ -0,0 +1,175 @@
+"""Procedural initial and boundary conditions for the heat model.
+
+Builds initial and boundary arrays of any shape directly in memory from a
+declarative spec (a dict, e.g. read from JSON). Positions and sizes are
+given as fractions of the domain, so the same spec works for every
+resolution. Example::
+
+    {"shape": [512, 512, 512],
+     "background": 0,
+     "random": {"low": 0, "high": 10, "seed": 1},
+     "walls": {"default": 0, "x-": 100},
+     "obstacles": [{"box": {"lower": [0.4, 0.4, 0.4],
+                            "upper": [0.6, 0.6, 0.6]},
+                    "temperature": 50},
+                   {"sphere": {"center": [0.2, 0.8, 0.5], "radius": 0.1},
+                    "temperature": -20}],
+     "hot_spots": [{"center": [0.7, 0.3, 0.5], "radius": 0.05,
+                    "temperature": 200}]}
+
+Walls are the faces of the domain, named by axis (x, y, z or the axis
+number) and side (- or +). They are always fixed (boundary), unnamed ones
+get the default temperature. Obstacles are fixed as well, hot spots only
+set the initial temperature. The interior starts at the background
+temperature or, if given, a uniformly distributed random field.
+
+Run as a script to write a case (see inputs) from a JSON spec::
+
+    python generators.py spec.json case_directory
+"""
+
+import sys
+import json
+import numpy as np
+import inputs
+
+_AXES = 'xyz'
+
+
+def build(spec):
+    """Builds initial and boundary condition from a spec.
+
+    Args:
+        spec (dict): Declarative description of the case, see module
+            documentation.
+
+    Returns:
+        tuple: Initial condition (numpy array, float_) and boundary condition
+        (numpy array, bool_) of shape spec['shape'].
+    """
+
+    shape = tuple(int(size) for size in spec['shape'])
+
+    if len(shape) == 0 or min(shape) < 3:
+
+        raise ValueError('Every dimension needs at least 3 points.')
+
+    initial = np.empty(shape, dtype=np.float_)
+    boundary = np.zeros(shape, dtype=np.bool_)
+
+    if 'random' in spec:
+
+        random = spec['random']
+        low = random.get('low', 0.)
+        rng = np.random.default_rng(random.get('seed'))
+
+        # Filled in place to avoid temporary arrays of the full size
+        rng.random(out=initial)
+        initial *= random.get('high', 1.) - low
+        initial += low
+
+    else:
+
+        initial.fill(spec.get('background', 0.))
+
+    for hot_spot in spec.get('hot_spots', []):
+
+        index, mask = _sphere(shape, hot_spot['center'], hot_spot['radius'])
+        initial[index][mask] = hot_spot['temperature']
+
+    for obstacle in spec.get('obstacles', []):
+
+        if 'box' in obstacle:
+
+            index, mask = _box(shape, **obstacle['box'])
+
+        elif 'sphere' in obstacle:
+
+            index, mask = _sphere(shape, **obstacle['sphere'])
+
+        else:
+
+            raise ValueError('Unknown obstacle: {}'.format(obstacle))
+
+        initial[index][mask] = obstacle['temperature']
+        boundary[index][mask] = True
+
+    _walls(initial, boundary, spec.get('walls', {}))
+
+    return initial, boundary
+
+
+def _walls(initial, boundary, walls):
+
+    default = walls.get('default', None)
+
+    for axis in range(initial.ndim):
+
+        for side, position in (('-', 0), ('+', -1)):
+
+            index = (slice(None), ) * axis + (position, )
+            temperature = walls.get(_axis_name(axis) + side,
+                                    walls.get(str(axis) + side, default))
+
+            if temperature is not None:
+
+                initial[index] = temperature
+
+            boundary[index] = True
+
+
+def _axis_name(axis):
+
+    return _AXES[axis] if axis < len(_AXES) else str(axis)
+
+
+def _box(shape, lower, upper):
+
+    index = tuple(
+        slice(int(np.floor(low * (size - 1))),
+              int(np.ceil(high * (size - 1))) + 1)
+        for low, high, size in zip(lower, upper, shape))
+
+    return index, Ellipsis
+
+
+def _sphere(shape, center, radius):
+
+    # Only the bounding box of the sphere is evaluated
+    index = []
+    distances = []
+
+    for axis, (position, size) in enumerate(zip(center, shape)):
+
+        first = max(int(np.floor((position - radius) * (size - 1))), 0)
+        last = min(int(np.ceil((position + radius) * (size - 1))), size - 1)
+        coordinates = np.arange(first, last + 1) / (size - 1) - position
+        index.append(slice(first, last + 1))
+        distances.append(
+            (coordinates**2).reshape((-1, ) + (1, ) *
+                                     (len(shape) - axis - 1)))
+
+    return tuple(index), sum(distances) <= radius**2
+
+
+def main(argv):
+
+    if len(argv) != 2:
+
+        print(__doc__)
+        return 1
+
+    with open(argv[0], 'rt') as file:
+
+        spec = json.load(file)
+
+    initial, boundary = build(spec)
+    arrays = {'initial': initial, 'boundary': boundary}
+
+    inputs.save_case(argv[1], arrays, model='heat')
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,175 @@
+"""Structured, pickle free input format for initial and boundary data.
+
+A case is a directory holding a small JSON header (case.json) and one raw
+.npy file per array. The header names the model the case is meant for, its
+scalar parameters (e.g. timeStep) and describes every array. Boolean arrays
+like boundary masks are stored bit packed. Arrays are opened memory mapped
+and never with pickle, so loading even very large grids is fast and safe
+with untrusted files.
+
+Example of a header::
+
+    {"model": "heat",
+     "parameters": {},
+     "arrays": {"initial": {"file": "initial.npy"},
+                "boundary": {"file": "boundary.npy", "packed": true,
+                             "shape": [512, 512, 512]}}}
+
+Run as a script to convert the old input files::
+
+    python inputs.py heat initial_file boundary_file case_directory
+    python inputs.py lorenz initial_data.npy case_directory
+"""
+
+import os
+import sys
+import json
+import numpy as np
+
+HEADER_FILE = 'case.json'
+
+
+def is_case(path):
+    """Returns True if path is a case directory or its header file."""
+
+    if os.path.basename(path) == HEADER_FILE:
+
+        return os.path.isfile(path)
+
+    return os.path.isfile(os.path.join(path, HEADER_FILE))
+
+
+def save_case(directory, arrays, parameters=None, model=None):
+    """Writes a case.
+
+    Args:
+        directory (string): Case directory, created if necessary.
+        arrays (dict): Arrays of the case by name. Boolean arrays are stored
+            bit packed.
+        parameters (dict, optional): JSON serialisable scalar parameters.
+        model (string, optional): Name of the model the case is meant for.
+    """
+
+    os.makedirs(directory, exist_ok=True)
+    header = {'model': model, 'parameters': parameters or {}, 'arrays': {}}
+
+    for name, array in arrays.items():
+
+        array = np.asarray(array)
+        entry = {'file': name + '.npy'}
+
+        if array.dtype == np.bool_:
+
+            entry.update({'packed': True, 'shape': list(array.shape)})
+            array = np.packbits(array, axis=None)
+
+        np.save(os.path.join(directory, entry['file']), array)
+        header['arrays'][name] = entry
+
+    with open(os.path.join(directory, HEADER_FILE), 'wt') as file:
+
+        json.dump(header, file, indent=1)
+
+
+def load_case(path):
+    """Reads a case.
+
+    Args:
+        path (string): Case directory or its header file.
+
+    Returns:
+        tuple: Dict of arrays by name (memory mapped, bit packed ones are
+        unpacked), dict of parameters and the name of the model (or None).
+    """
+
+    if os.path.basename(path) == HEADER_FILE:
+
+        path = os.path.dirname(path)
+
+    with open(os.path.join(path, HEADER_FILE), 'rt') as file:
+
+        header = json.load(file)
+
+    arrays = {}
+
+    for name, entry in header.get('arrays', {}).items():
+
+        # Files need to lie inside the case directory
+        filename = entry['file']
+
+        filepath = os.path.realpath(os.path.join(path, filename))
+
+        if os.path.basename(filename) != filename or \
+                filename in ('', '.', '..') or \
+                os.path.dirname(filepath) != os.path.realpath(path):
+
+            raise ValueError('Invalid file name in case: {}'.format(filename))
+
+        array = np.load(filepath,
+                        mmap_mode='r',
+                        allow_pickle=False)
+
+        if entry.get('packed', False):
+
+            shape = tuple(entry['shape'])
+            size = int(np.prod(shape))
+
+            if array.ndim != 1 or array.size != -(-size // 8):
+
+                raise ValueError(
+                    'Packed array {} does not match its shape.'.format(name))
+
+            array = np.unpackbits(array, count=size).view(
+                np.bool_).reshape(shape)
+
+        arrays[name] = array
+
+    return arrays, header.get('parameters', {}), header.get('model')
+
+
+def _load_legacy(path):
+
+    with open(path, 'rb') as file:
+
+        is_npy = file.read(6) == b'\x93NUMPY'
+
+    if is_npy:
+
+        return np.load(path, allow_pickle=True)
+
+    # Old 2D test data is stored as comma separated text
+    return np.loadtxt(path, delimiter=',')
+
+
+def main(argv):
+
+    if len(argv) == 4 and argv[0] == 'heat':
+
+        arrays = {
+            'initial': _load_legacy(argv[1]),
+            'boundary': np.asarray(_load_legacy(argv[2]), dtype=np.bool_)
+        }
+
+        save_case(argv[3], arrays, model='heat')
+
+    elif len(argv) == 3 and argv[0] in ('lorenz', 'three'):
+
+        # Old files are pickled dicts, only convert trusted files
+        parameters = dict(_load_legacy(argv[1]).item())
+        arrays = {
+            'initialPosition':
+            np.asarray(parameters.pop('initialPosition'), dtype=np.float_)
+        }
+
+        save_case(argv[2], arrays, parameters=parameters, model=argv[0])
+
+    else:
+
+        print(__doc__)
+        return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
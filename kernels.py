@@ -0,0 +1,229 @@
+"""Numerical kernels shared by the models and their parallel back ends.
+
+The step loops of the Lorenz and three body model are compiled with Numba
+if it is installed. Otherwise they run as plain python on floats, which is
+still much faster than small numpy operations per step.
+"""
+
+import math
+import numpy as np
+
+try:
+
+    import numba
+
+except ImportError:
+
+    numba = None
+
+
+def _jit(function):
+
+    if numba is None:
+
+        return function
+
+    return numba.njit(cache=True, nogil=True)(function)
+
+
+def _scalars(array):
+
+    # Compiled loops work on arrays, python is faster on floats
+    array = np.ascontiguousarray(array, dtype=np.float64).ravel()
+
+    return array if numba is not None else array.tolist()
+
+
+def jacobi_slab(data, new_data, boundary, first, last):
+    """Jacobi update of the inner points of the rows first to last (along the
+    slowest axis of the grid) of data into new_data.
+
+    Only reads data (including the rows next to the slab), so slabs can be
+    updated concurrently. All operations are numpy ufuncs working in place,
+    which release the GIL.
+
+    Args:
+        data (numpy array): Current state. May have leading batch axes in
+            front of the grid axes.
+        new_data (numpy array): Array the new state is written to.
+        boundary (numpy array, bool_): Boundary mask of the grid.
+        first (integer): First row of the slab, at least 1.
+        last (integer): Row after the slab, at most the number of rows - 1.
+    """
+
+    ndim = boundary.ndim
+    lead = (slice(None), ) * (data.ndim - ndim)
+    inner = (slice(1, -1), ) * (ndim - 1)
+    region = lead + (slice(first, last), ) + inner
+    result = new_data[region]
+
+    # Rows before and after the slab
+    np.add(data[lead + (slice(first - 1, last - 1), ) + inner],
+           data[lead + (slice(first + 1, last + 1), ) + inner],
+           out=result)
+
+    # Neighbours along the other axes
+    for axis in range(1, ndim):
+
+        for shift in (slice(None, -2), slice(2, None)):
+
+            index = list(inner)
+            index[axis - 1] = shift
+            np.add(result,
+                   data[lead + (slice(first, last), ) + tuple(index)],
+                   out=result)
+
+    result *= 1 / (2 * ndim)
+
+    # Boundaries inside the grid keep their value
+    fixed = boundary[(slice(first, last), ) + inner]
+    np.copyto(result, data[region], where=fixed)
+
+
+def dst1(data, axis):
+    """Discrete sine transform (type I, unnormalised) of data along axis.
+
+    Computed by an FFT of the odd extension of data, so it costs
+    O(N log N). Applying it twice gives data times (n + 1) / 2, with n the
+    length of the axis.
+    """
+
+    length = data.shape[axis]
+    shape = list(data.shape)
+    shape[axis] = 1
+    zero = np.zeros(shape, dtype=data.dtype)
+    extended = np.concatenate((zero, data, zero, -np.flip(data, axis)),
+                              axis=axis)
+    spectrum = np.fft.rfft(extended, axis=axis).imag
+
+    return -0.5 * np.take(spectrum, np.arange(1, length + 1), axis=axis)
+
+
+def jacobi_spectrum(shape):
+    """Eigenvalues of a Jacobi step (of the inner points of a grid whose
+    outer edge is boundary) in the sine basis of dst1.
+
+    Args:
+        shape (tuple): Shape of the inner points.
+
+    Returns:
+        numpy array: Eigenvalue of every sine mode, of the given shape.
+    """
+
+    spectrum = np.zeros(shape)
+
+    for axis, length in enumerate(shape):
+
+        modes = np.arange(1, length + 1) / (length + 1)
+        spectrum = spectrum + np.cos(np.pi * modes).reshape(
+            (-1, ) + (1, ) * (len(shape) - axis - 1))
+
+    return spectrum / len(shape)
+
+
+@_jit
+def _lorenz_loop(state, matrix, time_step, steps, out):
+
+    a00, a01, a02 = matrix[0], matrix[1], matrix[2]
+    a10, a11 = matrix[3], matrix[4]
+    a21, a22 = matrix[7], matrix[8]
+    x, y, z = state[0], state[1], state[2]
+    a12, a20 = matrix[5], matrix[6]
+
+    for step in range(steps):
+
+        # The entries depending on the state, see LorenzModel._step_forward
+        a12 = -time_step * x
+        a20 = time_step * y
+        x, y, z = (a00 * x + a01 * y + a02 * z, a10 * x + a11 * y + a12 * z,
+                   a20 * x + a21 * y + a22 * z)
+        out[step, 0] = x
+        out[step, 1] = y
+        out[step, 2] = z
+
+    return a12, a20
+
+
+def lorenz(state, matrix, time_step, steps):
+    """Does steps steps of the Lorenz model (see LorenzModel).
+
+    Args:
+        state (numpy array): Current state, 3 values.
+        matrix (numpy array): Step matrix (3, 3). The entries depending on
+            the state are replaced every step.
+        time_step (float): Time step of the system.
+        steps (positive integer): Number of steps.
+
+    Returns:
+        tuple: States after every step (array (steps, 3), float64) and the
+        state dependent entries [1, 2] and [2, 0] of the matrix of the last
+        step.
+    """
+
+    out = np.empty((steps, 3))
+    a12, a20 = _lorenz_loop(_scalars(state), _scalars(matrix),
+                            float(time_step), steps, out)
+
+    return out, (a12, a20)
+
+
+@_jit
+def _three_body_loop(state, time_step, gravity, m_1, m_2, m_3, steps, out):
+
+    s = state.copy()
+    f = gravity * time_step
+    c_1, c_2, c_3 = time_step / m_1, time_step / m_2, time_step / m_3
+    r_12 = r_13 = r_23 = 0.
+
+    for step in range(steps):
+
+        # Cubed distances of the bodies
+        dx, dy, dz = s[0] - s[3], s[1] - s[4], s[2] - s[5]
+        r_12 = math.sqrt(dx * dx + dy * dy + dz * dz)**3
+        dx, dy, dz = s[0] - s[6], s[1] - s[7], s[2] - s[8]
+        r_13 = math.sqrt(dx * dx + dy * dy + dz * dz)**3
+        dx, dy, dz = s[3] - s[6], s[4] - s[7], s[5] - s[8]
+        r_23 = math.sqrt(dx * dx + dy * dy + dz * dz)**3
+
+        for axis in range(3):
+
+            p_1, p_2, p_3 = s[axis], s[axis + 3], s[axis + 6]
+            v_1, v_2, v_3 = s[axis + 9], s[axis + 12], s[axis + 15]
+
+            s[axis] = p_1 + c_1 * v_1
+            s[axis + 3] = p_2 + c_2 * v_2
+            s[axis + 6] = p_3 + c_3 * v_3
+            s[axis + 9] = v_1 + f * (m_2 * (p_2 - p_1) / r_12 + m_3 *
+                                     (p_3 - p_1) / r_13)
+            s[axis + 12] = v_2 + f * (m_1 * (p_1 - p_2) / r_12 + m_3 *
+                                      (p_3 - p_2) / r_23)
+            s[axis + 15] = v_3 + f * (m_1 * (p_1 - p_3) / r_13 + m_2 *
+                                      (p_2 - p_3) / r_23)
+
+        out[step, :] = s
+
+    return r_12, r_13, r_23
+
+
+def three_body(state, time_step, gravity, masses, steps):
+    """Does steps steps of the three body model (see ThreeBodyModel).
+
+    Args:
+        state (numpy array): Current state, positions and velocities of the
+            three bodies (18 values).
+        time_step (float): Time step of the system.
+        gravity (float): Gravitational constant G.
+        masses (tuple): Masses of the bodies.
+        steps (positive integer): Number of steps.
+
+    Returns:
+        tuple: States after every step (array (steps, 18), float64) and the
+        cubed distances r_12, r_13 and r_23 of the last step.
+    """
+
+    out = np.empty((steps, 18))
+    distances = _three_body_loop(_scalars(state), float(time_step),
+                                 float(gravity), *map(float, masses), steps,
+                                 out)
+
+    return out, distances
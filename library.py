@@ -1,4 +1,9 @@
+import bisect
+import os
+import hashlib
+from collections import OrderedDict
 import time
+import numpy as np
 
 
 class BufferQueue():
@@ -9,12 +14,30 @@ class BufferQueue():
 
     def put(self, item):
 
+        if self._maxsize == 0:
+
+            # History disabled
+            return
+
         if self._maxsize is not None and len(self._list) == self._maxsize:
 
             self._list.pop(0)
 
         self._list.append(item)
 
+    def extend(self, items):
+        """Puts all items, dropping the oldest ones at once."""
+
+        if self._maxsize == 0:
+
+            return
+
+        self._list.extend(items)
+
+        if self._maxsize is not None and len(self._list) > self._maxsize:
+
+            del self._list[:-self._maxsize]
+
     def pop(self):
 
         return self._list.pop(-1)
@@ -23,6 +46,10 @@ class BufferQueue():
 
         return len(self._list)
 
+    def __iter__(self):
+
+        return iter(self._list)
+
     def isempty(self):
 
         return not self._list
@@ -63,3 +90,385 @@ class TimedTask:
             if diff_time < desired_run_time:
 
                 time.sleep(desired_run_time - diff_time)
+
+
+class GrowableArray():
+    """Preallocated array growing by doubling its capacity. Appending is
+    amortised O(1), removing from the end only moves the fill pointer."""
+
+    def __init__(self, width=None, dtype=np.float_, capacity=16):
+
+        self._shape = () if width is None else (width, )
+        self._dtype = dtype
+        self._initial_capacity = max(int(capacity), 1)
+        self._array = np.empty((self._initial_capacity, ) + self._shape,
+                               dtype=self._dtype)
+        self._size = 0
+
+    def append(self, item):
+
+        if self._size == len(self._array):
+
+            self._grow(self._size + 1)
+
+        self._array[self._size] = item
+        self._size += 1
+
+    def extend(self, items):
+
+        items = np.asarray(items, dtype=self._dtype).reshape(
+            (-1, ) + self._shape)
+        new_size = self._size + len(items)
+
+        if new_size > len(self._array):
+
+            self._grow(new_size)
+
+        self._array[self._size:new_size] = items
+        self._size = new_size
+
+    def pop(self):
+
+        if self._size == 0:
+
+            raise IndexError('pop from empty GrowableArray')
+
+        self._size -= 1
+
+        return self._array[self._size]
+
+    def discard(self, count=1):
+
+        self._size = max(self._size - count, 0)
+
+    def view(self):
+
+        return self._array[:self._size]
+
+    def capacity(self):
+
+        return len(self._array)
+
+    def __len__(self):
+
+        return self._size
+
+    def isempty(self):
+
+        return self._size == 0
+
+    def empty(self):
+
+        self._size = 0
+
+    def _grow(self, min_capacity):
+
+        capacity = len(self._array)
+
+        while capacity < min_capacity:
+
+            capacity *= 2
+
+        array = np.empty((capacity, ) + self._shape, dtype=self._dtype)
+        array[:self._size] = self._array[:self._size]
+        self._array = array
+
+
+class Trajectory(GrowableArray):
+    """Growable store of points with level of detail decimation. The most
+    recent points are kept at full resolution while older history is thinned
+    so that at most max_vertices points are handed out for drawing."""
+
+    def __init__(self, width=3, max_vertices=20000, full_resolution=5000,
+                 dtype=np.float_):
+
+        if not 0 < full_resolution < max_vertices:
+
+            raise ValueError(
+                'Full resolution part needs to be positive and smaller than '
+                'the maximal number of vertices.')
+
+        super().__init__(width=width, dtype=dtype)
+        self.max_vertices = max_vertices
+        self.full_resolution = full_resolution
+
+    def decimated(self):
+
+        points = self.view()
+
+        if len(points) <= self.max_vertices:
+
+            return points
+
+        older = len(points) - self.full_resolution
+        budget = self.max_vertices - self.full_resolution
+
+        # Power of two strides anchored at the first point keep the thinned
+        # vertices stable while the trajectory grows.
+        stride = 1 << int(np.ceil(np.log2(older / budget)))
+
+        return np.concatenate((points[:older:stride], points[older:]))
+
+
+class RenderThrottle():
+    """Collects states produced by the simulation and releases them at most
+    max_fps times per second. In batch mode all states since the last frame
+    are released stacked, otherwise only the latest one."""
+
+    def __init__(self, max_fps=30, batch=False):
+
+        self.max_fps = max_fps
+        self.batch = batch
+        self._last_render = -np.inf
+        self._pending = []
+        self._parameters = None
+
+    def push(self, data, parameters=None):
+
+        if self.batch:
+
+            self._pending.append(data)
+
+        else:
+
+            self._pending = [data]
+
+        self._parameters = parameters
+
+    def due(self):
+
+        return (bool(self._pending) and
+                time.perf_counter() - self._last_render >= 1 / self.max_fps)
+
+    def flush(self):
+
+        if self.batch:
+
+            data = np.stack(self._pending)
+
+        else:
+
+            data = self._pending[-1]
+
+        parameters = self._parameters
+        self.clear()
+        self._last_render = time.perf_counter()
+
+        return data, parameters
+
+    def __len__(self):
+
+        return len(self._pending)
+
+    def clear(self):
+
+        self._pending = []
+        self._parameters = None
+
+
+class TimingHistogram():
+    """Aggregates durations (in seconds) into logarithmically spaced bins.
+    Recording is O(log(bins)) and uses constant memory, percentiles are
+    estimated from the bins."""
+
+    def __init__(self, lowest=1e-7, highest=1e2, bins_per_decade=10):
+
+        decades = np.log10(highest) - np.log10(lowest)
+        self._edges = list(
+            np.logspace(np.log10(lowest), np.log10(highest),
+                        int(round(decades * bins_per_decade)) + 1))
+        # First and last bin collect under- and overflows
+        self._counts = [0] * (len(self._edges) + 1)
+        self.count = 0
+        self.total = 0.
+        self.min = np.inf
+        self.max = 0.
+
+    def record(self, duration):
+
+        self._counts[bisect.bisect(self._edges, duration)] += 1
+        self.count += 1
+        self.total += duration
+
+        if duration < self.min:
+
+            self.min = duration
+
+        if duration > self.max:
+
+            self.max = duration
+
+    def mean(self):
+
+        return self.total / self.count if self.count else np.nan
+
+    def percentile(self, q):
+
+        if not self.count:
+
+            return np.nan
+
+        rank = q / 100 * self.count
+        cumulative = 0
+
+        for index, count in enumerate(self._counts):
+
+            cumulative += count
+
+            if count and cumulative >= rank:
+
+                break
+
+        # Geometric centre of the bin, limited to the observed range
+        lower = self._edges[index - 1] if index > 0 else self.min
+        upper = self._edges[index] if index < len(self._edges) else self.max
+
+        return min(max(np.sqrt(lower * upper), self.min), self.max)
+
+    def histogram(self):
+
+        return np.array(self._edges), np.array(self._counts)
+
+    def summary(self):
+
+        return {
+            'count': self.count,
+            'mean': self.mean(),
+            'min': self.min if self.count else np.nan,
+            'max': self.max if self.count else np.nan,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99)
+        }
+
+    def reset(self):
+
+        self._counts = [0] * len(self._counts)
+        self.count = 0
+        self.total = 0.
+        self.min = np.inf
+        self.max = 0.
+
+
+class OperatorCache():
+    """Least recently used cache of operators (matrices, factorisations, ...)
+    limited by the memory they use.
+
+    Numpy arrays can optionally be persisted in directory as .npy files,
+    they are then found again by later processes and loaded memory mapped.
+    Other objects are only kept in memory.
+    """
+
+    def __init__(self, max_bytes=2**30, directory=None):
+
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._bytes = 0
+
+    @staticmethod
+    def key(*parts):
+        """Returns a key for a combination of arrays (hashed by shape, type
+        and content) and other values (hashed by their representation)."""
+
+        digest = hashlib.sha1()
+
+        for part in parts:
+
+            if isinstance(part, np.ndarray):
+
+                digest.update(repr((part.shape, part.dtype.str)).encode())
+                digest.update(np.ascontiguousarray(part).tobytes())
+
+            else:
+
+                digest.update(repr(part).encode())
+
+            digest.update(b'|')
+
+        return digest.hexdigest()
+
+    def get(self, key):
+
+        try:
+
+            value, _ = self._items[key]
+            self._items.move_to_end(key)
+
+        except KeyError:
+
+            value = self._load(key)
+
+            if value is None:
+
+                self.misses += 1
+                raise
+
+            self._insert(key, value, value.nbytes)
+
+        self.hits += 1
+
+        return value
+
+    def put(self, key, value, nbytes=None):
+
+        if nbytes is None:
+
+            nbytes = value.nbytes
+
+        self._insert(key, value, nbytes)
+
+        if self.directory is not None and isinstance(value, np.ndarray):
+
+            os.makedirs(self.directory, exist_ok=True)
+            np.save(self._path(key), value)
+
+    def __contains__(self, key):
+
+        return key in self._items
+
+    def __len__(self):
+
+        return len(self._items)
+
+    def nbytes(self):
+
+        return self._bytes
+
+    def clear(self):
+
+        self._items = OrderedDict()
+        self._bytes = 0
+
+    def _insert(self, key, value, nbytes):
+
+        if key in self._items:
+
+            self._bytes -= self._items.pop(key)[1]
+
+        if nbytes > self.max_bytes:
+
+            # Would evict everything else, not worth it
+            return
+
+        self._items[key] = (value, nbytes)
+        self._bytes += nbytes
+
+        while self._bytes > self.max_bytes:
+
+            _, (_, evicted_bytes) = self._items.popitem(last=False)
+            self._bytes -= evicted_bytes
+
+    def _path(self, key):
+
+        return os.path.join(self.directory, key + '.npy')
+
+    def _load(self, key):
+
+        if self.directory is None or not os.path.isfile(self._path(key)):
+
+            return None
+
+        return np.load(self._path(key), mmap_mode='r', allow_pickle=False)
@@ -1,9 +1,13 @@
 import sys
 
 from PyQt5 import QtWidgets, uic
+from amr import AMRHeatModel
+from metrics import MetricsExporter
+from remote import RemoteController
 from view import HeatView, LorenzView, ThreeBodyView
 from controller import Controller, LorenzController
-from model import LaplaceModel, LorenzModel, ThreeBodyModel
+from model import (LaplaceModel, LorenzModel, ThreeBodyModel,
+                   TransientHeatModel)
 
 
 def main():
@@ -18,6 +22,20 @@ def main():
         view = HeatView(controller)
         model = LaplaceModel(controller)
 
+    elif program_type == 'transient':
+
+        controller = Controller()
+        view = HeatView(controller)
+        model = TransientHeatModel(controller)
+
+    elif program_type == 'amr':
+
+        controller = Controller()
+        view = HeatView(controller)
+        # The plots show the refined solution resampled to twice the
+        # resolution of the loaded grid
+        model = AMRHeatModel(controller, view_ratio=2)
+
     elif program_type == 'lorenz':
 
         controller = LorenzController()
@@ -30,6 +48,17 @@ def main():
         view = ThreeBodyView(controller)
         model = ThreeBodyModel(controller)
 
+    elif program_type in ('remote-heat', 'remote-lorenz', 'remote-three'):
+
+        # Views of a model hosted by remote.py on the default port
+        controller = RemoteController(port=8765)
+        view = {
+            'remote-heat': HeatView,
+            'remote-lorenz': LorenzView,
+            'remote-three': ThreeBodyView
+        }[program_type](controller)
+        model = None
+
     else:
 
         return
@@ -37,10 +66,22 @@ def main():
     controller.view = view
     controller.model = model
 
+    # Optional second argument: file the performance metrics are written to
+    # periodically (JSON if it ends with .json, Prometheus text otherwise)
+    exporter = MetricsExporter(sys.argv[2]) if len(sys.argv) > 2 else None
+
+    if exporter is not None:
+
+        exporter.start()
+
     app.exec_()
 
     controller.kill_processes()
 
+    if exporter is not None:
+
+        exporter.stop()
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,220 @@
+"""Memory profiles of the models based on tracemalloc.
+
+For a model (built by a factory, so the set up is measured as well) the
+profile reports:
+
+    setup_bytes: Memory held after building the model (matrix, data, ...).
+    peak_bytes: Peak of traced memory over set up and all steps.
+    step_bytes: Largest allocation of a single step, on top of what was
+        held before the step. The first step is a warm up (creating the
+        metrics, ...) and not included, neither here nor below.
+    retained_bytes_per_step: Memory held additionally after each step,
+        mostly the history.
+    history_bytes_per_state: Size of one state kept in the history.
+
+numpy reports its array allocations to tracemalloc, so these numbers cover
+the grids. Memory mapped files and shared memory are not traced.
+
+Budgets can be asserted per profile (assert_budget) or for the whole run
+from a JSON file mapping configuration names to budgets::
+
+    python memory_profile.py --size 24 --budget memory_budget.json
+"""
+
+import sys
+import json
+import argparse
+import tracemalloc
+import numpy as np
+import controller
+import decorator
+import fixtures
+import model
+
+# Fields a budget can limit
+BUDGET_FIELDS = ('setup_bytes', 'peak_bytes', 'step_bytes',
+                 'retained_bytes_per_step', 'history_bytes_per_state')
+
+
+def profile(factory, steps=10):
+    """Profiles the memory use of a model.
+
+    Args:
+        factory (callable): Returns the model to profile, with initial
+            condition (and boundary) set.
+        steps (positive integer, optional): Number of steps done.
+
+    Returns:
+        dict: Profile, see module documentation.
+    """
+
+    was_tracing = tracemalloc.is_tracing()
+
+    if not was_tracing:
+
+        tracemalloc.start()
+
+    # Logging the steps allocates far more than the steps themselves
+    with decorator.disabled():
+
+        return _profile(factory, steps, was_tracing)
+
+
+def _profile(factory, steps, was_tracing):
+
+    try:
+
+        start, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+
+        instance = factory()
+        held, peak = tracemalloc.get_traced_memory()
+        setup_bytes = held - start
+        peak_bytes = peak - start
+        step_bytes = 0
+        iterator = instance.forward()
+
+        # The first step creates the metrics and the state of the generator
+        # once, it only counts for the peak
+        tracemalloc.reset_peak()
+        next(iterator)
+        before_steps, peak = tracemalloc.get_traced_memory()
+        peak_bytes = max(peak_bytes, peak - start)
+
+        for _ in range(steps):
+
+            before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            next(iterator)
+            _, peak = tracemalloc.get_traced_memory()
+
+            step_bytes = max(step_bytes, peak - before)
+            peak_bytes = max(peak_bytes, peak - start)
+
+        held, _ = tracemalloc.get_traced_memory()
+        history = list(instance._data_history)
+
+    finally:
+
+        if not was_tracing:
+
+            tracemalloc.stop()
+
+    return {
+        'setup_bytes': setup_bytes,
+        'peak_bytes': peak_bytes,
+        'step_bytes': step_bytes,
+        'retained_bytes_per_step': (held - before_steps) / steps,
+        'history_bytes_per_state':
+        sum(state.nbytes for state in history) / len(history)
+        if history else 0
+    }
+
+
+def assert_budget(report, **budgets):
+    """Raises an AssertionError if a field of report exceeds its budget.
+
+    Example::
+
+        assert_budget(report, peak_bytes=2**20, step_bytes=0)
+    """
+
+    unknown = set(budgets) - set(BUDGET_FIELDS)
+
+    if unknown:
+
+        raise ValueError('Unknown budget fields: {}'.format(sorted(unknown)))
+
+    exceeded = [
+        '{} = {:.0f} > {:.0f}'.format(field, report[field], budget)
+        for field, budget in budgets.items() if report[field] > budget
+    ]
+
+    if exceeded:
+
+        raise AssertionError('Memory budget exceeded: ' + ', '.join(exceeded))
+
+
+def _heat(size, ndim, **options):
+
+    initial, boundary = fixtures.grid(size, ndim)
+
+    def factory():
+
+        heat = model.LaplaceModel(controller.Controller(), **options)
+        heat.initial = initial
+        heat.boundary = boundary
+
+        return heat
+
+    return factory
+
+
+def configurations(size=24, ndim=2):
+    """Returns the standard configurations as dict of name to factory."""
+
+    return {
+        'heat_matrix': _heat(size, ndim),
+        'heat_matrix_float32': _heat(size, ndim, dtype=np.float32),
+        'heat_stencil': _heat(size, ndim, solver='stencil'),
+        'heat_stencil_float32': _heat(size, ndim, solver='stencil',
+                                      dtype=np.float32),
+        'heat_memmap': _heat(size, ndim, solver='memmap'),
+        'lorenz': fixtures.lorenz,
+        'three_body': fixtures.three_body
+    }
+
+
+def main(argv):
+
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('--size', type=int, default=24,
+                        help='points per axis of the heat grids')
+    parser.add_argument('--ndim', type=int, default=2,
+                        help='dimensions of the heat grids')
+    parser.add_argument('--steps', type=int, default=10)
+    parser.add_argument('--budget', help='JSON file of budgets by name')
+    args = parser.parse_args(argv)
+
+    budgets = {}
+
+    if args.budget:
+
+        with open(args.budget, 'rt') as file:
+
+            budgets = json.load(file)
+
+    print('{:<22}'.format('configuration') +
+          ''.join('{:>25}'.format(field) for field in BUDGET_FIELDS))
+    failed = []
+
+    for name, factory in configurations(args.size, args.ndim).items():
+
+        # The operator cache would hide the matrix from all but the first
+        model.LaplaceModel.operator_cache.clear()
+        report = profile(factory, steps=args.steps)
+
+        print('{:<22}'.format(name) +
+              ''.join('{:>25.0f}'.format(report[field])
+                      for field in BUDGET_FIELDS))
+
+        try:
+
+            assert_budget(report, **budgets.get(name, {}))
+
+        except AssertionError as error:
+
+            failed.append('{}: {}'.format(name, error))
+
+    model.LaplaceModel.operator_cache.clear()
+
+    for message in failed:
+
+        print(message)
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
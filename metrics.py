@@ -0,0 +1,270 @@
+"""Performance metrics of running simulations.
+
+This module defines a registry models, controllers and views report
+counters, gauges and timings into, as well as an exporter periodically
+writing the registry into a JSON or Prometheus text file. By default
+everything reports into the module level registry.
+"""
+
+import json
+import time
+from collections import deque
+from contextlib import contextmanager
+from threading import Thread
+import numpy as np
+import library
+
+
+class Counter():
+    """Monotonically increasing value, e.g. the number of steps done."""
+
+    def __init__(self, window=1.):
+
+        self.value = 0
+        self._window = window
+        # Timestamped values, the first is the newest at least window seconds
+        # old. Only inc changes them, so any number of readers can ask for
+        # the rate.
+        self._samples = deque([(time.perf_counter(), 0)])
+
+    def inc(self, amount=1):
+
+        self.value += amount
+        now = time.perf_counter()
+
+        if now - self._samples[-1][0] >= self._window / 8:
+
+            self._samples.append((now, self.value))
+
+            while len(self._samples) > 1 and \
+                    now - self._samples[1][0] >= self._window:
+
+                self._samples.popleft()
+
+    def rate(self):
+        """Returns the increase per second, averaged over at least the last
+        window seconds. Reading the rate does not change the counter."""
+
+        now = time.perf_counter()
+        start, value = self._samples[0]
+
+        if now - start < self._window:
+
+            return 0.
+
+        return (self.value - value) / (now - start)
+
+
+class Gauge():
+    """Value which can go up and down, e.g. the memory used by the history."""
+
+    def __init__(self):
+
+        self.value = np.nan
+
+    def set(self, value):
+
+        self.value = value
+
+
+class MetricsRegistry():
+    """Collection of named metrics. Metrics are distinguished by name and
+    labels and created on first use.
+
+    Reporting on every step can be switched off by setting enabled to False,
+    the metrics are then left as they are.
+    """
+
+    def __init__(self):
+
+        self._metrics = {}
+        self.enabled = True
+
+    def _get(self, kind, factory, name, labels):
+
+        key = (name, tuple(sorted(labels.items())))
+
+        try:
+
+            metric_kind, metric = self._metrics[key]
+
+        except KeyError:
+
+            metric_kind, metric = kind, factory()
+            self._metrics[key] = (metric_kind, metric)
+
+        if metric_kind != kind:
+
+            raise TypeError('{} is already registered as {}.'.format(
+                name, metric_kind))
+
+        return metric
+
+    def counter(self, name, **labels):
+
+        return self._get('counter', Counter, name, labels)
+
+    def gauge(self, name, **labels):
+
+        return self._get('gauge', Gauge, name, labels)
+
+    def timer(self, name, **labels):
+
+        return self._get('summary', library.TimingHistogram, name, labels)
+
+    @contextmanager
+    def time(self, name, **labels):
+
+        timer = self.timer(name, **labels)
+        start = time.perf_counter()
+
+        try:
+
+            yield timer
+
+        finally:
+
+            timer.record(time.perf_counter() - start)
+
+    def clear(self):
+
+        self._metrics = {}
+
+    def snapshot(self):
+        """Returns a list of dicts (name, labels, type and values) describing
+        the current state of all metrics."""
+
+        snapshot = []
+
+        for (name, labels), (kind, metric) in list(self._metrics.items()):
+
+            entry = {'name': name, 'labels': dict(labels), 'type': kind}
+
+            if kind == 'counter':
+
+                entry.update({'value': metric.value, 'rate': metric.rate()})
+
+            elif kind == 'gauge':
+
+                entry['value'] = metric.value
+
+            else:
+
+                entry.update(metric.summary())
+                entry['sum'] = metric.total
+
+            snapshot.append(entry)
+
+        return snapshot
+
+    def to_json(self):
+
+        def finite(value):
+
+            # JSON has no representation for nan and inf
+            if isinstance(value, float) and not np.isfinite(value):
+
+                return None
+
+            return value
+
+        snapshot = [{key: finite(value)
+                     for key, value in entry.items()}
+                    for entry in self.snapshot()]
+
+        return json.dumps({'time': time.time(), 'metrics': snapshot},
+                          indent=1,
+                          default=float)
+
+    def to_prometheus(self):
+
+        lines = []
+        typed = set()
+
+        for entry in self.snapshot():
+
+            name = entry['name']
+            labels = entry['labels']
+
+            if name not in typed:
+
+                typed.add(name)
+                lines.append('# TYPE {} {}'.format(name, entry['type']))
+
+            if entry['type'] == 'summary':
+
+                for quantile in ('50', '90', '99'):
+
+                    lines.append(_prometheus_line(
+                        name, dict(labels, quantile='0.' + quantile),
+                        entry['p' + quantile]))
+
+                lines.append(_prometheus_line(name + '_sum', labels,
+                                              entry['sum']))
+                lines.append(_prometheus_line(name + '_count', labels,
+                                              entry['count']))
+
+            else:
+
+                lines.append(_prometheus_line(name, labels, entry['value']))
+
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path):
+        """Writes all metrics to path. Files ending with .json are written
+        as JSON, everything else in the Prometheus text format."""
+
+        text = self.to_json() if path.endswith('.json') else \
+            self.to_prometheus()
+
+        with open(path, 'wt') as file:
+
+            file.write(text)
+
+
+def _prometheus_line(name, labels, value):
+
+    if labels:
+
+        name += '{' + ','.join('{}="{}"'.format(key, label)
+                               for key, label in sorted(labels.items())) + '}'
+
+    return '{} {}'.format(name, float(value))
+
+
+class MetricsExporter():
+    """Writes a registry to a file every interval seconds on a background
+    thread."""
+
+    def __init__(self, path, interval=5, metrics=None):
+
+        self.path = path
+        self.interval = interval
+        self.registry = metrics if metrics is not None else registry
+        self.task = None
+        self.thread = Thread()
+
+    def start(self):
+
+        if not self.thread.is_alive():
+
+            self.task = library.TimedTask()
+            self.thread = Thread(target=self.task.run,
+                                 args=(self.export, self.interval),
+                                 daemon=True)
+            self.thread.start()
+
+    def stop(self):
+
+        if self.task is not None:
+
+            self.task.terminate()
+            self.thread.join()
+            self.export()
+
+    def export(self):
+
+        self.registry.write(self.path)
+
+
+registry = MetricsRegistry()
@@ -7,10 +7,27 @@ as concret implementations.
 """
 
 from abc import ABCMeta, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+import os
+import tempfile
+import time
 import numpy as np
 import controller
 import decorator
+import kernels
 import library
+import metrics
+import parallel
+
+try:
+
+    from scipy import sparse
+    from scipy.sparse import linalg as sparse_linalg
+
+except ImportError:
+
+    # Optional, without scipy the transient model uses a dense operator
+    sparse = None
 
 
 class AbstractModel():
@@ -21,6 +38,9 @@ class AbstractModel():
 
     Args:
         control (AbstractController): Controller (MVC pattern).
+        dtype (numpy floating dtype, optional): Precision of initial
+            condition, data and history. float32 halves memory and bandwidth
+            compared to the default float64.
 
     Attributes:
         count_iteration: A positive integer about the current iterations step.
@@ -34,19 +54,31 @@ class AbstractModel():
             is depending on the differential equation.
         _data_history: BufferQueue holding the history of the data up to a
             certain maximum (see max_history).
+        metrics: MetricsRegistry the model reports steps, timings of
+            _step_forward and _parameters and the history size into.
+        _subscribers: List of callables called with the data and parameters
+            of every step done by forward() (see subscribe).
     """
 
     __metaclass__ = ABCMeta
 
-    def __init__(self, controller, max_history):
+    def __init__(self, controller, max_history, dtype=np.float_):
+
+        self.dtype = np.dtype(dtype)
+
+        if not np.issubdtype(self.dtype, np.floating):
+
+            raise TypeError('dtype needs to be a floating point type.')
 
         self.controller = controller
         self.count_iteration = 0
         self.max_history = max_history
         self._matrix = None
-        self._data = np.array([], dtype=np.float_)
+        self._data = np.array([], dtype=self.dtype)
         self._data_history = library.BufferQueue(maxsize=self.max_history)
-        self.initial = np.array([], dtype=np.float_)
+        self.metrics = metrics.registry
+        self._subscribers = []
+        self.initial = np.array([], dtype=self.dtype)
 
     @property
     def controller(self):
@@ -68,14 +100,21 @@ class AbstractModel():
 
     @property
     def initial(self):
-        """numpy array (float_): Contains the initial condition of the data."""
+        """numpy array (dtype): Contains the initial condition of the data."""
 
         return self._initial
 
     @initial.setter
     def initial(self, value):
 
-        self._initial = np.array(value, dtype=np.float_)
+        if isinstance(value, np.memmap) and value.dtype == self.dtype:
+
+            # Stays on disk, it is read once when copied into the data
+            self._initial = value
+
+        else:
+
+            self._initial = np.array(value, dtype=self.dtype)
 
         # Changing initial condition resets data
         self.reset()
@@ -99,6 +138,9 @@ class AbstractModel():
         """Advances the simulations by one step and returns the new data
         state.
 
+        Steps are reported to the metrics unless the registry is disabled
+        or the instrumentation of decorator is off.
+
         Note:
             Iterator.
 
@@ -106,14 +148,121 @@ class AbstractModel():
             numpy array (float_): The data in the next iteration step.
         """
 
+        name = type(self).__name__
+        steps = self.metrics.counter('model_steps_total', model=name)
+        step_time = self.metrics.timer('model_step_seconds', model=name)
+        parameters_time = self.metrics.timer('model_parameters_seconds',
+                                             model=name)
+        history_bytes = self.metrics.gauge('model_history_bytes', model=name)
+
         while True:
 
             self._data_history.put(self._data)
 
+            # Checked every step, so switching off takes effect immediately
+            if not self.metrics.enabled or decorator.mode() == decorator.OFF:
+
+                self._step_forward()
+                self.count_iteration += 1
+                parameters = self._parameters()
+
+            else:
+
+                start = time.perf_counter()
+                self._step_forward()
+                self.count_iteration += 1
+                middle = time.perf_counter()
+                parameters = self._parameters()
+                end = time.perf_counter()
+
+                steps.inc()
+                step_time.record(middle - start)
+                parameters_time.record(end - middle)
+                history_bytes.set(
+                    len(self._data_history) * self._data.nbytes)
+
+            for subscriber in self._subscribers:
+
+                subscriber(self._data, parameters)
+
+            yield self._data, parameters
+
+    def subscribe(self, subscriber):
+        """Registers a callable receiving the data and parameters of every
+        step done by forward(), e.g. a recorder.Recorder.
+
+        Args:
+            subscriber (callable): Called as subscriber(data, parameters).
+        """
+
+        self._subscribers.append(subscriber)
+
+    def unsubscribe(self, subscriber):
+
+        self._subscribers.remove(subscriber)
+
+    def advance(self, steps):
+        """Advances the simulation by steps steps at once, without the
+        overhead per step of forward(). The last max_history states are kept
+        in the history and subscribers are called for every state (with the
+        parameters of the last step).
+
+        Args:
+            steps (positive integer): Number of steps.
+
+        Returns:
+            tuple: The states after every step (numpy array of shape
+            (steps, *data shape)) and the parameters of the last step.
+        """
+
+        if steps < 1:
+
+            raise ValueError('steps needs to be positive.')
+
+        previous = self._data
+        states = self._trajectory(steps)
+
+        # Only the tail fitting into the history is kept, copied so the
+        # history does not hold on to all states
+        if steps - 1 < self.max_history:
+
+            self._data_history.put(previous)
+
+        self._data_history.extend(
+            list(states[max(steps - 1 - self.max_history, 0):-1].copy()))
+
+        self._data = states[-1].copy()
+        self.count_iteration += steps
+        parameters = self._parameters()
+
+        name = type(self).__name__
+        self.metrics.counter('model_steps_total', model=name).inc(steps)
+
+        for subscriber in self._subscribers:
+
+            for state in states:
+
+                subscriber(state, parameters)
+
+        return states, parameters
+
+    def _trajectory(self, steps):
+        """Does steps steps and returns the state after every step. Models
+        with a kernel for several steps override this.
+
+        Note:
+            This method is for internal use only. Please use advance()
+            instead.
+        """
+
+        states = np.empty((steps, ) + self._data.shape, dtype=self.dtype)
+
+        for step in range(steps):
+
             self._step_forward()
-            self.count_iteration += 1
+            states[step] = self._data
 
-            yield self._data, self._parameters()
+        return states
 
     def backward(self):
         """Backtracks the simulations by one step and returns the old data
@@ -148,6 +297,69 @@ class AbstractModel():
         self._data = self.initial.copy()
         self._data_history.empty()
 
+    def _state(self, include_history=False):
+        """Returns the complete state of the model (see checkpoint.save).
+
+        Note:
+            This method is for internal use only. Models with additional
+            state extend _system_state and _restore_system.
+
+        Args:
+            include_history (bool, optional): Whether to include the history.
+
+        Returns:
+            tuple: Dict of numpy arrays and dict of JSON serialisable scalars.
+        """
+
+        arrays = {'initial': self.initial, 'data': self._data}
+        scalars = {
+            'count_iteration': self.count_iteration,
+            'dtype': self.dtype.str
+        }
+
+        if include_history and not self._data_history.isempty():
+
+            arrays['history'] = np.stack(list(self._data_history))
+
+        system_arrays, system_scalars = self._system_state()
+        arrays.update(system_arrays)
+        scalars.update(system_scalars)
+
+        return arrays, scalars
+
+    def _restore_state(self, arrays, scalars):
+        """Restores a state returned by _state.
+
+        Note:
+            This method is for internal use only. Please use checkpoint.load
+            instead.
+        """
+
+        self.dtype = np.dtype(scalars.get('dtype', self.dtype))
+        self.initial = arrays['initial']
+        self._restore_system(arrays, scalars)
+
+        # The data is only copied once it is changed (copy on write)
+        self._data = arrays['data']
+        self.count_iteration = scalars['count_iteration']
+
+        for state in arrays.get('history', []):
+
+            self._data_history.put(np.array(state))
+
+    def _system_state(self):
+
+        return {}, {}
+
+    def _restore_system(self, arrays, scalars):
+        pass
+
+    def _settings(self):
+        """Returns the settings besides the state the steps depend on, e.g.
+        the solver (see resultcache)."""
+
+        return {}
+
     @abstractmethod
     def _update_matrix(self):
         pass
@@ -171,12 +383,119 @@ class LaplaceModel(AbstractModel):
         control (AbstractController): Controller (MVC pattern).
         max_history (positive integer, optional): The maximal size of the data
             history. See AbstractController for further information.
+        batch (bool, optional): If True the initial condition is a batch of
+            K cases of shape (K, *grid shape) sharing one boundary (of the
+            grid shape). All cases are advanced together by one matrix-matrix
+            product and parameters are reported per case.
+        solver (string, optional): 'matrix' (default) applies the assembled
+            matrix, 'stencil' does the same Jacobi update directly on the
+            grid without assembling a matrix, 'processes' distributes the
+            stencil sweeps over worker processes sharing the grid (see
+            parallel.DomainDecomposition). Not available in batch mode.
+            'memmap' keeps current and next state in memory mapped files
+            and sweeps them block by block, for grids larger than the
+            memory. current() returns the memory mapped state and there is
+            no history (max_history is ignored). Not available in batch
+            mode. 'active' only updates the points that changed by more
+            than active_threshold in the last step and their neighbours,
+            with a full sweep every full_sweep_every steps. Not available
+            in batch mode. 'spectral' does spectral_jump Jacobi steps at
+            once in the sine basis, in O(N log N), if the boundary is
+            exactly the outer edge of the box (see is_box). Other masks
+            fall back to the stencil solver.
+        workers (positive integer, optional): Number of threads (stencil) or
+            processes (processes) the grid is split into slabs (along the
+            slowest axis) for.
+        directory (string, optional): Directory of the state files of the
+            memmap solver. Defaults to a temporary directory removed with the
+            model.
+        block_bytes (positive integer, optional): Size of the blocks the
+            memmap solver reads into memory at once.
+        dtype (numpy floating dtype, optional): Precision of the sweeps. See
+            refine() for getting float64 accuracy from float32 sweeps.
+        active_threshold (float, optional): Change below which a point
+            drops out of the active set of the active solver.
+        full_sweep_every (positive integer, optional): Steps between full
+            sweeps of the active solver, which also rebuild the active set.
+        spectral_jump (positive integer or np.inf, optional): Jacobi steps
+            per step of the spectral solver. np.inf jumps to the steady
+            state directly. Irregular masks do spectral_jump stencil sweeps
+            (a single one for np.inf) instead.
     """
-    def __init__(self, controller, max_history=100):
 
-        super().__init__(controller, max_history)
+    solvers = ('matrix', 'stencil', 'processes', 'memmap', 'active',
+               'spectral')
+
+    # Operators shared by all instances, keyed by the boundary geometry.
+    # Set operator_cache.directory to persist them between runs.
+    operator_cache = library.OperatorCache(max_bytes=2**30)
+
+    def __init__(self,
+                 controller,
+                 max_history=100,
+                 batch=False,
+                 solver='matrix',
+                 workers=1,
+                 directory=None,
+                 block_bytes=2**26,
+                 dtype=np.float_,
+                 active_threshold=1e-9,
+                 full_sweep_every=50,
+                 spectral_jump=1):
+
+        if solver not in type(self).solvers:
+
+            raise ValueError('Unknown solver: {}'.format(solver))
+
+        if batch and solver in ('processes', 'memmap', 'active'):
+
+            raise ValueError(
+                'The {} solver does not support batches.'.format(solver))
+
+        self.batch = batch
+        self.solver = solver
+        self.workers = workers
+        self.block_bytes = block_bytes
+        self.active_threshold = active_threshold
+        self.full_sweep_every = full_sweep_every
+        self.spectral_jump = spectral_jump
+        self._spectrum = None
+        self._active = None
+        self._active_count = 0
+        self._pool = None
+        self._domain = None
+        # Data the reductions done while stepping belong to
+        self._reduced_data = None
+        self._reductions = None
+        self._states = None
+        self._temporary = None
+
+        if solver == 'memmap':
+
+            # The history would only hold views of the overwritten files
+            max_history = 0
+
+            if directory is None:
+
+                self._temporary = tempfile.TemporaryDirectory()
+                directory = self._temporary.name
+
+        self.directory = directory
+
+        super().__init__(controller, max_history, dtype)
         self.boundary = np.array([], dtype=np.bool_)
 
+    @property
+    def grid_shape(self):
+        """tuple: Shape of the grid of a single case. Equals the shape of the
+        initial condition unless in batch mode."""
+
+        if self.batch and self.initial.ndim > 1:
+
+            return self.initial.shape[1:]
+
+        return self.initial.shape
+
     @property
     def boundary(self):
         """numpy array (bool_): Needs to be same size as initial condition
@@ -189,14 +508,18 @@ class LaplaceModel(AbstractModel):
     @boundary.setter
     def boundary(self, value):
 
+        self._boundary = self._checked_boundary(value)
+        self._update_matrix()
+
+    def _checked_boundary(self, value):
+
         value = np.array(value, dtype=np.bool_)
 
-        if value.shape != self.initial.shape:
+        if value.shape != self.grid_shape:
 
             raise TypeError(
                 "Boundary condition needs to have the same size as initial "
-                "condition. ({} != {})".format(value.shape,
-                                               self.initial.shape))
+                "condition. ({} != {})".format(value.shape, self.grid_shape))
 
         # Testing whether the edge is defined as boundary. Necessary for
         # iteration method to work.
@@ -206,14 +529,157 @@ class LaplaceModel(AbstractModel):
         index = (slice(1, -1), ) * value.ndim
         edge[index] = False
 
-        if value[edge].all():
+        if not value[edge].all():
+
+            raise TypeError('Edge needs to be defined as such.')
+
+        return value
+
+    @property
+    def is_box(self):
+        """bool: Whether the boundary is exactly the outer edge of the grid,
+        the case the spectral solver handles."""
+
+        # The outer edge is always boundary
+        inner = (slice(1, -1), ) * self.boundary.ndim
+
+        return self.boundary.size > 0 and not self.boundary[inner].any()
+
+    def update_conditions(self, initial=None, boundary=None):
+        """Changes boundary temperatures and / or geometry without starting
+        over.
+
+        Unlike setting initial or boundary, the model is not reset: the
+        current data stays the starting guess for the changed problem, only
+        the fixed points take their (new) temperature from initial. Only
+        the rows of the operator whose points changed between boundary and
+        free are rebuilt. After small edits the iteration re-converges in a
+        fraction of the steps of a fresh start.
+
+        Args:
+            initial (numpy array, optional): New initial condition, its
+                values at the boundary points are used right away.
+            boundary (numpy array, optional): New boundary condition.
+        """
+
+        if initial is not None:
+
+            initial = np.array(initial, dtype=self.dtype)
 
-            self._boundary = value
+            if initial.shape != self.initial.shape:
+
+                raise TypeError(
+                    'Initial condition needs to keep its size. ({} != {})'
+                    .format(initial.shape, self.initial.shape))
+
+        if boundary is not None:
+
+            boundary = self._checked_boundary(boundary)
+            changed = np.flatnonzero(boundary != self.boundary)
+            self._boundary = boundary
+
+            if changed.size:
+
+                self._update_rows(changed)
+
+        if initial is not None:
+
+            # Bypasses the setter, which would reset the data
+            self._initial = initial
+
+        if self.solver != 'memmap':
+
+            # The history may share the array
+            self._data = self._data.copy()
+
+        np.copyto(self._data, self.initial, where=self.boundary)
+        self._reductions = None
+
+    def _update_rows(self, changed):
+        """Rebuilds the rows of the operator of the points (flat indices)
+        whose boundary flag changed.
+
+        Note:
+            This method is for internal use only. Please use
+            update_conditions instead.
+        """
+
+        if self.solver != 'matrix':
+
+            # Nothing to rebuild row by row for the other solvers
             self._update_matrix()
+            return
 
-        else:
+        shape = self.grid_shape
+        ndim = len(shape)
+        strides = [int(np.prod(shape[axis + 1:])) for axis in range(ndim)]
+        fixed = self.boundary.ravel()[changed]
 
-            raise TypeError('Edge needs to be defined as such.')
+        # The old matrix may be shared through the cache
+        self._matrix = self._matrix.copy()
+        self._matrix[changed] = 0
+        self._matrix[changed[fixed], changed[fixed]] = 1
+
+        free = changed[~fixed]
+
+        for stride in strides:
+
+            self._matrix[free, free + stride] = 1 / (2 * ndim)
+            self._matrix[free, free - stride] = 1 / (2 * ndim)
+
+        cache = type(self).operator_cache
+        cache.put(cache.key('jacobi', self.dtype.str, self.boundary),
+                  self._matrix)
+
+    def _system_state(self):
+
+        # The operator is rebuilt from the boundary when restoring
+        arrays = {'boundary': self.boundary}
+        scalars = {'batch': self.batch}
+
+        if (self._active is not None and self._data is self._reduced_data
+                and self._reductions is not None):
+
+            # Without them the next step would be a full sweep, which gives
+            # slightly different results than the partial update
+            iteration, mean, abs_change = self._reductions
+            arrays.update({
+                'active': self._active,
+                'active_mean': np.array(mean),
+                'active_change': np.array(abs_change)
+            })
+            scalars.update({
+                'active_count': self._active_count,
+                'active_iteration': iteration
+            })
+
+        return arrays, scalars
+
+    def _restore_system(self, arrays, scalars):
+
+        self.batch = scalars.get('batch', False)
+        # Drops the active set and the reductions
+        self.boundary = arrays['boundary']
+
+        if 'active' in arrays:
+
+            self._active = np.array(arrays['active'])
+            self._active_count = scalars['active_count']
+            self._reductions = (scalars['active_iteration'],
+                                arrays['active_mean'][()],
+                                arrays['active_change'][()])
+            # The data restored afterwards
+            self._reduced_data = arrays['data']
+
+    def _settings(self):
+
+        # workers and block_bytes do not change the results
+        return {
+            'solver': self.solver,
+            'active_threshold': self.active_threshold,
+            'full_sweep_every': self.full_sweep_every,
+            'spectral_jump': self.spectral_jump
+        }
 
     def _update_matrix(self):
         """Updates the matrix A defining the the problem and used for solving
@@ -223,35 +689,72 @@ class LaplaceModel(AbstractModel):
             This method is for internal use only. Pleae don't use this method.
         """
 
-        ndim = self.initial.ndim
-        size = self.initial.size
-        shape = self.initial.shape
+        shape = self.grid_shape
+        ndim = len(shape)
+        size = int(np.prod(shape))
 
         if size == 0:
 
             # Catch empty initial data early to avoid errors later on
-            self._matrix = np.array([], dtype=np.float_)
+            self._matrix = np.array([], dtype=self.dtype)
+            return
+
+        if self.solver in ('stencil', 'processes', 'memmap', 'active',
+                           'spectral'):
+
+            # Works on the grid directly, no matrix needed. The workers hold
+            # the old boundary and are started again on the next step, the
+            # active set is rebuilt by a full sweep.
+            self._matrix = None
+            self._active = None
+            self._close_domain()
+
+            if self.solver == 'spectral' and self.is_box:
+
+                self._spectrum = kernels.jacobi_spectrum(
+                    tuple(length - 2 for length in shape))
+
+            else:
+
+                self._spectrum = None
+
+            return
+
+        # The operator only depends on the geometry, not on temperatures
+        cache = type(self).operator_cache
+        key = cache.key('jacobi', self.dtype.str, self.boundary)
+        name = type(self).__name__
+
+        try:
+
+            self._matrix = cache.get(key)
+            self.metrics.counter('operator_cache_hits_total', model=name).inc()
             return
 
+        except KeyError:
+
+            self.metrics.counter('operator_cache_misses_total',
+                                 model=name).inc()
+
         boundary_aux = self.boundary.ravel()
         normalisation = 1 / (2 * ndim)
-        self._matrix = np.zeros((size, size), dtype=np.float_)
-        # Indicies for the neighbouring elements.
-        index = np.array(np.cumprod(shape) / shape[0], dtype=np.int)
+        self._matrix = np.zeros((size, size), dtype=self.dtype)
+        # Indicies for the neighbouring elements (strides of the flat grid).
+        index = [int(np.prod(shape[axis + 1:])) for axis in range(ndim)]
 
-        # Goes through all points
-        for idx, point in enumerate(self._matrix):
+        # Boundary conditions should not change
+        fixed = np.flatnonzero(boundary_aux)
+        self._matrix[fixed, fixed] = 1
 
-            if boundary_aux[idx]:
+        # Neighbouring points of all other points
+        free = np.flatnonzero(~boundary_aux)
 
-                # Boundary conditions should not change
-                point[idx] = 1
+        for stride in index:
 
-            else:
+            self._matrix[free, free + stride] = normalisation
+            self._matrix[free, free - stride] = normalisation
 
-                # Neighbouring points
-                point[idx + index] = normalisation
-                point[idx - index] = normalisation
+        cache.put(key, self._matrix)
 
     @decorator.logThis(filename=None)
     def _step_forward(self):
@@ -262,13 +765,508 @@ class LaplaceModel(AbstractModel):
             This method is for internal use only. Please use forward()
             instead.
         """
-        data_aux = self._data.flatten()
-        data_aux = self._matrix.dot(data_aux)
+        if self.solver == 'stencil':
+
+            self._data = self._stencil_step(self._data)
+            return
+
+        if self.solver == 'processes':
+
+            self._domain_step()
+            return
+
+        if self.solver == 'memmap':
+
+            self._memmap_step()
+            return
+
+        if self.solver == 'active':
+
+            self._active_step()
+            return
+
+        if self.solver == 'spectral':
+
+            self._spectral_step()
+            return
+
+        if self.batch:
+
+            # One matrix-matrix product for all cases
+            data_aux = self._data.reshape((len(self._data), -1))
+            data_aux = data_aux.dot(self._matrix.T)
+
+        else:
+
+            data_aux = self._data.flatten()
+            data_aux = self._matrix.dot(data_aux)
 
         self._data = np.reshape(data_aux, self._data.shape)
 
+    def _stencil_step(self, data):
+        """Does one Jacobi step on the grid, split into slabs along the
+        slowest axis of the grid which are updated by a thread pool.
+
+        Note:
+            This method is for internal use only. Please use forward()
+            instead.
+        """
+
+        new_data = np.empty_like(data)
+        lead = (slice(None), ) * (data.ndim - len(self.grid_shape))
+        rows = self.grid_shape[0] - 2
+
+        # The outer edge is always boundary
+        for axis in range(len(self.grid_shape)):
+
+            for position in (0, -1):
+
+                index = lead + (slice(None), ) * axis + (position, )
+                new_data[index] = data[index]
+
+        slabs = min(self.workers, rows)
+
+        if slabs <= 1:
+
+            kernels.jacobi_slab(data, new_data, self.boundary, 1, rows + 1)
+
+        else:
+
+            if self._pool is None:
+
+                self._pool = ThreadPoolExecutor(max_workers=self.workers)
+
+            bounds = np.linspace(1, rows + 1, slabs + 1).astype(int)
+            futures = [
+                self._pool.submit(kernels.jacobi_slab, data, new_data,
+                                  self.boundary, first, last)
+                for first, last in zip(bounds[:-1], bounds[1:])
+            ]
+
+            for future in futures:
+
+                future.result()
+
+        return new_data
+
+    def _domain_step(self):
+        """Does one Jacobi step on the worker processes.
+
+        Note:
+            This method is for internal use only. Please use forward()
+            instead.
+        """
+
+        if self._domain is None:
+
+            self._domain = parallel.DomainDecomposition(
+                self._data, self.boundary, self.workers)
+
+        elif self._data is not self._reduced_data:
+
+            # Data was changed outside the domain (backward, reset, ...)
+            self._domain.load(self._data)
+
+        mean, change = self._domain.step()
+
+        # The shared state is overwritten two steps later, so only a
+        # history needs its own copy. Without history the data is a read
+        # only view, valid until the next step.
+        if self.max_history > 0:
+
+            data = np.array(self._domain.current())
+
+        else:
+
+            data = self._domain.current().view()
+            data.flags.writeable = False
+
+        self._data = self._reduced_data = data
+        self._reductions = (self.count_iteration + 1, mean, change)
+
+    def _close_domain(self):
+
+        if self._domain is not None:
+
+            if self._data is self._reduced_data:
+
+                # Keeps the current state once the shared memory is gone
+                self._data = np.array(self._data)
+
+            self._domain.close()
+            self._domain = self._reduced_data = self._reductions = None
+
+    def _blocks(self):
+        """Yields the slabs (first and last row) the memmap solver reads
+        into memory at once."""
+
+        rows = self.grid_shape[0]
+        row_bytes = max(self.initial[:1].nbytes, 1)
+        step = max(int(self.block_bytes // row_bytes), 1)
+
+        for first in range(0, rows, step):
+
+            yield first, min(first + step, rows)
+
+    def _state_files(self):
+
+        if (self._states is None or self._states[0].shape != self.grid_shape
+                or self._states[0].dtype != self.dtype):
+
+            self._states = [
+                np.memmap(os.path.join(self.directory,
+                                       'state_{}.dat'.format(number)),
+                          dtype=self.dtype,
+                          mode='w+',
+                          shape=self.grid_shape) for number in range(2)
+            ]
+
+        return self._states
+
+    def _memmap_reset(self):
+        """Copies the initial condition block by block into the first state
+        file.
+
+        Note:
+            This method is for internal use only. Please use reset()
+            instead.
+        """
+
+        state = self._state_files()[0]
+        total = count = 0
+
+        for first, last in self._blocks():
+
+            block = np.array(self.initial[first:last])
+            state[first:last] = block
+            total += np.nansum(block)
+            count += np.count_nonzero(~np.isnan(block))
+
+        self._data = self._reduced_data = state
+        self._reductions = (0, total / count if count else np.nan, 0.)
+
+    def _memmap_step(self):
+        """Does one Jacobi step from one state file into the other, one
+        block of rows (and the rows next to it, the ghost layers) in memory
+        at a time. The blocks are visited in file order, so each is read
+        once per step.
+
+        Note:
+            This method is for internal use only. Please use forward()
+            instead.
+        """
+
+        states = self._state_files()
+        data = self._data
+        new_data = states[1] if data is states[0] else states[0]
+        rows = self.grid_shape[0]
+        total = count = change = 0
+
+        for first, last in self._blocks():
+
+            # Block including the ghost layers
+            lower, upper = max(first - 1, 0), min(last + 1, rows)
+            block = np.array(data[lower:upper])
+            new_block = block.copy()
+
+            # The first and last row are boundary and never change
+            inner_first, inner_last = max(first, 1), min(last, rows - 1)
+
+            if inner_first < inner_last:
+
+                kernels.jacobi_slab(block, new_block,
+                                    self.boundary[lower:upper],
+                                    inner_first - lower, inner_last - lower)
+
+            old = block[first - lower:last - lower]
+            new = new_block[first - lower:last - lower]
+            new_data[first:last] = new
+
+            total += np.nansum(new)
+            count += np.count_nonzero(~np.isnan(new))
+            change += np.nansum(np.abs(new - old))
+
+        self._data = self._reduced_data = new_data
+        self._reductions = (self.count_iteration + 1,
+                            total / count if count else np.nan, change)
+
+    def _active_step(self):
+        """Does one Jacobi step, only on the active points unless a full
+        sweep is due. Active points are gathered by flat index, so apart
+        from copying the state for the history the work is proportional to
+        the active set. With max_history=0 the state is updated in place.
+
+        Note:
+            This method is for internal use only. Please use forward()
+            instead.
+        """
+
+        data = self._data
+        full = (self._active is None or self._data is not self._reduced_data
+                or (self.count_iteration + 1) % self.full_sweep_every == 0)
+
+        if full:
+
+            new_data = self._stencil_step(data)
+            change = np.abs(new_data - data)
+            changed = np.flatnonzero(change > self.active_threshold)
+            self._active_count = np.count_nonzero(~np.isnan(new_data))
+            mean = np.nanmean(new_data)
+            abs_change = np.nansum(change)
+
+        else:
+
+            shape = self.grid_shape
+            strides = [int(np.prod(shape[axis + 1:]))
+                       for axis in range(len(shape))]
+            active = self._active
+            flat = data.ravel()
+
+            # All values are gathered before any is written (Jacobi)
+            values = np.zeros(active.size, dtype=self.dtype)
+
+            for stride in strides:
+
+                values += flat[active + stride]
+                values += flat[active - stride]
+
+            values *= 1 / (2 * len(shape))
+            delta = values - flat[active]
+
+            new_data = data if self.max_history == 0 else data.copy()
+            new_data.ravel()[active] = values
+
+            changed = active[np.abs(delta) > self.active_threshold]
+            _, mean, _ = self._reductions
+            mean = mean + np.nansum(delta) / self._active_count
+            abs_change = np.nansum(np.abs(delta))
+
+        self._active = self._neighbourhood(changed)
+        self._data = self._reduced_data = new_data
+        self._reductions = (self.count_iteration + 1, mean, abs_change)
+
+    def _spectral_step(self):
+        """Advances the data by spectral_jump Jacobi steps.
+
+        Note:
+            This method is for internal use only. Please use forward()
+            instead.
+        """
+
+        if self._spectrum is not None:
+
+            self._data = self._spectral(self._data, self.spectral_jump)
+            return
+
+        # Irregular mask
+        sweeps = 1 if np.isinf(self.spectral_jump) else self.spectral_jump
+
+        for _ in range(int(sweeps)):
+
+            self._data = self._stencil_step(self._data)
+
+    def steady_state(self):
+        """Returns the steady state for the current boundary values, solved
+        directly with sine transforms. Only possible if is_box.
+
+        Returns:
+            numpy array: Data of the steady state.
+        """
+
+        if not self.is_box:
+
+            raise ValueError('The steady state can only be solved directly '
+                             'if the boundary is the outer edge.')
+
+        self._spectrum = kernels.jacobi_spectrum(
+            tuple(length - 2 for length in self.grid_shape))
+
+        return self._spectral(self._data, np.inf)
+
+    def _spectral(self, data, steps):
+        """Returns data advanced by steps Jacobi steps (np.inf for the steady
+        state). A Jacobi step multiplies each sine mode of the inner points
+        by its eigenvalue and adds the (constant) part coming from the
+        boundary, so any number of steps costs two transforms."""
+
+        ndim = len(self.grid_shape)
+        lead = (slice(None), ) * (data.ndim - ndim)
+        inner = lead + (slice(1, -1), ) * ndim
+        axes = range(data.ndim - ndim, data.ndim)
+
+        # Part of a Jacobi step coming from the boundary values
+        outer = np.array(data, dtype=np.float64)
+        outer[inner] = 0
+        source = outer.copy()
+        kernels.jacobi_slab(outer, source, self.boundary, 1,
+                            self.grid_shape[0] - 1)
+
+        modes = np.array(data[inner], dtype=np.float64)
+        source = source[inner]
+
+        for axis in axes:
+
+            modes = kernels.dst1(modes, axis)
+            source = kernels.dst1(source, axis)
+
+        spectrum = self._spectrum
+        steady = source / (1 - spectrum)
+        modes = steady + np.power(spectrum, steps) * (modes - steady)
+
+        for axis in axes:
+
+            modes = kernels.dst1(modes, axis) * (2 / (data.shape[axis] - 1))
+
+        new_data = np.array(data, dtype=self.dtype)
+        new_data[inner] = modes
+
+        return new_data
+
+    def _neighbourhood(self, points):
+        """Returns the non boundary points among points (flat indices) and
+        their neighbours."""
+
+        shape = self.grid_shape
+        candidates = [points]
+
+        for stride in [int(np.prod(shape[axis + 1:]))
+                       for axis in range(len(shape))]:
+
+            # Points of the outer edge are boundary, so their neighbours
+            # never get near the ends of the flat grid
+            candidates.append(points + stride)
+            candidates.append(points - stride)
+
+        candidates = np.unique(np.concatenate(candidates))
+        candidates = candidates[(candidates >= 0)
+                                & (candidates < self.boundary.size)]
+
+        return candidates[~self.boundary.ravel()[candidates]]
+
+    def reset(self):
+
+        if self.solver == 'memmap' and self.initial.size:
+
+            self.count_iteration = 0
+            self._data_history.empty()
+            self._memmap_reset()
+
+        else:
+
+            super().reset()
+
+    def close(self):
+        """Stops the threads and worker processes of the solver and removes
+        temporary state files."""
+
+        self._close_domain()
+
+        if self._pool is not None:
+
+            self._pool.shutdown()
+            self._pool = None
+
+        if self._temporary is not None:
+
+            # Release the mappings before removing the files
+            self._states = self._reduced_data = None
+            self._data = np.array([], dtype=self.dtype)
+            self._temporary.cleanup()
+            self._temporary = None
+
+    def refine(self, tolerance, inner_steps=10, max_steps=1000):
+        """Refines the current state to float64 accuracy.
+
+        Mixed precision iterative refinement: the residual of the Jacobi
+        iteration (the change a step would do) is computed in float64, the
+        correction is approximated by inner_steps Jacobi sweeps in the
+        precision of the model. With float32 most of the work is thereby
+        done in float32, while the result still meets a float64 tolerance.
+        The model itself is not changed. The grid needs to fit in memory.
+
+        Args:
+            tolerance (float): Maximal absolute residual of the result.
+            inner_steps (positive integer, optional): Sweeps per correction.
+            max_steps (positive integer, optional): Maximal number of
+                corrections.
+
+        Returns:
+            tuple: Refined data (numpy array, float64) and the number of
+            corrections done.
+        """
+
+        data = np.array(self._data, dtype=np.float64)
+
+        for step in range(max_steps):
+
+            residual = self._sweep(data)
+            residual -= data
+
+            if not np.nanmax(np.abs(residual), initial=0) > tolerance:
+
+                return data, step
+
+            # Boundaries and edge have no residual, so the correction stays
+            # zero there
+            residual = residual.astype(self.dtype)
+            correction = np.zeros_like(residual)
+
+            for _ in range(inner_steps):
+
+                correction = self._sweep(correction)
+                correction += residual
+
+            data += correction
+
+        return data, max_steps
+
+    def _sweep(self, data):
+        """Returns one Jacobi step of data (in its own precision)."""
+
+        new_data = data.copy()
+        kernels.jacobi_slab(data, new_data, self.boundary, 1,
+                            self.grid_shape[0] - 1)
+
+        return new_data
+
     def _parameters(self):
 
+        size = int(np.prod(self.grid_shape))
+
+        if (self._reductions is not None and self._data is self._reduced_data
+                and self._reductions[0] == self.count_iteration):
+
+            # Already reduced by the workers
+            _, mean, abs_change = self._reductions
+
+            return {
+                'Average Temperature': mean,
+                'Iteration Step': self.count_iteration,
+                'Absolute Change': abs_change,
+                'Relative Change': abs_change / (mean * size)
+            }
+
+        if self.solver == 'memmap':
+
+            # Reduced block by block like a step, the grid may not fit in
+            # memory. There is no history, so nothing changed.
+            total = count = 0
+
+            for first, last in self._blocks():
+
+                block = np.array(self._data[first:last])
+                total += np.nansum(block)
+                count += np.count_nonzero(~np.isnan(block))
+
+            mean = total / count if count else np.nan
+
+            return {
+                'Average Temperature': mean,
+                'Iteration Step': self.count_iteration,
+                'Absolute Change': 0.,
+                'Relative Change': 0. / (mean * size)
+            }
+
         try:
 
             last_data = self._data_history.last()
@@ -277,10 +1275,13 @@ class LaplaceModel(AbstractModel):
 
             last_data = self._data.copy()
 
-        mean = np.nanmean(self._data)
+        # In batch mode all values but the iteration step are per case
+        axis = tuple(range(1, self._data.ndim)) if self.batch else None
+
+        mean = np.nanmean(self._data, axis=axis)
         iter_step = self.count_iteration
-        abs_change = np.nansum(np.abs(self._data - last_data))
-        rel_change = abs_change / (mean * self._data.size)
+        abs_change = np.nansum(np.abs(self._data - last_data), axis=axis)
+        rel_change = abs_change / (mean * size)
 
         parameters = {
             'Average Temperature': mean,
@@ -292,10 +1293,250 @@ class LaplaceModel(AbstractModel):
         return parameters
 
 
+class TransientHeatModel(LaplaceModel):
+    """Class defining a model solving the time dependent heat equation.
+
+    Implicit time stepping (backward Euler or Crank-Nicolson) of
+    du/dt = diffusivity * laplace(u) with fixed temperatures at the
+    boundaries. Both schemes are unconditionally stable, so dt can be far
+    larger than explicit schemes allow. The system is factorised once per
+    geometry, dt, diffusivity and scheme (kept in operator_cache), every
+    step is then a sparse product and two triangular solves. Without scipy
+    a dense propagator (inverse of the system times the explicit part) is
+    used instead, which only suits small grids.
+
+    Args:
+        control (AbstractController): Controller (MVC pattern).
+        max_history (positive integer, optional): The maximal size of the data
+            history. See AbstractController for further information.
+        diffusivity (positive float, optional): Thermal diffusivity.
+        dt (positive float, optional): Time step.
+        spacing (positive float, optional): Distance of the grid points.
+        scheme (string, optional): 'crank-nicolson' (default) or
+            'backward-euler'.
+        dtype (numpy floating dtype, optional): Precision of the data.
+    """
+
+    # Weight of the implicit part of each scheme
+    schemes = {'crank-nicolson': 0.5, 'backward-euler': 1.}
+
+    def __init__(self,
+                 controller,
+                 max_history=100,
+                 diffusivity=1.,
+                 dt=1.,
+                 spacing=1.,
+                 scheme='crank-nicolson',
+                 dtype=np.float_):
+
+        if scheme not in type(self).schemes:
+
+            raise ValueError('Unknown scheme: {}'.format(scheme))
+
+        if min(diffusivity, dt, spacing) <= 0:
+
+            raise ValueError(
+                'diffusivity, dt and spacing need to be positive.')
+
+        self.diffusivity = diffusivity
+        self.dt = dt
+        self.spacing = spacing
+        self.scheme = scheme
+        self._operator = None
+        self._operator_parameters = None
+
+        super().__init__(controller, max_history, dtype=dtype)
+
+    def _system_state(self):
+
+        arrays, scalars = super()._system_state()
+        scalars.update({
+            'diffusivity': self.diffusivity,
+            'dt': self.dt,
+            'spacing': self.spacing,
+            'scheme': self.scheme
+        })
+
+        return arrays, scalars
+
+    def _restore_system(self, arrays, scalars):
+
+        self.diffusivity = scalars['diffusivity']
+        self.dt = scalars['dt']
+        self.spacing = scalars['spacing']
+        self.scheme = scalars['scheme']
+        super()._restore_system(arrays, scalars)
+
+    def _update_matrix(self):
+        """Drops the operator of the old geometry, the new one is factorised
+        on the next step.
+
+        Note:
+            This method is for internal use only. Pleae don't use this method.
+        """
+
+        self._matrix = None
+        self._operator = None
+
+    def _update_rows(self, changed):
+
+        # The factorisation depends on every row
+        self._update_matrix()
+
+    def _laplacian(self):
+        """Returns rows, columns and values of the (unscaled) laplace stencil
+        of all non boundary points."""
+
+        shape = self.grid_shape
+        ndim = len(shape)
+        free = np.flatnonzero(~self.boundary.ravel())
+        strides = [int(np.prod(shape[axis + 1:])) for axis in range(ndim)]
+
+        rows = [free]
+        columns = [free]
+        values = [np.full(free.size, -2. * ndim)]
+
+        for stride in strides:
+
+            for neighbour in (free + stride, free - stride):
+
+                rows.append(free)
+                columns.append(neighbour)
+                values.append(np.ones(free.size))
+
+        return (np.concatenate(rows), np.concatenate(columns),
+                np.concatenate(values))
+
+    def _factorise(self):
+        """Returns the operator for the current parameters, from the cache if
+        possible.
+
+        Note:
+            This method is for internal use only.
+        """
+
+        theta = type(self).schemes[self.scheme]
+        ratio = self.diffusivity * self.dt / self.spacing**2
+        method = 'dense' if sparse is None else 'splu'
+
+        cache = type(self).operator_cache
+        key = cache.key('transient', method, self.dtype.str, self.boundary,
+                        ratio, theta)
+        name = type(self).__name__
+
+        try:
+
+            operator = cache.get(key)
+            self.metrics.counter('operator_cache_hits_total', model=name).inc()
+
+            return operator
+
+        except KeyError:
+
+            self.metrics.counter('operator_cache_misses_total',
+                                 model=name).inc()
+
+        size = int(np.prod(self.grid_shape))
+        rows, columns, values = self._laplacian()
+
+        if sparse is None:
+
+            laplacian = np.zeros((size, size))
+            laplacian[rows, columns] = values
+            identity = np.eye(size)
+            implicit = identity - theta * ratio * laplacian
+            explicit = identity + (1 - theta) * ratio * laplacian
+
+            # Propagator of one step
+            operator = np.linalg.solve(implicit, explicit).astype(self.dtype)
+            nbytes = operator.nbytes
+
+        else:
+
+            laplacian = sparse.csc_matrix((values, (rows, columns)),
+                                          shape=(size, size))
+            identity = sparse.identity(size, format='csc')
+            implicit = (identity - theta * ratio * laplacian).astype(
+                self.dtype)
+            explicit = (identity + (1 - theta) * ratio * laplacian).astype(
+                self.dtype).tocsr()
+
+            factors = sparse_linalg.splu(implicit.tocsc())
+            operator = (explicit, factors)
+            nbytes = sum(matrix.data.nbytes + matrix.indices.nbytes +
+                         matrix.indptr.nbytes
+                         for matrix in (explicit, factors.L, factors.U))
+
+        cache.put(key, operator, nbytes=nbytes)
+
+        return operator
+
+    @decorator.logThis(filename=None)
+    def _step_forward(self):
+        """Advances the simulations by one time step dt.
+
+        Note:
+            This method is for internal use only. Please use forward()
+            instead.
+        """
+
+        if self._data.size == 0:
+
+            return
+
+        parameters = (self.diffusivity, self.dt, self.spacing, self.scheme)
+
+        if self._operator is None or self._operator_parameters != parameters:
+
+            self._operator = self._factorise()
+            self._operator_parameters = parameters
+
+        data_aux = self._data.ravel()
+
+        if sparse is None:
+
+            data_aux = self._operator.dot(data_aux)
+
+        else:
+
+            explicit, factors = self._operator
+            data_aux = factors.solve(explicit.dot(data_aux))
+
+        self._data = np.reshape(data_aux.astype(self.dtype, copy=False),
+                                self._data.shape)
+
+    def _parameters(self):
+
+        parameters = super()._parameters()
+        parameters['Time'] = self.count_iteration * self.dt
+
+        return parameters
+
+
 class LorenzModel(AbstractModel):
-    def __init__(self, controller, max_history=10000):
+    """Lorenz system stepped by a state dependent matrix.
 
-        super().__init__(controller, max_history)
+    Args:
+        solver (string, optional): 'matrix' (default) updates and applies
+            the matrix every step, 'kernel' runs the steps in a loop
+            compiled with Numba if installed (see kernels.lorenz). Use
+            advance() for many steps at once.
+    """
+
+    solvers = ('matrix', 'kernel')
+
+    def __init__(self,
+                 controller,
+                 max_history=10000,
+                 dtype=np.float_,
+                 solver='matrix'):
+
+        if solver not in type(self).solvers:
+
+            raise ValueError('Unknown solver: {}'.format(solver))
+
+        super().__init__(controller, max_history, dtype)
+        self.solver = solver
         self.sys_params = {'timeStep': 0, 'sigma': 0, 'rho': 0, 'beta': 0}
 
     def _update_matrix(self, timeStep=0, sigma=0, rho=0, beta=0):
@@ -309,24 +1550,77 @@ class LorenzModel(AbstractModel):
 
         self._matrix = np.array([[1 - timeStep * sigma, sigma * timeStep, 0],
                                  [timeStep * rho, 1 - timeStep, 0],
-                                 [0, 0, 1 - timeStep * beta]])
+                                 [0, 0, 1 - timeStep * beta]],
+                                dtype=self.dtype)
+
+    def _system_state(self):
+
+        return {'matrix': self._matrix}, {'sys_params': self.sys_params}
+
+    def _restore_system(self, arrays, scalars):
+
+        self.sys_params = dict(scalars['sys_params'])
+        self._matrix = np.array(arrays['matrix'], dtype=self.dtype)
+
+    def _settings(self):
+
+        return {'solver': self.solver}
 
     @decorator.logThis(filename=None)
     def _step_forward(self):
 
+        if self.solver == 'kernel':
+
+            self._data = self._trajectory(1)[0]
+            return
+
         self._matrix[1, 2] = -self.sys_params['timeStep'] * self._data[0]
         self._matrix[2, 0] = self.sys_params['timeStep'] * self._data[1]
         self._data = self._matrix.dot(self._data)
 
+    def _trajectory(self, steps):
+
+        if self.solver != 'kernel':
+
+            return super()._trajectory(steps)
+
+        states, (a12, a20) = kernels.lorenz(self._data, self._matrix,
+                                            self.sys_params['timeStep'],
+                                            steps)
+        self._matrix[1, 2] = a12
+        self._matrix[2, 0] = a20
+
+        return states.astype(self.dtype, copy=False)
+
     def _parameters(self):
 
         return self.sys_params
 
 
 class ThreeBodyModel(AbstractModel):
-    def __init__(self, controller, max_history=10000):
+    """Three body system stepped by a state dependent matrix.
+
+    Args:
+        solver (string, optional): 'matrix' (default) updates and applies
+            the matrix every step, 'kernel' runs the steps in a loop
+            compiled with Numba if installed (see kernels.three_body). Use
+            advance() for many steps at once.
+    """
+
+    solvers = ('matrix', 'kernel')
+
+    def __init__(self,
+                 controller,
+                 max_history=10000,
+                 dtype=np.float_,
+                 solver='matrix'):
+
+        if solver not in type(self).solvers:
 
-        super().__init__(controller, max_history)
+            raise ValueError('Unknown solver: {}'.format(solver))
+
+        super().__init__(controller, max_history, dtype)
+        self.solver = solver
         self.sys_params = {'timeStep': 0, 'G': 0, 'm_1': 0, 'm_2': 0, 'm_3': 0}
 
     def _update_matrix(self, timeStep=0, G=0, m_1=0, m_2=0, m_3=0):
@@ -339,7 +1633,7 @@ class ThreeBodyModel(AbstractModel):
             'm_3': m_3
         })
 
-        self._matrix = np.eye(18)
+        self._matrix = np.eye(18, dtype=self.dtype)
 
         self._matrix[0, 9] = timeStep / m_1
         self._matrix[1, 10] = timeStep / m_1
@@ -351,18 +1645,59 @@ class ThreeBodyModel(AbstractModel):
         self._matrix[7, 16] = timeStep / m_3
         self._matrix[8, 17] = timeStep / m_3
 
+    def _system_state(self):
+
+        return {'matrix': self._matrix}, {'sys_params': self.sys_params}
+
+    def _restore_system(self, arrays, scalars):
+
+        self.sys_params = dict(scalars['sys_params'])
+        self._matrix = np.array(arrays['matrix'], dtype=self.dtype)
+
+    def _settings(self):
+
+        return {'solver': self.solver}
+
     @decorator.logThis(filename=None)
     def _step_forward(self):
 
-        f = self.sys_params['G'] * self.sys_params['timeStep']
-        m_1 = self.sys_params['m_1']
-        m_2 = self.sys_params['m_2']
-        m_3 = self.sys_params['m_3']
+        if self.solver == 'kernel':
+
+            self._data = self._trajectory(1)[0]
+            return
+
         data, _ = self.current()
         r_12 = np.abs(np.linalg.norm(data[0:3] - data[3:6]))**3
         r_13 = np.abs(np.linalg.norm(data[0:3] - data[6:9]))**3
         r_23 = np.abs(np.linalg.norm(data[3:6] - data[6:9]))**3
 
+        self._update_velocity_rows(r_12, r_13, r_23)
+        self._data = self._matrix.dot(self._data)
+
+    def _trajectory(self, steps):
+
+        if self.solver != 'kernel':
+
+            return super()._trajectory(steps)
+
+        states, distances = kernels.three_body(
+            self._data, self.sys_params['timeStep'], self.sys_params['G'],
+            (self.sys_params['m_1'], self.sys_params['m_2'],
+             self.sys_params['m_3']), steps)
+        # The matrix stays as if the steps were done by it
+        self._update_velocity_rows(*distances)
+
+        return states.astype(self.dtype, copy=False)
+
+    def _update_velocity_rows(self, r_12, r_13, r_23):
+        """Sets the entries of the matrix depending on the cubed distances
+        of the bodies."""
+
+        f = self.sys_params['G'] * self.sys_params['timeStep']
+        m_1 = self.sys_params['m_1']
+        m_2 = self.sys_params['m_2']
+        m_3 = self.sys_params['m_3']
+
         for i, row in enumerate(self._matrix[9:12]):
             row[i] = -f * (m_2 / r_12 + m_3 / r_13)
             row[i + 3] = f * m_2 / r_12
@@ -378,8 +1713,47 @@ class ThreeBodyModel(AbstractModel):
             row[i + 3] = f * m_2 / r_23
             row[i + 6] = -f * (m_1 / r_13 + m_2 / r_23)
 
-        self._data = self._matrix.dot(self._data)
+    def _parameters(self):
+
+        return self.sys_params
+
+
+class ReplayModel(AbstractModel):
+    """Model replaying a run recorded with recorder.Recorder instead of
+    computing it.
+
+    The first recorded state is used as initial condition, every step
+    forward returns the next recorded state together with its recorded
+    parameters. At the end of the recording the last state is repeated.
+
+    Args:
+        control (AbstractController): Controller (MVC pattern).
+        recording (recorder.Recording): The recording to replay.
+        max_history (positive integer, optional): The maximal size of the data
+            history. See AbstractController for further information.
+    """
+    def __init__(self, controller, recording, max_history=10000):
+
+        self.recording = recording
+
+        # States are replayed in the precision they were recorded in
+        super().__init__(controller, max_history, recording.dtype)
+        self.initial = recording[0][0]
+
+    def _update_matrix(self):
+        pass
+
+    def _step_forward(self):
+
+        index = min(self.count_iteration + 1, len(self.recording) - 1)
+        self._data = np.array(self.recording[index][0])
 
     def _parameters(self):
 
-        return self.sys_params
\ No newline at end of file
+        if len(self.recording) == 0:
+
+            return {}
+
+        index = min(self.count_iteration, len(self.recording) - 1)
+
+        return self.recording[index][1]
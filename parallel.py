@@ -0,0 +1,207 @@
+"""Process level domain decomposition of the heat model.
+
+The grid is split into slabs along its slowest axis, each owned by a worker
+process. Current and next state live in shared memory blocks every worker
+maps. At each step the workers update their slab (reading the neighbouring
+slabs' outer rows, the halo, directly from shared memory), compute partial
+sums for the global reductions and meet at a barrier, after which the
+states swap roles. Working in separate processes, the sweeps are not
+limited by the GIL.
+"""
+
+import weakref
+import threading
+import multiprocessing
+from multiprocessing import shared_memory
+import numpy as np
+import kernels
+
+# Partial sums per worker: sum and number of values (for the mean) and the
+# absolute change
+_REDUCTIONS = 3
+
+
+def _attach(name, shape, dtype):
+
+    block = shared_memory.SharedMemory(name=name)
+
+    return block, np.ndarray(shape, dtype=dtype, buffer=block.buf)
+
+
+def _worker(names, shape, dtype, workers, rank, first, last, barrier):
+
+    blocks = []
+    states = []
+
+    for name in names[:2]:
+
+        block, state = _attach(name, shape, dtype)
+        blocks.append(block)
+        states.append(state)
+
+    block, boundary = _attach(names[2], shape, np.bool_)
+    blocks.append(block)
+    block, control = _attach(names[3], (1 + workers * _REDUCTIONS, ),
+                             np.float_)
+    blocks.append(block)
+    reductions = control[1:].reshape((workers, _REDUCTIONS))
+
+    rows = shape[0]
+
+    while True:
+
+        try:
+
+            barrier.wait()
+
+        except threading.BrokenBarrierError:
+
+            # Aborted by the main process
+            break
+
+        current = int(control[0])
+        data, new_data = states[current], states[1 - current]
+
+        # The first and last row are boundary and never change
+        if max(first, 1) < min(last, rows - 1):
+
+            kernels.jacobi_slab(data, new_data, boundary, max(first, 1),
+                                min(last, rows - 1))
+
+        old, new = data[first:last], new_data[first:last]
+        reductions[rank] = (np.nansum(new), np.count_nonzero(~np.isnan(new)),
+                            np.nansum(np.abs(new - old)))
+
+        try:
+
+            barrier.wait()
+
+        except threading.BrokenBarrierError:
+
+            break
+
+
+def _release(processes, barrier, blocks):
+
+    barrier.abort()
+
+    for process in processes:
+
+        process.join(timeout=5)
+
+        if process.is_alive():
+
+            process.terminate()
+
+    for block in blocks:
+
+        try:
+
+            block.close()
+
+        except BufferError:
+
+            # Views of the block are still in use, the memory is freed
+            # once they are gone
+            pass
+
+        block.unlink()
+
+
+class DomainDecomposition():
+    """Jacobi sweeps of one grid distributed over worker processes.
+
+    Args:
+        data (numpy array): Initial state of the grid.
+        boundary (numpy array, bool_): Boundary mask of the grid. The outer
+            edge needs to be boundary.
+        workers (positive integer): Number of worker processes.
+    """
+
+    def __init__(self, data, boundary, workers):
+
+        shape = data.shape
+        dtype = data.dtype
+        workers = max(min(workers, shape[0]), 1)
+
+        self.workers = workers
+        self._blocks = [
+            shared_memory.SharedMemory(create=True, size=max(data.nbytes, 1))
+            for _ in range(2)
+        ]
+        self._blocks.append(
+            shared_memory.SharedMemory(create=True,
+                                       size=max(boundary.nbytes, 1)))
+        self._blocks.append(
+            shared_memory.SharedMemory(create=True,
+                                       size=8 * (1 + workers * _REDUCTIONS)))
+
+        self._states = [
+            np.ndarray(shape, dtype=dtype, buffer=block.buf)
+            for block in self._blocks[:2]
+        ]
+        np.ndarray(shape, dtype=np.bool_,
+                   buffer=self._blocks[2].buf)[...] = boundary
+        # Index of the current state followed by the partial sums
+        self._control = np.ndarray((1 + workers * _REDUCTIONS, ),
+                                   dtype=np.float_,
+                                   buffer=self._blocks[3].buf)
+        self._control[:] = 0
+        self._reductions = self._control[1:].reshape((workers, _REDUCTIONS))
+        self.load(data)
+
+        context = multiprocessing.get_context()
+        self._barrier = context.Barrier(workers + 1)
+        bounds = np.linspace(0, shape[0], workers + 1).astype(int)
+        names = [block.name for block in self._blocks]
+
+        self._processes = [
+            context.Process(target=_worker,
+                            args=(names, shape, dtype, workers, rank,
+                                  int(bounds[rank]), int(bounds[rank + 1]),
+                                  self._barrier),
+                            daemon=True) for rank in range(workers)
+        ]
+
+        for process in self._processes:
+
+            process.start()
+
+        self._finalizer = weakref.finalize(self, _release, self._processes,
+                                           self._barrier, self._blocks)
+
+    def load(self, data):
+        """Replaces the state of the grid."""
+
+        for state in self._states:
+
+            state[...] = data
+
+        self._control[0] = 0
+
+    def step(self):
+        """Does one Jacobi step on all workers.
+
+        Returns:
+            tuple: Global mean and absolute change of the new state.
+        """
+
+        # Start the workers and wait for all of them to finish
+        self._barrier.wait()
+        self._barrier.wait()
+
+        self._control[0] = 1 - self._control[0]
+        total, count, change = self._reductions.sum(axis=0)
+
+        return total / count if count else np.nan, change
+
+    def current(self):
+        """Returns the current state (a view of the shared memory)."""
+
+        return self._states[int(self._control[0])]
+
+    def close(self):
+        """Stops the workers and frees the shared memory."""
+
+        self._states = self._control = self._reductions = None
+        self._finalizer()
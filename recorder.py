@@ -0,0 +1,287 @@
+"""Recording of simulation runs to disk and reading them back.
+
+A recording is a directory holding the states of a run in chunks of
+.npy files (states_00000.npy, ...), the numeric parameters of every step
+in matching files (parameters_00000.npy, ...) and an index file
+(index.json) describing them. Chunks are plain .npy files and are opened
+memory mapped when read back, so recordings larger than the memory can be
+replayed.
+"""
+
+import os
+import json
+import queue
+from threading import Thread
+import numpy as np
+
+INDEX_FILE = 'index.json'
+
+
+def is_recording(path):
+    """Returns True if path is a recording directory or its index file."""
+
+    if os.path.basename(path) == INDEX_FILE:
+
+        return os.path.isfile(path)
+
+    return os.path.isfile(os.path.join(path, INDEX_FILE))
+
+
+class Recorder():
+    """Records states and parameters of a run into a recording directory.
+
+    States are collected in preallocated chunks. Full chunks are written by a
+    background thread, so the simulation only waits for the disk when more
+    than max_pending chunks are still waiting to be written.
+
+    Note:
+        Can be subscribed to a model directly (see AbstractModel.subscribe)
+        as it is callable with data and parameters. Call close() at the end,
+        otherwise the last (partial) chunk is lost.
+
+    Args:
+        directory (string): Recording directory, created if necessary.
+        chunk_size (positive integer, optional): Number of states per chunk.
+        max_pending (positive integer, optional): Maximal number of full
+            chunks waiting to be written.
+    """
+
+    def __init__(self, directory, chunk_size=4096, max_pending=4):
+
+        os.makedirs(directory, exist_ok=True)
+
+        self.directory = directory
+        self.chunk_size = chunk_size
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = None
+        self._states = None
+        self._parameters = None
+        self._fill = 0
+        self._index = {
+            'length': 0,
+            'chunk_size': chunk_size,
+            'shape': None,
+            'dtype': None,
+            'parameters': [],
+            'integer_parameters': [],
+            'chunks': []
+        }
+
+    def __call__(self, data, parameters=None):
+
+        self.record(data, parameters)
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, *args):
+
+        self.close()
+
+    def record(self, data, parameters=None):
+
+        data = np.asarray(data)
+        parameters = parameters if parameters is not None else {}
+
+        if self._thread is None:
+
+            self._start(data, parameters)
+
+        if self._states is None:
+
+            self._allocate()
+
+        self._states[self._fill] = data
+        self._parameters[self._fill] = [
+            parameters.get(key, np.nan) for key in self._index['parameters']
+        ]
+        self._fill += 1
+
+        if self._fill == self.chunk_size:
+
+            self._hand_over()
+
+    def close(self):
+
+        if self._thread is None:
+
+            return
+
+        if self._fill:
+
+            self._hand_over()
+
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+
+    def _start(self, data, parameters):
+
+        # Only numeric parameters are recorded
+        keys = [
+            key for key, value in parameters.items()
+            if isinstance(value, (int, float, np.number))
+        ]
+        integers = [
+            key for key in keys
+            if isinstance(parameters[key], (int, np.integer))
+        ]
+
+        self._index.update({
+            'shape': list(data.shape),
+            'dtype': data.dtype.str,
+            'parameters': keys,
+            'integer_parameters': integers
+        })
+
+        self._thread = Thread(target=self._write, daemon=True)
+        self._thread.start()
+
+    def _allocate(self):
+
+        shape = (self.chunk_size, ) + tuple(self._index['shape'])
+
+        self._states = np.empty(shape, dtype=self._index['dtype'])
+        self._parameters = np.empty(
+            (self.chunk_size, len(self._index['parameters'])),
+            dtype=np.float_)
+        self._fill = 0
+
+    def _hand_over(self):
+
+        # Blocks only if the writer is max_pending chunks behind
+        self._queue.put(
+            (self._states[:self._fill], self._parameters[:self._fill]))
+        self._states = None
+        self._parameters = None
+        self._fill = 0
+
+    def _write(self):
+
+        while True:
+
+            chunk = self._queue.get()
+
+            if chunk is None:
+
+                break
+
+            states, parameters = chunk
+            number = len(self._index['chunks'])
+            states_file = 'states_{:05d}.npy'.format(number)
+            parameters_file = 'parameters_{:05d}.npy'.format(number)
+
+            np.save(os.path.join(self.directory, states_file), states)
+            np.save(os.path.join(self.directory, parameters_file), parameters)
+
+            self._index['chunks'].append({
+                'states': states_file,
+                'parameters': parameters_file,
+                'length': len(states)
+            })
+            self._index['length'] += len(states)
+            self._write_index()
+
+    def _write_index(self):
+
+        path = os.path.join(self.directory, INDEX_FILE)
+
+        with open(path + '.tmp', 'wt') as file:
+
+            json.dump(self._index, file, indent=1)
+
+        os.replace(path + '.tmp', path)
+
+
+class Recording():
+    """Lazy read access to a recording written by Recorder.
+
+    Args:
+        path (string): Recording directory or its index file.
+    """
+
+    def __init__(self, path):
+
+        if os.path.basename(path) == INDEX_FILE:
+
+            path = os.path.dirname(path)
+
+        with open(os.path.join(path, INDEX_FILE), 'rt') as file:
+
+            index = json.load(file)
+
+        self.directory = path
+        self.shape = tuple(index['shape'])
+        self.dtype = np.dtype(index['dtype'])
+        self.parameter_names = index['parameters']
+        self._integers = set(index['integer_parameters'])
+        self._chunks = index['chunks']
+        self._starts = np.cumsum([0] + [chunk['length']
+                                        for chunk in self._chunks])
+        self._open = {}
+
+    def __len__(self):
+
+        return int(self._starts[-1])
+
+    def __getitem__(self, index):
+        """Returns state and parameters of the step with the given index."""
+
+        states, parameters, offset = self._locate(index)
+        values = parameters[offset]
+
+        parameters = {
+            key: int(value) if key in self._integers else float(value)
+            for key, value in zip(self.parameter_names, values)
+        }
+
+        return states[offset], parameters
+
+    def __iter__(self):
+
+        for index in range(len(self)):
+
+            yield self[index]
+
+    def states(self, start=0, stop=None):
+        """Returns the states from start to stop as one array."""
+
+        stop = len(self) if stop is None else min(stop, len(self))
+        parts = [np.empty((0, ) + self.shape, dtype=self.dtype)]
+
+        for chunk in range(len(self._chunks)):
+
+            first = max(start, int(self._starts[chunk]))
+            last = min(stop, int(self._starts[chunk + 1]))
+
+            if first < last:
+
+                states, _, offset = self._locate(first)
+                parts.append(states[offset:offset + last - first])
+
+        return np.concatenate(parts)
+
+    def _locate(self, index):
+
+        if index < 0:
+
+            index += len(self)
+
+        if not 0 <= index < len(self):
+
+            raise IndexError('Recording index out of range.')
+
+        chunk = int(np.searchsorted(self._starts, index, side='right')) - 1
+
+        if chunk not in self._open:
+
+            self._open[chunk] = tuple(
+                np.load(os.path.join(self.directory, self._chunks[chunk][key]),
+                        mmap_mode='r',
+                        allow_pickle=False)
+                for key in ('states', 'parameters'))
+
+        states, parameters = self._open[chunk]
+
+        return states, parameters, index - int(self._starts[chunk])
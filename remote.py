@@ -0,0 +1,803 @@
+"""Simulation server and clients over a local socket.
+
+A SimulationServer hosts one model and runs it for any number of clients
+connected over TCP (localhost) or a Unix socket. Clients send commands like
+the buttons of the views (step, back, play, stop, reset, load, save,
+resume) and all of them receive the resulting states as frames.
+
+Framing: every frame is an 8 byte header (magic b'NL', kind, a reserved
+byte and the payload length as little endian unsigned 32 bit integer)
+followed by the payload. Commands and replies are JSON. A state frame holds
+the length of a JSON header (iteration, shape, dtype, parameters, ...) as
+unsigned 32 bit integer, the header and the raw data of the state. There is
+no pickle involved. Checkpoints are only saved to and resumed from the
+checkpoint directory of the server (relative paths, save and resume are
+refused without one).
+
+Every client has a small queue of outgoing states. If a client reads slower
+than states are produced, its oldest queued states are dropped, without
+slowing down the simulation or the other clients. While playing, states are
+sent at most max_fps times per second (all states in between are stacked
+into one frame if batch is set, as trajectory views need them).
+
+RemoteController connects the existing views to a server::
+
+    python remote.py heat --port 8765 --case initial_data/case
+
+    controller = remote.RemoteController(port=8765)
+    view = HeatView(controller)
+    controller.view = view
+"""
+
+import os
+import sys
+import json
+import struct
+import asyncio
+import argparse
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import checkpoint
+import controller
+import inputs
+import library
+import metrics
+import model
+
+MAGIC = b'NL'
+HEADER = struct.Struct('<2sBxI')
+STATE_HEADER = struct.Struct('<I')
+
+# Kinds of frames
+COMMAND = 1
+REPLY = 2
+STATE = 3
+
+COMMANDS = ('step', 'back', 'play', 'stop', 'reset', 'load', 'save',
+            'resume')
+
+
+def load(instance, path, boundary_path=None):
+    """Loads the initial (and boundary) condition of a case or of .npy files
+    into instance. Nothing is ever unpickled, so the paths may come from
+    clients.
+
+    Args:
+        instance (AbstractModel): Model to load into.
+        path (string): Case directory (see inputs) or .npy file of the
+            initial condition.
+        boundary_path (string, optional): .npy file of the boundary, if
+            path is a .npy file.
+    """
+
+    if inputs.is_case(path):
+
+        arrays, parameters, _ = inputs.load_case(path)
+
+    else:
+
+        arrays = {'initial': np.load(path, allow_pickle=False)}
+        parameters = {}
+
+        if boundary_path is not None:
+
+            arrays['boundary'] = np.load(boundary_path, allow_pickle=False)
+
+    if 'initialPosition' in arrays:
+
+        instance.initial = arrays['initialPosition']
+        instance._update_matrix(**parameters)
+
+    else:
+
+        instance.initial = arrays['initial']
+        instance.boundary = arrays['boundary']
+
+
+def encode_frame(kind, payload):
+    """Returns the frame (bytes) of kind with payload (bytes)."""
+
+    return HEADER.pack(MAGIC, kind, len(payload)) + payload
+
+
+def encode_message(kind, message):
+    """Returns the frame of kind with message (dict) as JSON payload."""
+
+    return encode_frame(
+        kind, json.dumps(message, default=checkpoint._plain).encode())
+
+
+def encode_state(data, parameters, **header):
+    """Returns the frame of a state.
+
+    Args:
+        data (numpy array): The state.
+        parameters (dict): Parameters of the state.
+        **header: Further JSON serialisable fields of the header.
+    """
+
+    data = np.ascontiguousarray(data)
+    header.update({
+        'shape': list(data.shape),
+        'dtype': data.dtype.str,
+        'parameters': parameters
+    })
+    header = json.dumps(header, default=checkpoint._plain).encode()
+
+    return encode_frame(
+        STATE,
+        STATE_HEADER.pack(len(header)) + header + data.tobytes())
+
+
+def decode_state(payload):
+    """Returns data (numpy array) and header (dict) of a state payload."""
+
+    length, = STATE_HEADER.unpack_from(payload)
+    start = STATE_HEADER.size + length
+    header = json.loads(payload[STATE_HEADER.size:start].decode())
+    data = np.frombuffer(payload, dtype=header['dtype'],
+                         offset=start).reshape(header['shape'])
+
+    return data, header
+
+
+async def read_frame(reader):
+    """Reads one frame from a stream.
+
+    Returns:
+        tuple: Kind and payload (bytes) of the frame.
+    """
+
+    magic, kind, length = HEADER.unpack(
+        await reader.readexactly(HEADER.size))
+
+    if magic != MAGIC:
+
+        raise ValueError('Invalid frame.')
+
+    return kind, await reader.readexactly(length)
+
+
+def _steps(message):
+
+    steps = int(message.get('steps', 1))
+
+    if steps < 1:
+
+        raise ValueError('steps needs to be positive.')
+
+    return steps
+
+
+class _Subscriber():
+    """Outgoing frames of one client. States beyond max_states are dropped,
+    oldest first, replies are always kept."""
+
+    def __init__(self, writer, max_states):
+
+        self.writer = writer
+        self.max_states = max_states
+        self.dropped = 0
+        self._frames = deque()
+        self._states = 0
+        self._ready = asyncio.Event()
+
+    def push(self, kind, frame):
+
+        if kind == STATE:
+
+            if self._states >= self.max_states:
+
+                self._drop_oldest_state()
+
+            self._states += 1
+
+        self._frames.append((kind, frame))
+        self._ready.set()
+
+    def _drop_oldest_state(self):
+
+        for index, (kind, _) in enumerate(self._frames):
+
+            if kind == STATE:
+
+                del self._frames[index]
+                self._states -= 1
+                self.dropped += 1
+                metrics.registry.counter('remote_frames_dropped_total').inc()
+                return
+
+    async def run(self):
+        """Writes the queued frames until the connection is closed."""
+
+        while True:
+
+            await self._ready.wait()
+
+            while self._frames:
+
+                kind, frame = self._frames.popleft()
+
+                if kind == STATE:
+
+                    self._states -= 1
+
+                self.writer.write(frame)
+                await self.writer.drain()
+                metrics.registry.counter('remote_frames_sent_total').inc()
+
+            self._ready.clear()
+
+
+class SimulationServer():
+    """Runs a model for the clients connected to a local socket.
+
+    Args:
+        model (AbstractModel): The hosted model, with initial condition (and
+            boundary) set or loaded later by a client.
+        host (string, optional): Address to listen on for TCP.
+        port (integer, optional): TCP port, 0 picks a free one (see
+            address).
+        path (string, optional): Listen on this Unix socket instead of TCP.
+        max_fps (positive integer, optional): States sent per second while
+            playing.
+        max_states (positive integer, optional): States queued per client
+            before its oldest ones are dropped.
+        batch (bool, optional): Send all states done between two frames
+            while playing (stacked), not only the latest one.
+        checkpoint_directory (string, optional): Directory clients save
+            checkpoints to and resume them from, by relative path. Without
+            it save and resume are refused.
+    """
+
+    def __init__(self,
+                 model,
+                 host='127.0.0.1',
+                 port=0,
+                 path=None,
+                 max_fps=30,
+                 max_states=4,
+                 batch=False,
+                 checkpoint_directory=None):
+
+        self.model = model
+        self.host = host
+        self.port = port
+        self.path = path
+        self.max_fps = max_fps
+        self.max_states = max_states
+        self.batch = batch
+        self.checkpoint_directory = checkpoint_directory
+        self.metrics = metrics.registry
+
+        self._server = None
+        self._subscribers = set()
+        self._handlers = set()
+        self._lock = None
+        self._play_task = None
+        # The model is only used by this thread
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._throttle = library.RenderThrottle(max_fps=max_fps, batch=batch)
+        self._restart()
+
+    @property
+    def address(self):
+        """Port (TCP) or path (Unix socket) the server listens on."""
+
+        return self.path if self.path is not None else self.port
+
+    async def start(self):
+
+        self._lock = asyncio.Lock()
+
+        if self.path is not None:
+
+            self._server = await asyncio.start_unix_server(self._handle,
+                                                           path=self.path)
+
+        else:
+
+            self._server = await asyncio.start_server(self._handle,
+                                                      host=self.host,
+                                                      port=self.port)
+            self.port = self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+
+        if self._server is None:
+
+            await self.start()
+
+        await self._server.serve_forever()
+
+    async def close(self):
+
+        await self._stop_playing()
+        self._server.close()
+
+        for handler in self._handlers:
+
+            handler.cancel()
+
+        await asyncio.gather(*self._handlers, return_exceptions=True)
+        await self._server.wait_closed()
+        self._executor.shutdown()
+
+    def _restart(self):
+
+        self._forward_gen = self.model.forward()
+        self._backward_gen = self.model.backward()
+        self._throttle.clear()
+
+    async def _run(self, function, *args):
+
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, function, *args)
+
+    def _publish(self, data, parameters, **header):
+
+        header['iteration'] = self.model.count_iteration
+        frame = encode_state(data, parameters, **header)
+
+        for subscriber in self._subscribers:
+
+            subscriber.push(STATE, frame)
+
+    async def _publish_current(self, **header):
+
+        data, parameters = await self._run(self.model.current)
+        self._publish(data, parameters, **header)
+
+    async def _handle(self, reader, writer):
+
+        subscriber = _Subscriber(writer, self.max_states)
+        self._subscribers.add(subscriber)
+        self._handlers.add(asyncio.current_task())
+        writing = asyncio.ensure_future(subscriber.run())
+
+        try:
+
+            if self.model.initial.size:
+
+                data, parameters = await self._run(self.model.current)
+                subscriber.push(STATE, encode_state(
+                    data, parameters, iteration=self.model.count_iteration,
+                    reset=True))
+
+            while True:
+
+                kind, payload = await read_frame(reader)
+
+                if kind != COMMAND:
+
+                    continue
+
+                reply = await self._execute(json.loads(payload.decode()))
+                subscriber.push(REPLY, encode_message(REPLY, reply))
+
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+
+            pass
+
+        except asyncio.CancelledError:
+
+            # Cancelled by close(), ends normally as asyncio (before 3.12)
+            # reports cancelled connection handlers as errors
+            pass
+
+        finally:
+
+            self._subscribers.discard(subscriber)
+            self._handlers.discard(asyncio.current_task())
+            writing.cancel()
+            writer.close()
+
+    async def _execute(self, message):
+        """Executes a command and returns the reply."""
+
+        command = message.get('command')
+        reply = {'command': command}
+
+        if command not in COMMANDS:
+
+            reply['error'] = 'Unknown command: {}'.format(command)
+            return reply
+
+        try:
+
+            async with self._lock:
+
+                await getattr(self, '_' + command)(message)
+
+        except Exception as error:  # pylint: disable=broad-except
+
+            # Reported to the client, the server keeps running
+            reply['error'] = '{}: {}'.format(type(error).__name__, error)
+
+        return reply
+
+    def _forward(self, steps):
+
+        for _ in range(steps):
+
+            self._throttle.push(*next(self._forward_gen))
+
+    def _backward(self, steps):
+
+        for _ in range(steps):
+
+            data, parameters = next(self._backward_gen)
+
+        return data, parameters
+
+    async def _step(self, message):
+
+        await self._run(self._forward, _steps(message))
+        self._publish(*self._throttle.flush())
+
+    async def _back(self, message):
+
+        await self._stop_playing()
+
+        # States not sent yet need to be shown before going back
+        if len(self._throttle):
+
+            self._publish(*self._throttle.flush())
+
+        data, parameters = await self._run(self._backward, _steps(message))
+        self._publish(data, parameters, add_data=False)
+
+    async def _play(self, message):
+
+        await self._stop_playing()
+        self._play_task = asyncio.ensure_future(
+            self._playing(float(message.get('speed', np.inf))))
+
+    async def _stop(self, message):
+
+        await self._stop_playing()
+
+        if len(self._throttle):
+
+            self._publish(*self._throttle.flush())
+
+    async def _stop_playing(self):
+
+        if self._play_task is None:
+
+            return
+
+        task, self._play_task = self._play_task, None
+        task.cancel()
+
+        # Returns once a tick still running in the executor is done
+        try:
+
+            await task
+
+        except asyncio.CancelledError:
+
+            pass
+
+    async def _playing(self, speed):
+        """Steps at speed steps per second (np.inf: as fast as possible),
+        sending at most max_fps frames per second."""
+
+        loop = asyncio.get_running_loop()
+
+        if speed == np.inf:
+
+            steps_per_tick, interval = 1, 0
+
+        elif speed > self.max_fps:
+
+            steps_per_tick = int(round(speed / self.max_fps))
+            interval = steps_per_tick / speed
+
+        else:
+
+            steps_per_tick, interval = 1, 1 / speed
+
+        while True:
+
+            start = loop.time()
+
+            async with self._lock:
+
+                tick = asyncio.ensure_future(
+                    self._run(self._forward, steps_per_tick))
+
+                try:
+
+                    await asyncio.shield(tick)
+
+                except asyncio.CancelledError:
+
+                    # The steps can not be interrupted, so the throttle is
+                    # only used by whoever stopped playing once they are done
+                    await tick
+                    raise
+
+                if self._throttle.due():
+
+                    self._publish(*self._throttle.flush())
+
+            await asyncio.sleep(max(interval - (loop.time() - start), 0))
+
+    async def _reset(self, message):
+
+        await self._stop_playing()
+        await self._run(self.model.reset)
+        self._throttle.clear()
+        await self._publish_current(reset=True)
+
+    async def _load(self, message):
+
+        await self._stop_playing()
+        await self._run(load, self.model, message['path'],
+                        message.get('boundary'))
+        self._restart()
+        await self._publish_current(reset=True)
+
+    def _checkpoint_path(self, path):
+        """Returns path inside the checkpoint directory, checkpoints are
+        never written or read anywhere else."""
+
+        if self.checkpoint_directory is None:
+
+            raise ValueError('Checkpoints are disabled on this server.')
+
+        if os.path.isabs(path) or '..' in path.replace('\\', '/').split('/'):
+
+            raise ValueError('Invalid checkpoint path: {}'.format(path))
+
+        directory = os.path.realpath(self.checkpoint_directory)
+        resolved = os.path.realpath(os.path.join(directory, path))
+
+        if os.path.commonpath([directory, resolved]) != directory \
+                or resolved == directory:
+
+            raise ValueError('Invalid checkpoint path: {}'.format(path))
+
+        return resolved
+
+    async def _save(self, message):
+
+        path = self._checkpoint_path(message['path'])
+        await self._run(checkpoint.save, self.model, path,
+                        bool(message.get('include_history', False)))
+
+    async def _resume(self, message):
+
+        path = self._checkpoint_path(message['path'])
+        await self._stop_playing()
+        await self._run(checkpoint.load, self.model, path)
+        self._restart()
+        await self._publish_current(reset=True)
+
+
+class RemoteClient():
+    """Asynchronous client of a SimulationServer.
+
+    Use open() to connect. Commands are sent with send(), states and replies
+    are received in the order the server sent them with receive().
+    """
+
+    def __init__(self, reader, writer):
+
+        self._reader = reader
+        self._writer = writer
+
+    @classmethod
+    async def open(cls, host='127.0.0.1', port=None, path=None):
+
+        if path is not None:
+
+            reader, writer = await asyncio.open_unix_connection(path)
+
+        else:
+
+            reader, writer = await asyncio.open_connection(host, port)
+
+        return cls(reader, writer)
+
+    async def send(self, command, **arguments):
+
+        arguments['command'] = command
+        self._writer.write(encode_message(COMMAND, arguments))
+        await self._writer.drain()
+
+    async def receive(self):
+        """Returns the next frame as kind and content: for states a dict
+        with data and the header fields, for replies the reply."""
+
+        kind, payload = await read_frame(self._reader)
+
+        if kind == STATE:
+
+            data, header = decode_state(payload)
+            header['data'] = data
+
+            return kind, header
+
+        return kind, json.loads(payload.decode())
+
+    async def close(self):
+
+        self._writer.close()
+        await self._writer.wait_closed()
+
+
+class RemoteController(controller.AbstractController):
+    """Controller for the existing views driving a SimulationServer instead
+    of a local model.
+
+    The connection is served by an event loop in a background thread, which
+    updates the view with every received state (like Controller does from
+    its play thread).
+
+    Args:
+        host (string, optional): Address of the server (TCP).
+        port (integer, optional): Port of the server (TCP).
+        path (string, optional): Unix socket of the server instead of TCP.
+    """
+
+    def __init__(self, host='127.0.0.1', port=None, path=None):
+
+        super().__init__()
+
+        self.last_reply = None
+        self._playing = False
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever,
+                                        daemon=True)
+        self._thread.start()
+        self._client = self._call(RemoteClient.open(host, port, path))
+        self._receiving = asyncio.run_coroutine_threadsafe(
+            self._receive(), self._loop)
+
+    def _call(self, coroutine):
+
+        return asyncio.run_coroutine_threadsafe(coroutine,
+                                                self._loop).result()
+
+    def _send(self, command, **arguments):
+
+        self._call(self._client.send(command, **arguments))
+
+    async def _receive(self):
+
+        while True:
+
+            try:
+
+                kind, content = await self._client.receive()
+
+            except (asyncio.IncompleteReadError, ConnectionError):
+
+                return
+
+            if kind == REPLY:
+
+                self.last_reply = content
+
+            elif self.view is not None:
+
+                self._show(content)
+
+    def _show(self, state):
+
+        if state.get('reset', False):
+
+            self.view.reset()
+
+        self.view.update(state['data'],
+                         state['parameters'],
+                         add_data=state.get('add_data', True))
+
+    def stepping(self):
+
+        stepsize = self.view.speed()
+        sender = self.view.sender()
+
+        if stepsize == np.inf:
+
+            # np.inf means realtime -> only one step
+            stepsize = 1
+
+        if sender == self.view.gui_list['Forward Step']:
+
+            self._send('step', steps=stepsize)
+
+        elif sender == self.view.gui_list['Backward Step']:
+
+            self._send('back', steps=stepsize)
+
+    def play(self):
+
+        if self._playing:
+
+            self._send('stop')
+            self.view.gui_list['Play Button'].setText('Start')
+
+        else:
+
+            self._send('play', speed=self.view.speed())
+            self.view.gui_list['Play Button'].setText('Stop')
+
+        self._playing = not self._playing
+
+    def speed_changed(self):
+
+        if self._playing:
+
+            self._send('play', speed=self.view.speed())
+
+    def reset(self):
+
+        self._send('reset')
+
+    def load(self, initial_data_path, boundary_condition_path=None):
+
+        self._send('load', path=initial_data_path,
+                   boundary=boundary_condition_path)
+
+    def save_checkpoint(self, path, include_history=False):
+
+        # The server keeps its checkpoints in its own directory
+        self._send('save',
+                   path=os.path.basename(path),
+                   include_history=include_history)
+
+    def resume(self, path):
+
+        self._send('resume', path=os.path.basename(path))
+
+    def kill_processes(self):
+
+        self._receiving.cancel()
+        self._call(self._client.close())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+
+def main(argv):
+
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('model', choices=('heat', 'lorenz', 'three'))
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--path', help='Unix socket instead of TCP')
+    parser.add_argument('--case', help='case to load at start')
+    parser.add_argument('--checkpoints',
+                        help='directory for the checkpoints of clients')
+    args = parser.parse_args(argv)
+
+    local = controller.Controller()
+    hosted = {
+        'heat': model.LaplaceModel,
+        'lorenz': model.LorenzModel,
+        'three': model.ThreeBodyModel
+    }[args.model](local)
+    server = SimulationServer(hosted,
+                              host=args.host,
+                              port=args.port,
+                              path=args.path,
+                              batch=args.model != 'heat',
+                              checkpoint_directory=args.checkpoints)
+
+    if args.case:
+
+        load(hosted, args.case)
+        server._restart()
+
+    asyncio.run(server.serve_forever())
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,311 @@
+"""Content addressed cache of the results of headless runs.
+
+A run is a model (initial condition, boundary, sys_params, ... and solver
+settings) advanced by a number of steps. Its key is a hash of the type of
+the model, the complete state it starts from (see AbstractModel._state),
+its settings (AbstractModel._settings) and the number of steps, so any
+change of an input is a different run.
+
+The final state is stored as checkpoint (see checkpoint) next to a JSON file
+with the parameters of the last step. The cache is limited by the bytes on
+disk, the least recently used runs are removed first. Repeated runs and
+points of parameter sweeps are then restored instead of computed::
+
+    python resultcache.py heat case_directory --steps 500
+
+Hits and misses are counted in metrics (result_cache_hits_total and
+result_cache_misses_total by model), so they show up in the exported
+metrics as well.
+"""
+
+import os
+import sys
+import json
+import hashlib
+import argparse
+from collections import OrderedDict
+import numpy as np
+import checkpoint
+import controller
+import metrics
+import model
+import remote
+
+CHECKPOINT_SUFFIX = '.ckpt'
+PARAMETERS_SUFFIX = '.json'
+
+
+def fingerprint(instance, steps):
+    """Returns the key of the run of steps steps of a model from its current
+    state."""
+
+    arrays, scalars = instance._state()
+    digest = hashlib.sha256()
+    digest.update(
+        json.dumps(
+            {
+                'model': type(instance).__name__,
+                'steps': steps,
+                'scalars': scalars,
+                'settings': instance._settings()
+            },
+            sort_keys=True,
+            default=checkpoint._plain).encode())
+
+    for name in sorted(arrays):
+
+        array = np.ascontiguousarray(arrays[name])
+        digest.update(repr((name, array.shape, array.dtype.str)).encode())
+        digest.update(array.tobytes())
+
+    return digest.hexdigest()
+
+
+class ResultCache():
+    """Least recently used cache of runs on disk, limited by the bytes its
+    files use.
+
+    The directory can be shared by several processes (and later runs), the
+    runs found in it are taken over when the cache is created.
+    """
+
+    def __init__(self, directory, max_bytes=2**30):
+
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._bytes = 0
+
+        os.makedirs(directory, exist_ok=True)
+        found = []
+
+        for name in os.listdir(directory):
+
+            if name.endswith(PARAMETERS_SUFFIX):
+
+                key = name[:-len(PARAMETERS_SUFFIX)]
+                path = self._path(key, PARAMETERS_SUFFIX)
+                found.append((os.path.getmtime(path), key))
+
+        for _, key in sorted(found):
+
+            self._items[key] = self._size(key)
+            self._bytes += self._items[key]
+
+    def _path(self, key, suffix):
+
+        return os.path.join(self.directory, key + suffix)
+
+    def _size(self, key):
+
+        try:
+
+            return (os.path.getsize(self._path(key, CHECKPOINT_SUFFIX)) +
+                    os.path.getsize(self._path(key, PARAMETERS_SUFFIX)))
+
+        except FileNotFoundError:
+
+            return 0
+
+    def __contains__(self, key):
+
+        return key in self._items
+
+    def __len__(self):
+
+        return len(self._items)
+
+    @property
+    def nbytes(self):
+
+        return self._bytes
+
+    def get(self, key, instance):
+        """Restores the final state of a run into instance (of the model type
+        of the run) and returns the parameters of its last step.
+
+        Raises:
+            KeyError: If the run is not cached.
+        """
+
+        name = type(instance).__name__
+
+        try:
+
+            with open(self._path(key, PARAMETERS_SUFFIX), 'rt') as file:
+
+                parameters = json.load(file)
+
+            checkpoint.load(instance, self._path(key, CHECKPOINT_SUFFIX))
+
+        except FileNotFoundError:
+
+            # Not cached or removed by another process
+            self._discard(key)
+            self.misses += 1
+            metrics.registry.counter('result_cache_misses_total',
+                                     model=name).inc()
+            raise KeyError(key)
+
+        os.utime(self._path(key, PARAMETERS_SUFFIX))
+
+        if key in self._items:
+
+            self._items.move_to_end(key)
+
+        else:
+
+            # Stored by another process
+            self._items[key] = self._size(key)
+            self._bytes += self._items[key]
+
+        self.hits += 1
+        metrics.registry.counter('result_cache_hits_total', model=name).inc()
+
+        return parameters
+
+    def put(self, key, instance, parameters):
+        """Stores the current state of instance and parameters as result of
+        the run key."""
+
+        # The parameters are written last, they mark a complete entry
+        checkpoint.save(instance, self._path(key, CHECKPOINT_SUFFIX))
+        path = self._path(key, PARAMETERS_SUFFIX)
+
+        with open(path + '.tmp', 'wt') as file:
+
+            json.dump(parameters, file, default=checkpoint._plain)
+
+        os.replace(path + '.tmp', path)
+
+        self._discard(key)
+        self._items[key] = self._size(key)
+        self._bytes += self._items[key]
+
+        while self._bytes > self.max_bytes and len(self._items) > 1:
+
+            self.remove(next(iter(self._items)))
+
+        metrics.registry.gauge('result_cache_bytes').set(self._bytes)
+
+    def remove(self, key):
+
+        self._discard(key)
+
+        for suffix in (PARAMETERS_SUFFIX, CHECKPOINT_SUFFIX):
+
+            try:
+
+                os.remove(self._path(key, suffix))
+
+            except FileNotFoundError:
+
+                pass
+
+    def _discard(self, key):
+
+        self._bytes -= self._items.pop(key, 0)
+
+    def clear(self):
+
+        for key in list(self._items):
+
+            self.remove(key)
+
+        self.hits = 0
+        self.misses = 0
+
+    def run(self, instance, steps):
+        """Advances instance by steps steps, restoring the result if the run
+        is cached and storing it otherwise.
+
+        After a restored run the model continues from the final state, but
+        without history to step backwards.
+
+        Returns:
+            tuple: Data and parameters of the last step.
+        """
+
+        key = fingerprint(instance, steps)
+
+        try:
+
+            parameters = self.get(key, instance)
+
+        except KeyError:
+
+            data, parameters = instance.current()
+            iterator = instance.forward()
+
+            for _ in range(steps):
+
+                data, parameters = next(iterator)
+
+            self.put(key, instance, parameters)
+
+            return data, parameters
+
+        data, _ = instance.current()
+
+        return data, parameters
+
+    def stats(self):
+
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': len(self),
+            'bytes': self.nbytes
+        }
+
+
+def main(argv):
+
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('model', choices=('heat', 'lorenz', 'three'))
+    parser.add_argument('case', nargs='+', help='cases to run')
+    parser.add_argument('--steps', type=int, default=100)
+    parser.add_argument('--solver', default='matrix',
+                        help='solver of the heat model')
+    parser.add_argument('--cache', default='.result_cache',
+                        help='cache directory (default .result_cache)')
+    parser.add_argument('--max-bytes', type=int, default=2**30)
+    args = parser.parse_args(argv)
+
+    cache = ResultCache(args.cache, max_bytes=args.max_bytes)
+
+    for case in args.case:
+
+        if args.model == 'heat':
+
+            instance = model.LaplaceModel(controller.Controller(),
+                                          solver=args.solver)
+
+        elif args.model == 'lorenz':
+
+            instance = model.LorenzModel(controller.Controller())
+
+        else:
+
+            instance = model.ThreeBodyModel(controller.Controller())
+
+        remote.load(instance, case)
+        _, parameters = cache.run(instance, args.steps)
+
+        if args.model == 'heat':
+
+            instance.close()
+
+        print(case, json.dumps(parameters, default=checkpoint._plain))
+
+    print('cache: {hits} hits, {misses} misses, {entries} entries, '
+          '{bytes} bytes'.format(**cache.stats()))
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,196 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import amr
+import checkpoint
+import controller
+import model
+
+
+def hot_wire(size=33):
+
+    # Thin hot obstacle in the middle of a cold box
+    initial = np.zeros((size, size))
+    boundary = np.ones((size, size))
+    boundary[1:-1, 1:-1] = 0
+    middle = size // 2
+    boundary[middle, middle - 2:middle + 3] = 1
+    initial[middle, middle - 2:middle + 3] = 100
+
+    return initial, boundary
+
+
+class TestAMRHeatModel(unittest.TestCase):
+    def setUp(self):
+
+        self.model = amr.AMRHeatModel(controller.Controller())
+        self.initial, self.boundary = hot_wire()
+        self.model.initial = self.initial
+        self.model.boundary = self.boundary
+
+    def test_interpolate(self):
+
+        coarse = np.array([[0, 2], [4, 6]])
+        fine = amr.interpolate(coarse, 2)
+
+        self.assertEqual(fine.shape, (3, 3))
+        self.assertEqual((fine == [[0, 1, 2], [2, 3, 4], [4, 5, 6]]).all(),
+                         True)
+
+    def test_refinement(self):
+
+        fow_iter = self.model.forward()
+        data, parameters = next(fow_iter)
+
+        # Only the tiles around the wire are refined
+        patches = self.model.patches()
+
+        self.assertEqual(len(patches), 4)
+        self.assertEqual(parameters['Patches'], 4)
+        self.assertLess(self.model.point_count(),
+                        self.model.uniform_point_count() / 3)
+
+        # The refined part shrinks with the size of the domain
+        large = amr.AMRHeatModel(controller.Controller())
+        large.initial, large.boundary = hot_wire(129)
+        large.regrid()
+
+        self.assertLess(large.point_count(), large.uniform_point_count() / 10)
+
+        for _ in range(5000):
+            data, parameters = next(fow_iter)
+
+        # Converged: the patches are at their fine steady state and agree
+        # with the coarse grid at the shared points
+        for patch in patches:
+
+            before = patch.data.copy()
+            patch.sweep()
+
+            self.assertLess(np.abs(patch.data - before).max(), 1e-6)
+            self.assertEqual(
+                np.allclose(patch.data[::4, ::4], data[patch.region()]),
+                True)
+
+        uniform = self.model.uniform()
+
+        self.assertEqual(uniform.shape, (129, 129))
+        self.assertEqual(np.allclose(uniform[::4, ::4], data), True)
+        self.assertEqual(uniform[64, 56:73].min(), 100)
+
+    def test_no_refinement(self):
+
+        # Without patches the composite solve is the plain stencil solve
+        coarse = amr.AMRHeatModel(controller.Controller(),
+                                  refine_threshold=2)
+        coarse.initial = self.initial
+        coarse.boundary = self.boundary
+
+        stencil = model.LaplaceModel(controller.Controller(),
+                                     solver='stencil')
+        stencil.initial = self.initial
+        stencil.boundary = self.boundary
+
+        for (data, _), (expected, _) in zip(
+                (next(coarse.forward()) for _ in range(5)),
+                (next(stencil.forward()) for _ in range(5))):
+
+            self.assertEqual((data == expected).all(), True)
+
+        self.assertEqual(coarse.patches(), [])
+
+    def test_backward_and_checkpoint(self):
+
+        fow_iter = self.model.forward()
+        ba_iter = self.model.backward()
+
+        for _ in range(3):
+            next(fow_iter)
+
+        patch_data = [patch.data.copy() for patch in self.model.patches()]
+        next(fow_iter)
+        next(ba_iter)
+
+        for patch, expected in zip(self.model.patches(), patch_data):
+            self.assertEqual((patch.data == expected).all(), True)
+
+        with tempfile.TemporaryDirectory() as directory:
+
+            path = os.path.join(directory, 'amr.ckpt')
+            checkpoint.save(self.model, path)
+            restored = amr.AMRHeatModel(controller.Controller())
+            checkpoint.load(restored, path)
+
+            self.assertEqual(len(restored.patches()), 4)
+
+            data, _ = next(restored.forward())
+            expected, _ = next(fow_iter)
+
+            self.assertEqual(np.allclose(data, expected), True)
+
+    def test_resume_backward(self):
+
+        iterator = self.model.forward()
+        states = [next(iterator)[0].copy() for _ in range(5)]
+
+        with tempfile.TemporaryDirectory() as directory:
+
+            path = os.path.join(directory, 'amr.ckpt')
+            checkpoint.save(self.model, path, include_history=True)
+            restored = amr.AMRHeatModel(controller.Controller())
+            checkpoint.load(restored, path)
+
+        backward = restored.backward()
+
+        for expected in reversed(states[:-1]):
+
+            data, _ = next(backward)
+            self.assertEqual(np.allclose(data, expected), True)
+
+        # Stepping forward again uses the restored patches
+        patches = self.model._patch_history.first()
+        self.assertEqual(restored.count_iteration, 1)
+        self.assertEqual(
+            sorted(tile for tile in restored._patches), sorted(patches))
+
+        data, _ = next(restored.forward())
+        self.assertEqual(np.allclose(data, states[1]), True)
+
+        # Going back beyond the history keeps the state
+        for _ in range(3):
+
+            data, _ = next(backward)
+
+        self.assertEqual(restored.count_iteration, 0)
+        self.assertEqual(np.allclose(data, self.initial), True)
+
+        # Without patch history the patches are placed again
+        next(restored.forward())
+        restored._patch_history.empty()
+        next(backward)
+
+        self.assertIsNone(restored._patches)
+
+        data, _ = next(restored.forward())
+
+        self.assertEqual(np.allclose(data, states[0]), True)
+
+    def test_view_ratio(self):
+
+        fine = amr.AMRHeatModel(controller.Controller(), view_ratio=2)
+        fine.initial = self.initial
+        fine.boundary = self.boundary
+        data, _ = next(fine.forward())
+
+        self.assertEqual(data.shape, (65, 65))
+        self.assertRaises(ValueError, amr.AMRHeatModel,
+                          controller.Controller(), view_ratio=3)
+
+    def tearDown(self):
+
+        del self.model
+
+
+if __name__ == '__main__':
+    unittest.main()
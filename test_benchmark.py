@@ -0,0 +1,37 @@
+import unittest
+import benchmark
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_measure(self):
+
+        seconds = benchmark.measure(lambda: sum(range(100)), repeat=2,
+                                    min_time=0.001)
+
+        self.assertGreater(seconds, 0)
+
+    def test_results(self):
+
+        results = benchmark.Results()
+        results.add('linear', 10, 1.)
+        results.add('linear', 100, 10.)
+        results.add('single', None, 2.)
+
+        self.assertEqual(results.timings, {
+            'linear_10': 1.,
+            'linear_100': 10.,
+            'single': 2.
+        })
+        self.assertAlmostEqual(results.exponents()['linear'], 1)
+
+    def test_compare(self):
+
+        baseline = {'fast': 1., 'slow': 1.}
+        timings = {'fast': 1.2, 'slow': 2., 'new': 5.}
+
+        self.assertEqual(benchmark.compare(timings, baseline, 1.5),
+                         {'slow': 2.})
+
+
+if __name__ == '__main__':
+    unittest.main()
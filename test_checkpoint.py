@@ -0,0 +1,117 @@
+import unittest
+import model
+import controller
+import checkpoint
+import fixtures
+import numpy as np
+import os
+
+checkpoint_name = 'test_checkpoint.ckpt'
+
+
+class TestCheckpoint(unittest.TestCase):
+    def _run(self, model, steps):
+
+        forward = model.forward()
+
+        for _ in range(steps):
+
+            data, _ = next(forward)
+
+        return data
+
+    def _laplace(self, **options):
+
+        laplace = model.LaplaceModel(controller.Controller(), **options)
+        laplace.initial = np.load(
+            'initial_data/laplace/testdata_initial_3D.npy')
+        laplace.boundary = np.load(
+            'initial_data/laplace/testdata_boundary_3D.npy')
+
+        return laplace
+
+    def test_laplace(self):
+
+        original = self._laplace()
+        self._run(original, 5)
+        checkpoint.save(original, checkpoint_name, include_history=True)
+        expected = self._run(original, 5)
+
+        restored = model.LaplaceModel(controller.Controller())
+        checkpoint.load(restored, checkpoint_name)
+
+        self.assertEqual(restored.count_iteration, 5)
+        self.assertEqual(len(restored._data_history), 5)
+        self.assertEqual((self._run(restored, 5) == expected).all(), True)
+        self.assertEqual(restored.count_iteration, 10)
+
+    def test_active(self):
+
+        def run(laplace, steps):
+
+            forward = laplace.forward()
+
+            return [next(forward) for _ in range(steps)][-1]
+
+        for max_history in (0, 10):
+
+            original = self._laplace(max_history=max_history,
+                                     solver='active')
+            self._run(original, 5)
+            checkpoint.save(original, checkpoint_name)
+            expected, parameters = run(original, 10)
+
+            restored = model.LaplaceModel(controller.Controller(),
+                                          max_history=max_history,
+                                          solver='active')
+            checkpoint.load(restored, checkpoint_name)
+            data, restored_parameters = run(restored, 10)
+
+            # Bit for bit, the partial updates continue after resuming
+            self.assertEqual((data == expected).all(), True)
+            self.assertEqual(restored_parameters, parameters)
+
+    def test_lorenz(self):
+
+        original = fixtures.lorenz()
+        self._run(original, 100)
+        checkpoint.save(original, checkpoint_name)
+        expected = self._run(original, 100)
+
+        restored = model.LorenzModel(controller.Controller())
+        checkpoint.load(restored, checkpoint_name)
+
+        self.assertEqual(restored._data_history.isempty(), True)
+        self.assertEqual(restored.sys_params, original.sys_params)
+        self.assertEqual((self._run(restored, 100) == expected).all(), True)
+
+    def test_overwrite(self):
+
+        original = self._laplace()
+        self._run(original, 5)
+        checkpoint.save(original, checkpoint_name)
+
+        restored = model.LaplaceModel(controller.Controller())
+        checkpoint.load(restored, checkpoint_name)
+        checkpoint.save(restored, checkpoint_name)
+
+        self.assertEqual(
+            (restored.current()[0] == original.current()[0]).all(),
+            True)
+
+    def test_wrong_model(self):
+
+        checkpoint.save(self._laplace(), checkpoint_name)
+        lorenz = model.LorenzModel(controller.Controller())
+
+        self.assertRaises(TypeError, checkpoint.load, lorenz, checkpoint_name)
+
+    def tearDown(self):
+
+        if os.path.exists(checkpoint_name):
+
+            os.remove(checkpoint_name)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,9 +1,12 @@
 import unittest
+import decorator
 from decorator import logThis
 import os
 import time
 
 logfile_name = 'test_logfile.log'
+profile_name = 'test_profile.log'
+disabled_name = 'test_disabled.log'
 sleep_time = 0.01
 
 
@@ -20,10 +23,68 @@ class TestDecorator(unittest.TestCase):
 
             self.assertEqual(len(list(file)), 1)
 
+    def test_profile(self):
+        @logThis(filename=logfile_name, timed=True)
+        def profiled_sleep(sleep_time):
+
+            time.sleep(sleep_time)
+
+        decorator.configure(mode=decorator.PROFILE,
+                            sample_every=2,
+                            flush_interval=None,
+                            filename=profile_name)
+
+        for _ in range(6):
+
+            profiled_sleep(sleep_time / 10)
+
+        histogram = decorator.profiles[profiled_sleep.__qualname__]
+        self.assertEqual(histogram.count, 3)
+        self.assertGreaterEqual(histogram.mean(), sleep_time / 10)
+        self.assertGreaterEqual(histogram.percentile(50), sleep_time / 10)
+
+        decorator.configure(mode=decorator.OFF)
+        profiled_sleep(sleep_time / 10)
+        self.assertEqual(histogram.count, 3)
+
+        with open(profile_name, 'rt') as file:
+
+            self.assertEqual(len(list(file)), 1)
+
+        decorator.configure(mode=decorator.LOG)
+
+    def test_disabled(self):
+        @logThis(filename=disabled_name, timed=True)
+        def sleep(sleep_time):
+
+            time.sleep(sleep_time)
+
+        sleep(0)
+
+        with open(disabled_name, 'rt') as file:
+
+            lines = len(list(file))
+
+        with decorator.disabled():
+
+            sleep(0)
+
+        with open(disabled_name, 'rt') as file:
+
+            self.assertEqual(len(list(file)), lines)
+
+        sleep(0)
+
+        with open(disabled_name, 'rt') as file:
+
+            self.assertEqual(len(list(file)), lines + 1)
+
     @classmethod
     def tearDownClass(self):
 
         os.remove(logfile_name)
+        os.remove(profile_name)
+        os.remove(disabled_name)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,72 @@
+import unittest
+import generators
+import model
+import controller
+
+
+class TestGenerators(unittest.TestCase):
+    def test_walls(self):
+
+        initial, boundary = generators.build({
+            'shape': [5, 7],
+            'background': 1,
+            'walls': {
+                'default': 0,
+                'y+': 3
+            }
+        })
+
+        self.assertEqual(initial.shape, (5, 7))
+        self.assertEqual(boundary.sum(), 2 * 5 + 2 * 7 - 4)
+        self.assertEqual((initial[1:-1, -1] == 3).all(), True)
+        self.assertEqual((initial[0, :-1] == 0).all(), True)
+        self.assertEqual((initial[1:-1, 1:-1] == 1).all(), True)
+
+    def test_obstacles(self):
+
+        spec = {
+            'shape': [21, 21, 21],
+            'random': {
+                'low': 2,
+                'high': 3,
+                'seed': 0
+            },
+            'obstacles': [{
+                'box': {
+                    'lower': [0.5, 0.5, 0.5],
+                    'upper': [0.6, 0.6, 0.6]
+                },
+                'temperature': 50
+            }, {
+                'sphere': {
+                    'center': [0.25, 0.25, 0.25],
+                    'radius': 0.1
+                },
+                'temperature': -1
+            }],
+            'hot_spots': [{
+                'center': [0.75, 0.25, 0.5],
+                'radius': 0.1,
+                'temperature': 9
+            }]
+        }
+        initial, boundary = generators.build(spec)
+
+        self.assertEqual((initial[10:13, 10:13, 10:13] == 50).all(), True)
+        self.assertEqual(boundary[10:13, 10:13, 10:13].all(), True)
+        self.assertEqual((initial[5, 5, 5], boundary[5, 5, 5]), (-1, True))
+        self.assertEqual((initial[15, 5, 10], boundary[15, 5, 10]),
+                         (9, False))
+        self.assertEqual(boundary[5, 5, 8], False)
+        self.assertEqual(2 <= initial[5, 5, 8] <= 3, True)
+        self.assertEqual((generators.build(spec)[0] == initial).all(), True)
+
+        laplace = model.LaplaceModel(controller.Controller())
+        laplace.initial = initial
+        laplace.boundary = boundary
+
+        self.assertEqual((laplace.boundary == boundary).all(), True)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+import inputs
+import model
+import controller
+import numpy as np
+import shutil
+import json
+import os
+
+case_name = 'test_case'
+
+
+class TestInputs(unittest.TestCase):
+    def setUp(self):
+
+        self.initial = np.load('initial_data/laplace/testdata_initial_3D.npy')
+        self.boundary = np.load(
+            'initial_data/laplace/testdata_boundary_3D.npy').astype(np.bool_)
+
+    def test_case(self):
+
+        arrays = {'initial': self.initial, 'boundary': self.boundary}
+        inputs.save_case(case_name,
+                         arrays,
+                         parameters={'timeStep': 0.1},
+                         model='heat')
+
+        self.assertEqual(inputs.is_case(case_name), True)
+        self.assertEqual(
+            os.path.getsize(os.path.join(case_name, 'boundary.npy')) <
+            self.boundary.nbytes, True)
+
+        arrays, parameters, name = inputs.load_case(
+            os.path.join(case_name, inputs.HEADER_FILE))
+
+        self.assertEqual(name, 'heat')
+        self.assertEqual(parameters, {'timeStep': 0.1})
+        self.assertIsInstance(arrays['initial'], np.memmap)
+        self.assertEqual((arrays['initial'] == self.initial).all(), True)
+        self.assertEqual(arrays['boundary'].dtype, np.bool_)
+        self.assertEqual((arrays['boundary'] == self.boundary).all(), True)
+
+        laplace = model.LaplaceModel(controller.Controller())
+        laplace.initial = arrays['initial']
+        laplace.boundary = arrays['boundary']
+
+        self.assertEqual((laplace.current()[0] == self.initial).all(), True)
+
+    def test_invalid_file(self):
+
+        inputs.save_case(case_name, {'initial': self.initial})
+
+        with open(os.path.join(case_name, inputs.HEADER_FILE), 'wt') as file:
+
+            json.dump({'arrays': {'initial': {'file': '../initial.npy'}}},
+                      file)
+
+        self.assertRaises(ValueError, inputs.load_case, case_name)
+
+        for filename in ('.', '..', ''):
+
+            with open(os.path.join(case_name, inputs.HEADER_FILE),
+                      'wt') as file:
+
+                json.dump({'arrays': {'initial': {'file': filename}}}, file)
+
+            self.assertRaises(ValueError, inputs.load_case, case_name)
+
+        # Links leaving the case directory are refused as well
+        os.symlink(os.path.abspath('initial_data/laplace/'
+                                   'testdata_initial_3D.npy'),
+                   os.path.join(case_name, 'link.npy'))
+
+        with open(os.path.join(case_name, inputs.HEADER_FILE), 'wt') as file:
+
+            json.dump({'arrays': {'initial': {'file': 'link.npy'}}}, file)
+
+        self.assertRaises(ValueError, inputs.load_case, case_name)
+
+    def tearDown(self):
+
+        shutil.rmtree(case_name, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,7 @@
 import unittest
 import library
+import numpy as np
+import shutil
 
 
 class TestBufferQueue(unittest.TestCase):
@@ -29,10 +31,150 @@ class TestBufferQueue(unittest.TestCase):
         self.assertEqual(self.queue.pop(), self.maxsize, "Wrong element.")
         self.assertEqual(len(self.queue), self.maxsize - 1, 'Wrong size.')
 
+    def test_disabled(self):
+
+        queue = library.BufferQueue(maxsize=0)
+        queue.put(1)
+
+        self.assertEqual(queue.isempty(), True, 'Not empty.')
+
+    def test_extend(self):
+
+        self.queue.put(-1)
+        self.queue.extend(range(15))
+
+        self.assertEqual(list(self.queue), list(range(5, 15)), 'Wrong order.')
+
+        self.queue.extend([])
+
+        self.assertEqual(len(self.queue), self.maxsize, 'Wrong size.')
+
     def tearDown(self):
 
         del self.queue
 
 
+class TestGrowableArray(unittest.TestCase):
+    def setUp(self):
+
+        self.array = library.GrowableArray(width=2, capacity=2)
+
+    def test_growableArray(self):
+
+        self.assertEqual(self.array.isempty(), True, 'Not empty.')
+        self.assertRaises(IndexError, self.array.pop)
+
+        for element in range(5):
+
+            self.array.append((element, element**2))
+
+        self.assertEqual(len(self.array), 5, 'Wrong size.')
+        self.assertEqual(self.array.capacity(), 8, 'Wrong capacity.')
+        self.assertEqual((self.array.view()[:, 1] == [0, 1, 4, 9, 16]).all(),
+                         True, 'Wrong elements.')
+
+        self.array.discard(2)
+        self.assertEqual(len(self.array), 3, 'Wrong size.')
+        self.assertEqual((self.array.pop() == [2, 4]).all(), True,
+                         'Wrong element.')
+
+        self.array.extend(np.ones((10, 2)))
+        self.assertEqual(len(self.array), 12, 'Wrong size.')
+        self.assertEqual(self.array.capacity(), 16, 'Wrong capacity.')
+
+        self.array.empty()
+        self.assertEqual(self.array.isempty(), True, 'Not empty.')
+
+    def tearDown(self):
+
+        del self.array
+
+
+class TestTrajectory(unittest.TestCase):
+    def setUp(self):
+
+        self.trajectory = library.Trajectory(width=3,
+                                             max_vertices=100,
+                                             full_resolution=40)
+
+    def test_decimated(self):
+
+        self.trajectory.extend(np.arange(3 * 50).reshape((50, 3)))
+        self.assertEqual(len(self.trajectory.decimated()), 50, 'Wrong size.')
+
+        self.trajectory.extend(np.arange(3 * 950).reshape((950, 3)))
+        points = self.trajectory.decimated()
+
+        self.assertEqual(len(self.trajectory), 1000, 'Wrong size.')
+        self.assertLessEqual(len(points), 100, 'Too many vertices.')
+        self.assertEqual((points[-40:] == self.trajectory.view()[-40:]).all(),
+                         True, 'Recent points not at full resolution.')
+        self.assertEqual((points[0] == self.trajectory.view()[0]).all(),
+                         True, 'First point missing.')
+
+    def tearDown(self):
+
+        del self.trajectory
+
+
+class TestRenderThrottle(unittest.TestCase):
+    def test_renderThrottle(self):
+
+        throttle = library.RenderThrottle(max_fps=1e-3, batch=True)
+
+        self.assertEqual(throttle.due(), False, 'Due without states.')
+
+        for step in range(3):
+
+            throttle.push(np.array([step, step]), {'Step': step})
+
+        self.assertEqual(throttle.due(), True, 'First frame not due.')
+
+        data, parameters = throttle.flush()
+
+        self.assertEqual(data.shape, (3, 2), 'Wrong batch.')
+        self.assertEqual(parameters['Step'], 2, 'Wrong parameters.')
+
+        throttle.push(np.array([3, 3]))
+        self.assertEqual(throttle.due(), False, 'Frame rate exceeded.')
+
+        throttle.batch = False
+        throttle.push(np.array([4, 4]))
+        data, _ = throttle.flush()
+
+        self.assertEqual((data == [4, 4]).all(), True, 'Not latest state.')
+        self.assertEqual(len(throttle), 0, 'Not empty.')
+
+
+class TestOperatorCache(unittest.TestCase):
+    def setUp(self):
+
+        self.directory = 'test_operator_cache'
+
+    def test_persistence(self):
+
+        cache = library.OperatorCache(max_bytes=100, directory=self.directory)
+        key = cache.key('jacobi', np.ones((2, 2), dtype=bool))
+
+        self.assertNotEqual(key, cache.key('jacobi', np.ones(4, dtype=bool)))
+        self.assertRaises(KeyError, cache.get, key)
+        self.assertEqual(cache.misses, 1)
+
+        cache.put(key, np.arange(4.))
+        cache.put('other', np.arange(10.))
+
+        self.assertNotIn(key, cache)
+
+        # Found on disk again, also by a new cache
+        cache = library.OperatorCache(directory=self.directory)
+
+        self.assertEqual((cache.get(key) == np.arange(4.)).all(), True)
+        self.assertEqual(cache.hits, 1)
+
+    def tearDown(self):
+
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,71 @@
+import json
+import unittest
+import numpy as np
+import memory_profile
+import model
+
+
+class TestMemoryProfile(unittest.TestCase):
+    def setUp(self):
+
+        model.LaplaceModel.operator_cache.clear()
+
+    def test_profile(self):
+
+        configurations = memory_profile.configurations(size=16)
+        matrix = memory_profile.profile(configurations['heat_matrix'],
+                                        steps=5)
+        model.LaplaceModel.operator_cache.clear()
+        stencil = memory_profile.profile(configurations['heat_stencil'],
+                                         steps=5)
+        memmap = memory_profile.profile(configurations['heat_memmap'],
+                                        steps=5)
+
+        # The dense matrix alone has 256**2 values
+        self.assertGreater(matrix['setup_bytes'], 256**2 * 8)
+        self.assertLess(stencil['setup_bytes'], 256**2 * 8)
+        self.assertEqual(matrix['history_bytes_per_state'], 256 * 8)
+        self.assertGreaterEqual(matrix['retained_bytes_per_step'], 256 * 8)
+        self.assertEqual(memmap['history_bytes_per_state'], 0)
+        self.assertLess(memmap['retained_bytes_per_step'], 256 * 8)
+
+    def test_assert_budget(self):
+
+        report = {'peak_bytes': 100, 'step_bytes': 10}
+
+        memory_profile.assert_budget(report, peak_bytes=100)
+
+        self.assertRaises(AssertionError, memory_profile.assert_budget,
+                          report, peak_bytes=100, step_bytes=np.float_(9))
+        self.assertRaises(ValueError, memory_profile.assert_budget, report,
+                          unknown=1)
+
+    def test_budget_file(self):
+
+        with open('memory_budget.json', 'rt') as file:
+
+            budgets = json.load(file)
+
+        # Every configuration limits the allocations of a single step
+        for name in memory_profile.configurations():
+
+            self.assertIn('step_bytes', budgets[name])
+
+        self.assertEqual(
+            memory_profile.main(['--budget', 'memory_budget.json']), 0)
+
+    def test_step_without_logging(self):
+
+        lorenz = memory_profile.profile(
+            memory_profile.configurations()['lorenz'], steps=5)
+
+        # A step of a 3-vector allocates a few small arrays at most
+        self.assertLess(lorenz['step_bytes'], 1024)
+
+    def tearDown(self):
+
+        model.LaplaceModel.operator_cache.clear()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import time
+import unittest
+import metrics
+import model
+import controller
+import decorator
+import os
+
+export_name = 'test_metrics.json'
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    def setUp(self):
+
+        self.registry = metrics.MetricsRegistry()
+
+    def test_metrics(self):
+
+        self.registry.counter('steps', model='A').inc(3)
+        self.registry.gauge('bytes').set(10)
+
+        with self.registry.time('render'):
+            pass
+
+        self.assertEqual(self.registry.counter('steps', model='A').value, 3)
+        self.assertEqual(self.registry.counter('steps', model='B').value, 0)
+        self.assertEqual(self.registry.timer('render').count, 1)
+        self.assertRaises(TypeError, self.registry.gauge, 'render')
+
+        text = self.registry.to_prometheus()
+
+        self.assertIn('steps{model="A"} 3.0', text)
+        self.assertIn('bytes 10.0', text)
+        self.assertIn('render_count 1.0', text)
+
+        self.registry.write(export_name)
+
+        with open(export_name, 'rt') as file:
+
+            self.assertIn('"name": "render"', file.read())
+
+    def test_rate(self):
+
+        counter = metrics.Counter(window=0.05)
+        counter.inc(10)
+
+        self.assertEqual(counter.rate(), 0.)
+
+        time.sleep(0.1)
+        counter.inc(10)
+        first = counter.rate()
+
+        # Another reader sees the same rate, reading changes nothing
+        self.assertGreater(first, 0.)
+        self.assertLessEqual(counter.rate(), first)
+        self.assertGreater(counter.rate(), 0.)
+
+    def test_model_reporting(self):
+
+        laplace = model.LaplaceModel(controller.Controller())
+        laplace.metrics = self.registry
+        laplace.initial = [1, 0, 1]
+        laplace.boundary = [1, 0, 1]
+        forward = laplace.forward()
+
+        for _ in range(5):
+
+            next(forward)
+
+        self.assertEqual(
+            self.registry.counter('model_steps_total',
+                                  model='LaplaceModel').value, 5)
+        self.assertEqual(
+            self.registry.timer('model_step_seconds',
+                                model='LaplaceModel').count, 5)
+        self.assertEqual(
+            self.registry.gauge('model_history_bytes',
+                                model='LaplaceModel').value, 5 * 3 * 8)
+
+        # Nothing is reported with the registry or the instrumentation off
+        self.registry.enabled = False
+        next(forward)
+        self.registry.enabled = True
+
+        with decorator.disabled():
+
+            next(forward)
+
+        self.assertEqual(laplace.count_iteration, 7)
+        self.assertEqual(
+            self.registry.counter('model_steps_total',
+                                  model='LaplaceModel').value, 5)
+
+    def tearDown(self):
+
+        if os.path.exists(export_name):
+
+            os.remove(export_name)
+
+
+if __name__ == '__main__':
+    unittest.main()
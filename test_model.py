@@ -1,6 +1,7 @@
 import unittest
 import model
 import controller
+import fixtures
 import numpy as np
 import os
 
@@ -118,10 +119,555 @@ class TestLaplaceModel(unittest.TestCase):
         self.assertEqual((matrix_slice_should == self.model._matrix[13]).all(),
                          True)
 
+    def test_matrix_non_cubic(self):
+
+        shape = (3, 4, 5)
+        boundary = np.ones(shape)
+        boundary[1, 1:-1, 1:-1] = 0
+
+        self.model.initial = np.zeros(shape)
+        self.model.boundary = boundary
+
+        # Point (1, 1, 1) has the flat index 26 and the strides (20, 5, 1)
+        neighbours = np.flatnonzero(self.model._matrix[26])
+        self.assertEqual(list(neighbours), [6, 21, 25, 27, 31, 46])
+
+    def test_operator_cache(self):
+
+        cache = model.LaplaceModel.operator_cache
+        cache.clear()
+        hits = cache.hits
+
+        self.model.initial = [1, 0, 1]
+        self.model.boundary = [1, 0, 1]
+
+        other = model.LaplaceModel(controller.Controller())
+        other.initial = [5, 3, 2]
+        other.boundary = [1, 0, 1]
+
+        self.assertIs(other._matrix, self.model._matrix)
+        self.assertEqual(cache.hits, hits + 1)
+
+        other.initial = [5, 3, 2, 1]
+        other.boundary = [1, 0, 0, 1]
+
+        self.assertEqual(len(cache), 2)
+
+        cache.max_bytes = other._matrix.nbytes
+        cache.put('large', np.zeros(4))
+
+        self.assertEqual(len(cache), 1)
+        self.assertRaises(KeyError, cache.get, cache.key('jacobi',
+                                                         np.array([1, 0, 1],
+                                                                  dtype=bool)))
+
+        cache.max_bytes = 2**30
+        cache.clear()
+
+    def test_batch(self):
+
+        initial = np.load('initial_data/laplace/testdata_initial_3D.npy')
+        boundary = np.load('initial_data/laplace/testdata_boundary_3D.npy')
+        cases = np.stack((initial, 2 * initial, initial + 1))
+
+        batch = model.LaplaceModel(controller.Controller(), batch=True)
+        batch.initial = cases
+        batch.boundary = boundary
+        batch_iter = batch.forward()
+
+        self.assertEqual(batch.grid_shape, initial.shape)
+        self.assertRaises(TypeError, setattr, batch, 'boundary', cases)
+
+        for _ in range(5):
+            data, parameters = next(batch_iter)
+
+        self.assertEqual(data.shape, cases.shape)
+        self.assertEqual(parameters['Average Temperature'].shape, (3, ))
+
+        for case, expected in enumerate(cases):
+
+            self.model.initial = expected
+            self.model.boundary = boundary
+            fow_iter = self.model.forward()
+
+            for _ in range(5):
+                expected, expected_parameters = next(fow_iter)
+
+            self.assertEqual(np.allclose(data[case], expected), True)
+            self.assertAlmostEqual(
+                parameters['Relative Change'][case],
+                expected_parameters['Relative Change'])
+
+    def test_stencil(self):
+
+        initial = np.random.default_rng(0).random((7, 5, 6))
+        boundary = np.ones(initial.shape)
+        boundary[1:-1, 1:-1, 1:-1] = 0
+        boundary[3, 2, 2] = 1
+
+        self.model.initial = initial
+        self.model.boundary = boundary
+        fow_iter = self.model.forward()
+
+        for workers in (1, 3):
+
+            stencil = model.LaplaceModel(controller.Controller(),
+                                         solver='stencil',
+                                         workers=workers)
+            stencil.initial = initial
+            stencil.boundary = boundary
+            stencil_iter = stencil.forward()
+
+            self.assertIsNone(stencil._matrix)
+
+            for _ in range(5):
+                data, _ = next(stencil_iter)
+
+            if workers == 1:
+
+                for _ in range(5):
+                    expected, _ = next(fow_iter)
+
+                single = data
+
+            self.assertEqual(np.allclose(data, expected), True)
+            self.assertEqual((data == single).all(), True)
+
+        self.assertRaises(ValueError, model.LaplaceModel,
+                          controller.Controller(), solver='unknown')
+
+    def test_processes(self):
+
+        initial = np.random.default_rng(0).random((7, 5, 6))
+        boundary = np.ones(initial.shape)
+        boundary[1:-1, 1:-1, 1:-1] = 0
+        boundary[3, 2, 2] = 1
+
+        self.model.initial = initial
+        self.model.boundary = boundary
+        fow_iter = self.model.forward()
+
+        processes = model.LaplaceModel(controller.Controller(),
+                                       solver='processes',
+                                       workers=3)
+        processes.initial = initial
+        processes.boundary = boundary
+        proc_iter = processes.forward()
+
+        for _ in range(4):
+            expected, expected_parameters = next(fow_iter)
+            data, parameters = next(proc_iter)
+
+        self.assertEqual(np.allclose(data, expected), True)
+
+        for name in expected_parameters:
+            self.assertAlmostEqual(parameters[name], expected_parameters[name])
+
+        # Stepping backward and forward again restarts from the history
+        next(processes.backward())
+        data, parameters = next(proc_iter)
+
+        self.assertEqual(np.allclose(data, expected), True)
+        self.assertEqual(parameters['Iteration Step'], 4)
+
+        processes.close()
+
+        # Without history the shared state is not copied
+        processes = model.LaplaceModel(controller.Controller(),
+                                       max_history=0,
+                                       solver='processes',
+                                       workers=2)
+        processes.initial = initial
+        processes.boundary = boundary
+        proc_iter = processes.forward()
+
+        for _ in range(4):
+            data, _ = next(proc_iter)
+
+        self.assertEqual(data.flags.writeable, False)
+        self.assertEqual(np.shares_memory(data, processes._domain.current()),
+                         True)
+        self.assertEqual(np.allclose(data, expected), True)
+
+        processes.close()
+
+        self.assertEqual(np.allclose(processes.current()[0], expected), True)
+
+        self.assertRaises(ValueError, model.LaplaceModel,
+                          controller.Controller(), batch=True,
+                          solver='processes')
+
+    def test_memmap(self):
+
+        initial = np.random.default_rng(0).random((7, 5, 6))
+        boundary = np.ones(initial.shape)
+        boundary[1:-1, 1:-1, 1:-1] = 0
+        boundary[3, 2, 2] = 1
+
+        self.model.initial = initial
+        self.model.boundary = boundary
+        fow_iter = self.model.forward()
+
+        # Blocks of two rows
+        memmap = model.LaplaceModel(controller.Controller(),
+                                    solver='memmap',
+                                    block_bytes=initial[:2].nbytes)
+        memmap.initial = initial
+        memmap.boundary = boundary
+        mem_iter = memmap.forward()
+
+        data, parameters = memmap.current()
+
+        self.assertIsInstance(data, np.memmap)
+        self.assertAlmostEqual(parameters['Average Temperature'],
+                               initial.mean())
+
+        for _ in range(4):
+            expected, expected_parameters = next(fow_iter)
+            data, parameters = next(mem_iter)
+
+        self.assertIsInstance(data, np.memmap)
+        self.assertEqual(np.allclose(data, expected), True)
+        self.assertEqual(memmap._data_history.isempty(), True)
+
+        for name in expected_parameters:
+            self.assertAlmostEqual(parameters[name], expected_parameters[name])
+
+        # Reduced again block by block after the conditions changed
+        memmap.update_conditions(initial=initial + 1)
+        data, parameters = memmap.current()
+
+        self.assertIsNone(memmap._reductions)
+        self.assertAlmostEqual(parameters['Average Temperature'],
+                               np.array(data).mean())
+        self.assertEqual(parameters['Absolute Change'], 0)
+
+        memmap.close()
+
+    def test_dtype(self):
+
+        initial = np.random.default_rng(0).random((6, 5))
+        boundary = np.ones(initial.shape)
+        boundary[1:-1, 1:-1] = 0
+
+        single = model.LaplaceModel(controller.Controller(),
+                                    dtype=np.float32)
+        single.initial = initial
+        single.boundary = boundary
+        fow_iter = single.forward()
+
+        self.assertEqual(single.initial.dtype, np.float32)
+        self.assertEqual(single._matrix.dtype, np.float32)
+
+        for _ in range(200):
+            data, _ = next(fow_iter)
+
+        self.assertEqual(data.dtype, np.float32)
+        self.assertEqual(single._data_history.last().dtype, np.float32)
+
+        refined, steps = single.refine(1e-12)
+        residual = single._sweep(refined) - refined
+
+        self.assertEqual(refined.dtype, np.float64)
+        self.assertLess(steps, 1000)
+        self.assertLess(np.abs(residual).max(), 1e-12)
+        self.assertEqual(np.allclose(refined, data, atol=1e-5), True)
+
+        self.assertRaises(TypeError, model.LaplaceModel,
+                          controller.Controller(), dtype=np.int64)
+
+    def test_active(self):
+
+        shape = (30, 30)
+        initial = np.zeros(shape)
+        boundary = np.ones(shape)
+        boundary[1:-1, 1:-1] = 0
+        boundary[14:16, 14:16] = 1
+        initial[14:16, 14:16] = 100
+
+        stencil = model.LaplaceModel(controller.Controller(),
+                                     solver='stencil')
+        stencil.initial = initial
+        stencil.boundary = boundary
+        stencil_iter = stencil.forward()
+
+        active = model.LaplaceModel(controller.Controller(),
+                                    solver='active',
+                                    active_threshold=0,
+                                    full_sweep_every=7)
+        active.initial = initial
+        active.boundary = boundary
+        active_iter = active.forward()
+
+        for step in range(1, 21):
+            expected, expected_parameters = next(stencil_iter)
+            data, parameters = next(active_iter)
+
+            # The heat spreads one point per step from the obstacle
+            if step == 3:
+                self.assertLess(active._active.size, 100)
+
+        # Points which did not change at all are skipped exactly
+        self.assertEqual(np.allclose(data, expected), True)
+
+        for name in expected_parameters:
+            self.assertAlmostEqual(parameters[name], expected_parameters[name])
+
+        # Without history the state is updated in place
+        in_place = model.LaplaceModel(controller.Controller(),
+                                      max_history=0,
+                                      solver='active',
+                                      active_threshold=1e-3)
+        in_place.initial = initial
+        in_place.boundary = boundary
+        in_place_iter = in_place.forward()
+
+        # The stencil model is 20 steps ahead already
+        for _ in range(220):
+            data, _ = next(in_place_iter)
+
+        for _ in range(200):
+            expected, _ = next(stencil_iter)
+
+        self.assertEqual(np.allclose(data, expected, atol=0.1), True)
+
+    def test_spectral(self):
+
+        initial = np.load('initial_data/laplace/testdata_initial_3D.npy')
+        boundary = np.load('initial_data/laplace/testdata_boundary_3D.npy')
+
+        self.model.initial = initial
+        self.model.boundary = boundary
+        fow_iter = self.model.forward()
+
+        spectral = model.LaplaceModel(controller.Controller(),
+                                      solver='spectral')
+        spectral.initial = initial
+        spectral.boundary = boundary
+        spectral_iter = spectral.forward()
+
+        self.assertEqual(spectral.is_box, True)
+
+        for _ in range(3):
+            expected, _ = next(fow_iter)
+            data, _ = next(spectral_iter)
+
+            self.assertEqual(np.allclose(data, expected), True)
+
+        # Five steps at once
+        spectral.spectral_jump = 5
+
+        for _ in range(5):
+            expected, _ = next(fow_iter)
+
+        data, _ = next(spectral_iter)
+        self.assertEqual(np.allclose(data, expected), True)
+
+        # The steady state does not change anymore
+        steady = spectral.steady_state()
+        spectral.spectral_jump = np.inf
+        data, _ = next(spectral_iter)
+
+        self.assertEqual(np.allclose(data, steady), True)
+        self.assertEqual(
+            np.allclose(spectral._stencil_step(steady), steady), True)
+
+        # Irregular masks fall back to the stencil solver
+        boundary[4, 4, 4] = 1
+        spectral.boundary = boundary
+
+        self.assertEqual(spectral.is_box, False)
+        self.assertRaises(ValueError, spectral.steady_state)
+
+        spectral.spectral_jump = 2
+        stencil = spectral._stencil_step(spectral._stencil_step(data))
+        data, _ = next(spectral.forward())
+
+        self.assertEqual(np.allclose(data, stencil), True)
+
+    def test_update_conditions(self):
+
+        shape = (12, 12)
+        initial = np.zeros(shape)
+        initial[0] = 100
+        boundary = np.ones(shape)
+        boundary[1:-1, 1:-1] = 0
+
+        self.model.initial = initial
+        self.model.boundary = boundary
+        fow_iter = self.model.forward()
+
+        def steps_to_converge():
+
+            for step in range(1, 10000):
+                _, parameters = next(fow_iter)
+
+                if parameters['Absolute Change'] < 1e-3:
+                    return step
+
+        cold = steps_to_converge()
+
+        # A small obstacle and a slightly warmer wall
+        initial[0] = 110
+        boundary[5:7, 5:7] = 1
+        iteration = self.model.count_iteration
+        self.model.update_conditions(initial=initial, boundary=boundary)
+        data, _ = self.model.current()
+
+        self.assertEqual(self.model.count_iteration, iteration)
+        self.assertEqual((data[0] == 110).all(), True)
+        self.assertEqual((data[5:7, 5:7] == 0).all(), True)
+
+        warm = steps_to_converge()
+
+        self.assertLess(warm, cold)
+
+        # Same operator as assembled from scratch
+        other = model.LaplaceModel(controller.Controller())
+        other.initial = initial
+        model.LaplaceModel.operator_cache.clear()
+        other.boundary = boundary
+
+        self.assertEqual((other._matrix == self.model._matrix).all(), True)
+
+        self.assertRaises(TypeError, self.model.update_conditions,
+                          initial=np.zeros((3, 3)))
+
     def tearDown(self):
 
         del self.model
 
 
+class TestTransientHeatModel(unittest.TestCase):
+    def setUp(self):
+
+        model.LaplaceModel.operator_cache.clear()
+
+    def _run(self, steps, **options):
+
+        transient = model.TransientHeatModel(controller.Controller(),
+                                             **options)
+        transient.initial = [1, 0, 0, 0, 5]
+        transient.boundary = [1, 0, 0, 0, 1]
+        fow_iter = transient.forward()
+
+        for _ in range(steps):
+            data, parameters = next(fow_iter)
+
+        return transient, data, parameters
+
+    def test_steady_state(self):
+
+        # Stable for any time step, a huge one gives the steady state
+        _, data, parameters = self._run(1, dt=1e9, scheme='backward-euler')
+
+        self.assertEqual(np.allclose(data, [1, 2, 3, 4, 5]), True)
+        self.assertEqual(parameters['Time'], 1e9)
+
+    def test_crank_nicolson(self):
+
+        laplacian = np.zeros((5, 5))
+
+        for row in range(1, 4):
+            laplacian[row, row - 1:row + 2] = [1, -2, 1]
+
+        ratio = 0.5 * 0.2 / 0.5**2
+        expected = np.array([1, 0, 0, 0, 5], dtype=np.float_)
+
+        for _ in range(3):
+            expected = np.linalg.solve(
+                np.eye(5) - 0.5 * ratio * laplacian,
+                (np.eye(5) + 0.5 * ratio * laplacian).dot(expected))
+
+        transient, data, _ = self._run(3, diffusivity=0.5, dt=0.2,
+                                       spacing=0.5)
+
+        self.assertEqual(np.allclose(data, expected), True)
+
+        # The factorisation is reused by steps and other instances
+        operator = transient._operator
+        next(transient.forward())
+        other, _, _ = self._run(1, diffusivity=0.5, dt=0.2, spacing=0.5)
+
+        self.assertIs(transient._operator, operator)
+        self.assertIs(other._operator, operator)
+
+        # Without scipy a dense propagator is used
+        sparse = model.sparse
+        model.sparse = None
+
+        try:
+
+            _, dense, _ = self._run(3, diffusivity=0.5, dt=0.2, spacing=0.5)
+
+        finally:
+
+            model.sparse = sparse
+
+        self.assertEqual(np.allclose(dense, expected), True)
+
+        self.assertRaises(ValueError, model.TransientHeatModel,
+                          controller.Controller(), scheme='unknown')
+        self.assertRaises(ValueError, model.TransientHeatModel,
+                          controller.Controller(), dt=0)
+
+    def tearDown(self):
+
+        model.LaplaceModel.operator_cache.clear()
+
+
+class TestKernelSolver(unittest.TestCase):
+    def test_kernel(self):
+
+        for factory in (fixtures.lorenz, fixtures.three_body):
+
+            reference = factory()
+            kernel = factory(solver='kernel')
+            iterator = reference.forward()
+            expected = np.array([next(iterator)[0] for _ in range(1000)])
+
+            states, _ = kernel.advance(999)
+            last, _ = next(kernel.forward())
+
+            self.assertEqual(states.shape, (999, ) + expected.shape[1:])
+            self.assertEqual(np.allclose(states, expected[:-1]), True)
+            self.assertEqual(np.allclose(last, expected[-1]), True)
+            # The matrix is left as if the steps were done by it
+            self.assertEqual(np.allclose(kernel._matrix, reference._matrix),
+                             True)
+            self.assertEqual(kernel.count_iteration, 1000)
+
+        self.assertRaises(ValueError, model.LorenzModel,
+                          controller.Controller(), solver='unknown')
+
+    def test_advance(self):
+
+        lorenz = fixtures.lorenz(solver='kernel', max_history=10)
+        reference = fixtures.lorenz(max_history=10)
+        received = []
+        lorenz.subscribe(lambda data, parameters: received.append(data))
+
+        states, parameters = lorenz.advance(25)
+        reference_states, _ = reference.advance(25)
+
+        self.assertEqual(np.allclose(states, reference_states), True)
+        self.assertEqual(parameters, lorenz.sys_params)
+        self.assertEqual(len(received), 25)
+        self.assertEqual(len(lorenz._data_history), 10)
+        self.assertEqual((lorenz.current()[0] == states[-1]).all(), True)
+
+        # Stepping back goes through the previous states
+        data, _ = next(lorenz.backward())
+
+        self.assertEqual((data == states[-2]).all(), True)
+        self.assertEqual(lorenz.count_iteration, 24)
+
+        lorenz = fixtures.lorenz(solver='kernel', dtype=np.float32)
+        states, _ = lorenz.advance(5)
+
+        self.assertEqual(states.dtype, np.float32)
+        self.assertRaises(ValueError, lorenz.advance, 0)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,139 @@
+import os
+import tempfile
+import unittest
+import model
+import controller
+import inputs
+import recorder
+import view
+import shutil
+
+recording_name = 'test_recording'
+
+
+class UpdateRecorder(view.AbstractView):
+
+    # Only records the updates, without any widgets
+    batch_updates = False
+
+    def __init__(self):
+
+        self.updates = []
+
+    def _setup_connections(self):
+        pass
+
+    def update(self, data, param=None, add_data=True):
+
+        self.updates.append(data)
+
+    def reset(self):
+        pass
+
+
+class TestRecorder(unittest.TestCase):
+    def setUp(self):
+
+        self.model = model.LaplaceModel(controller.Controller())
+        self.model.initial = [1, 0, 0, 0, 2]
+        self.model.boundary = [1, 0, 0, 0, 1]
+
+    def test_recording(self):
+
+        states = []
+
+        with recorder.Recorder(recording_name, chunk_size=4) as record:
+
+            self.model.subscribe(record)
+            forward = self.model.forward()
+
+            for _ in range(10):
+
+                data, _ = next(forward)
+                states.append(data)
+
+            self.model.unsubscribe(record)
+
+        recording = recorder.Recording(recording_name)
+
+        self.assertEqual(recorder.is_recording(recording_name), True)
+        self.assertEqual(len(recording), 10)
+        self.assertEqual((recording.states() == states).all(), True)
+        self.assertEqual((recording.states(3, 6) == states[3:6]).all(), True)
+
+        data, parameters = recording[-1]
+
+        self.assertEqual((data == states[-1]).all(), True)
+        self.assertEqual(parameters['Iteration Step'], 10)
+        self.assertIsInstance(parameters['Iteration Step'], int)
+
+    def test_replay(self):
+
+        with recorder.Recorder(recording_name, chunk_size=4) as record:
+
+            record(*self.model.current())
+            self.model.subscribe(record)
+            forward = self.model.forward()
+
+            for _ in range(5):
+
+                next(forward)
+
+        replay = model.ReplayModel(controller.Controller(),
+                                   recorder.Recording(recording_name))
+        forward = replay.forward()
+
+        self.assertEqual((replay.initial == [1, 0, 0, 0, 2]).all(), True)
+
+        for _ in range(5):
+
+            data, _ = next(forward)
+
+        self.assertEqual((data == self.model.current()[0]).all(), True)
+
+        data, parameters = next(forward)
+
+        self.assertEqual((data == self.model.current()[0]).all(), True)
+        self.assertEqual(parameters['Iteration Step'], 5)
+
+    def test_load_after_replay(self):
+
+        with recorder.Recorder(recording_name) as record:
+
+            record(*self.model.current())
+
+        control = controller.LorenzController()
+        control.view = UpdateRecorder()
+        lorenz = model.LorenzModel(control)
+        control.model = lorenz
+
+        control.load(recording_name)
+
+        self.assertIsInstance(control.model, model.ReplayModel)
+
+        with tempfile.TemporaryDirectory() as directory:
+
+            case = os.path.join(directory, 'case')
+            inputs.save_case(case, {'initialPosition': [1., 1., 1.]},
+                             parameters={
+                                 'timeStep': 0.001,
+                                 'sigma': 10,
+                                 'rho': 28,
+                                 'beta': 8 / 3
+                             })
+            control.load(case)
+
+        self.assertIs(control.model, lorenz)
+
+        control._step_forward()
+
+        self.assertEqual(lorenz.count_iteration, 1)
+        self.assertEqual(len(control.view.updates[-1]), 3)
+
+    def tearDown(self):
+
+        shutil.rmtree(recording_name, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,272 @@
+import os
+import asyncio
+import tempfile
+import unittest
+import numpy as np
+import fixtures
+import inputs
+import metrics
+import remote
+
+
+async def receive(client, kind=remote.STATE):
+
+    while True:
+
+        received, content = await asyncio.wait_for(client.receive(), 10)
+
+        if received == kind:
+
+            return content
+
+
+class TestFraming(unittest.TestCase):
+    def test_state(self):
+
+        data = np.arange(12, dtype=np.float32).reshape(3, 4)
+        frame = remote.encode_state(data, {
+            'Iteration': np.int64(3),
+            'Mean': np.float64(0.5)
+        },
+                                    iteration=3)
+        magic, kind, length = remote.HEADER.unpack_from(frame)
+
+        self.assertEqual((magic, kind), (remote.MAGIC, remote.STATE))
+        self.assertEqual(length, len(frame) - remote.HEADER.size)
+
+        decoded, header = remote.decode_state(frame[remote.HEADER.size:])
+
+        self.assertEqual(decoded.dtype, np.float32)
+        self.assertEqual((decoded == data).all(), True)
+        self.assertEqual(header['parameters'], {'Iteration': 3, 'Mean': 0.5})
+        self.assertEqual(header['iteration'], 3)
+
+    def test_slow_subscriber(self):
+
+        async def run():
+
+            subscriber = remote._Subscriber(writer=None, max_states=2)
+
+            for number in range(5):
+
+                subscriber.push(remote.STATE, number)
+
+                if number == 2:
+
+                    subscriber.push(remote.REPLY, 'reply')
+
+            return subscriber
+
+        dropped = metrics.registry.counter('remote_frames_dropped_total')
+        before = dropped.value
+        subscriber = asyncio.run(run())
+
+        # Only the latest states are kept, replies are never dropped
+        self.assertEqual(list(subscriber._frames),
+                         [(remote.REPLY, 'reply'), (remote.STATE, 3),
+                          (remote.STATE, 4)])
+        self.assertEqual(subscriber.dropped, 3)
+        self.assertEqual(dropped.value - before, 3)
+
+
+class TestSimulationServer(unittest.TestCase):
+    def setUp(self):
+
+        self.model = fixtures.heat()
+        self.reference = fixtures.heat()
+
+    def tearDown(self):
+
+        self.model.close()
+        self.reference.close()
+
+    def test_commands(self):
+
+        async def run():
+
+            server = remote.SimulationServer(self.model)
+            await server.start()
+            first = await remote.RemoteClient.open(port=server.address)
+            second = await remote.RemoteClient.open(port=server.address)
+
+            for client in (first, second):
+
+                state = await receive(client)
+                self.assertEqual(state['reset'], True)
+                self.assertEqual(state['iteration'], 0)
+
+            await first.send('step', steps=3)
+            states = [await receive(first), await receive(second)]
+            reply = await receive(first, remote.REPLY)
+            self.assertEqual(reply, {'command': 'step'})
+
+            await second.send('back')
+            back = await receive(first)
+
+            await first.send('unknown')
+            error = await receive(first, remote.REPLY)
+
+            await first.close()
+            await second.close()
+            await server.close()
+
+            return states, back, error
+
+        states, back, error = asyncio.run(run())
+        iterator = self.reference.forward()
+
+        for _ in range(3):
+
+            data, parameters = next(iterator)
+
+        for state in states:
+
+            self.assertEqual(state['iteration'], 3)
+            self.assertEqual(np.allclose(state['data'], data), True)
+            self.assertEqual(state['parameters']['Iteration Step'],
+                             parameters['Iteration Step'])
+
+        self.assertEqual(back['iteration'], 2)
+        self.assertEqual(back['add_data'], False)
+        self.assertIn('error', error)
+
+    def test_invalid_steps(self):
+
+        async def run():
+
+            server = remote.SimulationServer(self.model)
+            await server.start()
+            client = await remote.RemoteClient.open(port=server.address)
+            await receive(client)
+
+            await client.send('step', steps=0)
+            reply = await receive(client, remote.REPLY)
+
+            await client.close()
+            await server.close()
+
+            return reply
+
+        reply = asyncio.run(run())
+
+        self.assertIn('steps', reply['error'])
+        self.assertEqual(self.model.count_iteration, 0)
+
+    def test_checkpoints(self):
+
+        with tempfile.TemporaryDirectory() as directory:
+
+            async def run():
+
+                server = remote.SimulationServer(
+                    self.model, checkpoint_directory=directory)
+                await server.start()
+                client = await remote.RemoteClient.open(port=server.address)
+                await receive(client)
+
+                await client.send('step', steps=2)
+                await client.send('save', path='heat.ckpt')
+                await client.send('step', steps=3)
+                await client.send('resume', path='heat.ckpt')
+                replies = [
+                    await receive(client, remote.REPLY) for _ in range(4)
+                ]
+
+                for path in ('/tmp/heat.ckpt', '../heat.ckpt', 'a/../../b',
+                             '.'):
+
+                    await client.send('save', path=path)
+                    replies.append(await receive(client, remote.REPLY))
+
+                await client.close()
+                await server.close()
+
+                return replies
+
+            replies = asyncio.run(run())
+            files = os.listdir(directory)
+
+        self.assertEqual(files, ['heat.ckpt'])
+        self.assertEqual(self.model.count_iteration, 2)
+
+        for reply in replies[:4]:
+
+            self.assertNotIn('error', reply)
+
+        for reply in replies[4:]:
+
+            self.assertIn('Invalid checkpoint path', reply['error'])
+
+        # Refused without a checkpoint directory
+        server = remote.SimulationServer(self.model)
+
+        self.assertRaises(ValueError, server._checkpoint_path, 'heat.ckpt')
+
+    def test_play(self):
+
+        async def run():
+
+            server = remote.SimulationServer(self.model, max_fps=20)
+            await server.start()
+            client = await remote.RemoteClient.open(port=server.address)
+            await receive(client)
+
+            await client.send('play', speed=200)
+            await asyncio.sleep(0.5)
+            await client.send('stop')
+            await receive(client, remote.REPLY)
+            await receive(client, remote.REPLY)
+            iteration = self.model.count_iteration
+            await asyncio.sleep(0.1)
+
+            await client.close()
+            await server.close()
+
+            return iteration
+
+        sent = metrics.registry.counter('remote_frames_sent_total')
+        before = sent.value
+        iteration = asyncio.run(run())
+
+        self.assertGreater(iteration, 10)
+        self.assertEqual(self.model.count_iteration, iteration)
+        # Throttled to at most 20 frames per second
+        self.assertLess(sent.value - before, 20)
+
+    def test_load_unix_socket(self):
+
+        with tempfile.TemporaryDirectory() as directory:
+
+            case = os.path.join(directory, 'case')
+            inputs.save_case(case, {
+                'initial': np.ones((5, 5)),
+                'boundary': np.ones((5, 5), dtype=np.bool_)
+            })
+            path = os.path.join(directory, 'socket')
+
+            async def run():
+
+                server = remote.SimulationServer(self.model, path=path)
+                await server.start()
+                client = await remote.RemoteClient.open(path=path)
+                await receive(client)
+
+                await client.send('load', path=case)
+                state = await receive(client)
+                reply = await receive(client, remote.REPLY)
+
+                await client.close()
+                await server.close()
+
+                return state, reply
+
+            state, reply = asyncio.run(run())
+
+        self.assertEqual(reply, {'command': 'load'})
+        self.assertEqual(state['reset'], True)
+        self.assertEqual(state['data'].shape, (5, 5))
+        self.assertEqual((state['data'] == 1).all(), True)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import fixtures
+import metrics
+import resultcache
+
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = resultcache.ResultCache(self.directory.name)
+
+    def tearDown(self):
+
+        self.directory.cleanup()
+
+    def test_fingerprint(self):
+
+        key = resultcache.fingerprint(fixtures.heat(), 10)
+
+        self.assertEqual(resultcache.fingerprint(fixtures.heat(), 10), key)
+        self.assertNotEqual(resultcache.fingerprint(fixtures.heat(), 11), key)
+        self.assertNotEqual(
+            resultcache.fingerprint(fixtures.heat(hot=2.), 10), key)
+        self.assertNotEqual(
+            resultcache.fingerprint(fixtures.heat(solver='stencil'), 10), key)
+        self.assertNotEqual(
+            resultcache.fingerprint(fixtures.lorenz(), 10),
+            resultcache.fingerprint(fixtures.lorenz(rho=20), 10))
+
+    def test_run(self):
+
+        hits = metrics.registry.counter('result_cache_hits_total',
+                                        model='LaplaceModel')
+        before = hits.value
+        data, parameters = self.cache.run(fixtures.heat(), 20)
+        cached = fixtures.heat()
+        cached_data, cached_parameters = self.cache.run(cached, 20)
+
+        self.assertEqual(self.cache.stats()['hits'], 1)
+        self.assertEqual(self.cache.stats()['misses'], 1)
+        self.assertEqual(hits.value - before, 1)
+        self.assertEqual(np.allclose(cached_data, data), True)
+        self.assertEqual(cached_parameters, parameters)
+        self.assertEqual(cached.count_iteration, 20)
+
+        # The restored model continues like the computed one
+        reference = fixtures.heat()
+        self.cache.run(reference, 25)
+        self.cache.run(cached, 5)
+
+        self.assertEqual(np.allclose(cached.current()[0],
+                                     reference.current()[0]), True)
+
+    def test_lorenz(self):
+
+        data, parameters = self.cache.run(fixtures.lorenz(), 50)
+        cached_data, cached_parameters = self.cache.run(fixtures.lorenz(), 50)
+
+        self.assertEqual(self.cache.hits, 1)
+        self.assertEqual((cached_data == data).all(), True)
+        self.assertEqual(cached_parameters, parameters)
+
+    def test_eviction(self):
+
+        first = resultcache.fingerprint(fixtures.heat(), 1)
+        self.cache.run(fixtures.heat(), 1)
+        self.cache.max_bytes = int(2.5 * self.cache.nbytes)
+        self.cache.run(fixtures.heat(), 2)
+
+        # The first run is used again, so the second one is evicted
+        self.cache.run(fixtures.heat(), 1)
+        self.cache.run(fixtures.heat(), 3)
+
+        self.assertEqual(len(self.cache), 2)
+        self.assertIn(first, self.cache)
+        self.assertNotIn(resultcache.fingerprint(fixtures.heat(), 2),
+                         self.cache)
+        self.assertLessEqual(self.cache.nbytes, self.cache.max_bytes)
+        self.assertEqual(len(os.listdir(self.directory.name)), 4)
+
+        # Another cache on the same directory finds the runs
+        other = resultcache.ResultCache(self.directory.name)
+
+        self.assertEqual(len(other), 2)
+        self.assertEqual(other.nbytes, self.cache.nbytes)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -8,6 +8,10 @@ as concret implementations.
 
 from abc import ABCMeta, abstractmethod
 import controller
+import library
+import metrics
+import inputs
+import recorder
 import numpy as np
 import pyqtgraph as pg
 import matplotlib_window
@@ -21,18 +25,87 @@ class AbstractView(QtWidgets.QMainWindow):
 
     __metaclass__ = ABCMeta
 
+    # Refresh interval of the performance stats panel in milliseconds
+    stats_interval = 1000
+
     def __init__(self, controller, ui_file):
 
         self.controller = controller
+        self.metrics = metrics.registry
 
         super(AbstractView, self).__init__()
         uic.loadUi(ui_file, self)
 
         self._initialise_widgets()
+        self._initialise_stats_panel()
+        self._initialise_checkpoint_buttons()
         self._setup_connections()
 
         self.show()
 
+    def _initialise_stats_panel(self):
+
+        self.label_stats = QtWidgets.QLabel()
+        self.label_stats.setStyleSheet('color: gray')
+        self.verticalLayout_plots_and_controls.addWidget(self.label_stats)
+
+        self._stats_timer = QtCore.QTimer(self)
+        self._stats_timer.timeout.connect(self._update_stats)
+        self._stats_timer.start(type(self).stats_interval)
+
+    def _initialise_checkpoint_buttons(self):
+
+        self.pushButton_save = QtWidgets.QPushButton('Save')
+        self.pushButton_resume = QtWidgets.QPushButton('Resume')
+        self.horizontalLayout_controls.insertWidget(0, self.pushButton_resume)
+        self.horizontalLayout_controls.insertWidget(0, self.pushButton_save)
+
+        self.pushButton_save.clicked.connect(self.save_checkpoint)
+        self.pushButton_resume.clicked.connect(self.resume)
+
+    def save_checkpoint(self):
+
+        path, _ = QFileDialog.getSaveFileName(None, 'Save checkpoint', '',
+                                              'Checkpoints (*.ckpt)')
+
+        if path != '':
+
+            self.controller.save_checkpoint(path, include_history=True)
+
+    def resume(self):
+
+        path, _ = QFileDialog.getOpenFileName(None, 'Open checkpoint', '',
+                                              'Checkpoints (*.ckpt)')
+
+        if path != '':
+
+            self.controller.resume(path)
+
+    def _update_stats(self):
+
+        if self.controller.model is None:
+
+            return
+
+        model = type(self.controller.model).__name__
+        step_time = self.metrics.timer('model_step_seconds', model=model)
+        parameters_time = self.metrics.timer('model_parameters_seconds',
+                                             model=model)
+        render_time = self.metrics.timer('view_render_seconds',
+                                         view=type(self).__name__)
+
+        self.label_stats.setText(
+            'Steps/s: {0:.0f}   Step: {1:.1f} \u00b5s (p99 {2:.1f} \u00b5s)   '
+            'Parameters: {3:.1f} \u00b5s   History: {4:.1f} MB   '
+            'Render: {5:.1f} ms'.format(
+                self.metrics.counter('model_steps_total', model=model).rate(),
+                step_time.mean() * 1e6,
+                step_time.percentile(99) * 1e6,
+                parameters_time.mean() * 1e6,
+                self.metrics.gauge('model_history_bytes', model=model).value /
+                1e6,
+                render_time.mean() * 1e3))
+
     def load(self):
 
         # Loading initial data
@@ -91,12 +164,15 @@ class HeatView(AbstractView):
 
     default_ui_file = 'gui/heatWindow.ui'
     speed_settings = [1, 5, 10, 25, 50, np.inf]
+    batch_updates = False
 
     def __init__(self, controller, ui_file=None):
 
         self._main_plot = None
         self._difference_plot = None
         self._residue_plot = None
+        self._residue_curve = None
+        self._residue = library.GrowableArray(width=2)
 
         filename = ui_file if ui_file else type(self).default_ui_file
         super().__init__(controller, filename)
@@ -116,7 +192,9 @@ class HeatView(AbstractView):
         pg.setConfigOption('foreground', 'k')
 
         self._residue_plot = pg.PlotWidget()
-        self._residue_plot.addItem(pg.PlotCurveItem())
+        self._residue_curve = pg.PlotCurveItem(
+            pen=pg.mkPen(color='r', width=3))
+        self._residue_plot.addItem(self._residue_curve)
         self._residue_plot.showGrid(True, True)
         self._residue_plot.setLogMode(False, True)
         self.gridLayout_residue_plot.addWidget(self._residue_plot)
@@ -144,22 +222,17 @@ class HeatView(AbstractView):
 
     def _update_residue(self, data, add_data):
 
-        plot = self._residue_plot.getPlotItem().listDataItems()[0]
-        previous_data = plot.getData()
-
         if add_data:
 
-            x, y = previous_data
-            new_data = (np.append(x, data[0]), np.append(y, data[1]))
+            self._residue.append(data)
 
         else:
 
-            x, y = previous_data
-            new_data = (x[:-1], y[:-1])
+            # Going backwards only moves the fill pointer of the buffer
+            self._residue.discard()
 
-        plot.setData(x=new_data[0],
-                     y=new_data[1],
-                     pen=pg.mkPen(color='r', width=3))
+        residue = self._residue.view()
+        self._residue_curve.setData(x=residue[:, 0], y=residue[:, 1])
 
     def update(self, data, param, add_data=True):
 
@@ -175,6 +248,13 @@ class HeatView(AbstractView):
         initial_data_path, _ = QFileDialog.getOpenFileName(
             None, 'Open initial data file', '', 'All Files (*)')
 
+        # Cases and recordings contain everything needed
+        if inputs.is_case(initial_data_path) or recorder.is_recording(
+                initial_data_path):
+
+            self.controller.load(initial_data_path)
+            return
+
         # Loading boundary data
         boundary_data_path, _ = QFileDialog.getOpenFileName(
             None, 'Open boundary data file', '', 'All Files (*)')
@@ -188,18 +268,25 @@ class HeatView(AbstractView):
 
     def reset(self):
 
-        self._residue_plot.getPlotItem().clear()
-        self._residue_plot.addItem(pg.PlotCurveItem())
+        self._residue.empty()
+        self._residue_curve.setData(x=[], y=[])
 
 
 class LorenzView(AbstractView):
 
     default_ui_file = 'gui/lorenzWindow.ui'
     speed_settings = [1, 10, 50, 100, 500, np.inf]
+    batch_updates = True
+    max_vertices = 20000
+    full_resolution = 5000
 
     def __init__(self, controller, ui_file=None):
 
         self._main_plot = None
+        self._trajectory = library.Trajectory(
+            width=3,
+            max_vertices=type(self).max_vertices,
+            full_resolution=type(self).full_resolution)
 
         filename = ui_file if ui_file else type(self).default_ui_file
         super().__init__(controller, filename)
@@ -230,28 +317,39 @@ class LorenzView(AbstractView):
         self.comboBox_speed.currentIndexChanged.connect(
             self.controller.speed_changed)
 
-    def update(self, data, add_data=True):
+    def update(self, data, param=None, add_data=True):
 
-        pos = self._main_plot.pos
-        data = np.array(data)
+        if add_data:
+
+            self._trajectory.extend(data)
 
-        if pos is not None:
-            data = np.vstack((pos, data))
+        else:
 
-        self._main_plot.setData(pos=data)
+            self._trajectory.discard()
+
+        self._main_plot.setData(pos=self._trajectory.decimated())
 
     def reset(self):
-        pass
+
+        self._trajectory.empty()
 
 
 class ThreeBodyView(AbstractView):
 
     default_ui_file = 'gui/threeBodyWindow.ui'
     speed_settings = [1, 10, 50, 100, 500, np.inf]
+    batch_updates = True
+    max_vertices = 20000
+    full_resolution = 5000
 
     def __init__(self, controller, ui_file=None):
 
         self._main_plot = None
+        # Positions of all three bodies share one store (and one decimation)
+        self._trajectory = library.Trajectory(
+            width=9,
+            max_vertices=type(self).max_vertices,
+            full_resolution=type(self).full_resolution)
 
         filename = ui_file if ui_file else type(self).default_ui_file
         super().__init__(controller, filename)
@@ -286,30 +384,27 @@ class ThreeBodyView(AbstractView):
         self.comboBox_speed.currentIndexChanged.connect(
             self.controller.speed_changed)
 
-    def update(self, data, add_data=True):
-
-        pos_1 = self._main_plot_1.pos
-        pos_2 = self._main_plot_2.pos
-        pos_3 = self._main_plot_3.pos
-        data = np.array(data)
-        planet_1 = data[0:3]
-        planet_2 = data[3:6]
-        planet_3 = data[6:9]
-
-        if pos_1 is not None:
-            self._main_plot_1.setData(pos=np.vstack((pos_1, planet_1)),
-                                      mode='line_strip',
-                                      width=3)
-            self._main_plot_2.setData(pos=np.vstack((pos_2, planet_2)),
-                                      mode='line_strip',
-                                      width=3)
-            self._main_plot_3.setData(pos=np.vstack((pos_3, planet_3)),
-                                      mode='line_strip',
-                                      width=3)
+    def update(self, data, param=None, add_data=True):
+
+        if add_data:
+
+            # Only the positions are drawn, momenta are dropped
+            data = np.asarray(data).reshape((-1, 18))[:, 0:9]
+            self._trajectory.extend(data)
+
         else:
-            self._main_plot_1.setData(pos=planet_1, mode='line_strip', width=3)
-            self._main_plot_2.setData(pos=planet_2, mode='line_strip', width=3)
-            self._main_plot_3.setData(pos=planet_3, mode='line_strip', width=3)
+
+            self._trajectory.discard()
+
+        pos = self._trajectory.decimated()
+        planet_1 = np.ascontiguousarray(pos[:, 0:3])
+        planet_2 = np.ascontiguousarray(pos[:, 3:6])
+        planet_3 = np.ascontiguousarray(pos[:, 6:9])
+
+        self._main_plot_1.setData(pos=planet_1, mode='line_strip', width=3)
+        self._main_plot_2.setData(pos=planet_2, mode='line_strip', width=3)
+        self._main_plot_3.setData(pos=planet_3, mode='line_strip', width=3)
 
     def reset(self):
-        pass
\ No newline at end of file
+
+        self._trajectory.empty()